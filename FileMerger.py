@@ -1,10 +1,28 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PyPDF2 import PdfMerger
-from PIL import Image
-from fpdf import FPDF
+import base64
 import os
+import queue
 import subprocess
+import threading
+from collections import OrderedDict
+
+import converters
+import merge_engine
+import merge_metrics
+from conversion_cache import ConversionCache
+from directory_index import DirectoryIndex
+from file_list_model import FileListModel
+from thumbnails import THUMBNAIL_SIZE, ThumbnailCache, ThumbnailLoader
+
+# Seconds between checks of the source directory for added or removed files
+INDEX_POLL_SECONDS = 2
+
+# Thumbnails kept as Tk images, the rest are reloaded from the disk cache
+THUMBNAIL_MEMORY = 1000
+
+# Extension checkboxes per row of the filter
+FILTER_COLUMNS = 4
 
 
 class FileMerger:
@@ -12,13 +30,9 @@ class FileMerger:
         self.standard_format = {
             ".pdf": tk.BooleanVar(value=True)
         }
-        self.other_formats = {
-            ".txt": tk.BooleanVar(value=False),
-        }
-
-        self.image_types = {".png", ".jpg", ".jpeg"}
-        for ext in self.image_types:
-            self.other_formats[ext] = tk.BooleanVar(value=False)
+        # Every other type the converters registry knows, including plugins
+        self.other_formats = {ext: tk.BooleanVar(value=False)
+                              for ext in converters.input_types() if ext not in self.standard_format}
 
         self.root = root
         self.root.title("DocMerger")
@@ -26,8 +40,16 @@ class FileMerger:
 
         # Variables
         self.source_dir = ""
-        self.doc_vars = {}
+        self.files = FileListModel()
+        self.index = None  # DirectoryIndex of source_dir, built on a background thread
+        self.unreported_scan = None  # Seconds the last scan took, shown after the next merge
+        self.index_queue = queue.Queue()
+        self.recursive = tk.BooleanVar(value=False)
         self.selected_format = tk.StringVar(value="pdf")
+        # Re-merges copy unchanged inputs from the previous output, but drop its bookmarks
+        self.incremental = tk.BooleanVar(value=merge_engine.DEFAULT_OPTIONS["incremental"])
+        # For jobs too big to keep every input open, the output has no bookmarks either
+        self.large_job = tk.BooleanVar(value=merge_engine.DEFAULT_OPTIONS["large_job"])
         self.extensions_filter = {".pdf"}  # Default filter to PDFs
 
         # Styling
@@ -39,7 +61,9 @@ class FileMerger:
         s.configure('DragHandle.TLabel', font=('Segoe UI', 12), foreground='#999999')
         s.configure('DragLine.TSeparator', background='#0078d7')
         s.configure('DropTarget.TFrame', background='#f0f9ff')
+        s.configure('Selected.TFrame', background='#e5f1fb')
         s.configure('FileCheckbutton.TCheckbutton', padding=5)
+        s.configure('Thumbnail.TLabel', background='white')
         s.configure('Files.TLabelframe', padding=10)
 
         # Main layout
@@ -56,15 +80,18 @@ class FileMerger:
         # Extension Filter (Checkboxes)
         filter_frame = ttk.Frame(main)
         filter_frame.pack(fill=tk.X, pady=2)
-        ttk.Label(filter_frame, text="Filter by Extensions:").pack(side=tk.LEFT)
+        ttk.Label(filter_frame, text="Filter by Extensions:").grid(row=0, column=0, sticky=tk.NW)
 
         self.checkbuttons = {}  # Store checkbuttons for later updates
         combined_formats = {**self.standard_format, **self.other_formats}
 
-        for ext, var in combined_formats.items():
+        # Wraps onto more rows when plugins add types
+        for i, (ext, var) in enumerate(combined_formats.items()):
             chk = ttk.Checkbutton(filter_frame, text=ext, variable=var, command=self.filter_files)
-            chk.pack(side=tk.LEFT)
+            chk.grid(row=i // FILTER_COLUMNS, column=1 + i % FILTER_COLUMNS, sticky=tk.W)
             self.checkbuttons[ext] = chk
+        ttk.Checkbutton(filter_frame, text="Subfolders", variable=self.recursive,
+                        command=self.rescan_directory).grid(row=0, column=FILTER_COLUMNS + 1, sticky=tk.NW)
 
         # Files list
         ff = ttk.LabelFrame(main, text="Files")
@@ -76,19 +103,31 @@ class FileMerger:
         ttk.Button(select_buttons_frame, text="Select All", command=self.select_all_files).pack(side=tk.LEFT, padx=2)
         ttk.Button(select_buttons_frame, text="Select None", command=self.select_none_files).pack(side=tk.LEFT, padx=2)
 
-        # Scrollable frame
-        self.canvas = tk.Canvas(ff)
-        sb = ttk.Scrollbar(ff, orient="vertical", command=self.canvas.yview)
-        self.file_frame = ttk.Frame(self.canvas, style='Content.TFrame')
-        
-        self.file_frame.bind("<Configure>", 
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.file_frame, anchor="nw")
+        # Virtualized file list: only the visible rows have widgets, they get
+        # recycled while scrolling so the cost doesn't grow with the number of files
+        self.canvas = tk.Canvas(ff, highlightthickness=0, background='white')
+        sb = ttk.Scrollbar(ff, orient="vertical", command=self.on_scroll)
         self.canvas.configure(yscrollcommand=sb.set)
+        self.canvas.bind("<Configure>", self.on_canvas_configure)
+        self.bind_mousewheel(self.canvas)
+
+        # Keyboard reordering of the selected rows
+        self.canvas.bind("<Alt-Up>", lambda e: self.move_selection(-1))
+        self.canvas.bind("<Alt-Down>", lambda e: self.move_selection(1))
+        self.canvas.bind("<Alt-Prior>", lambda e: self.move_selection(-self.page_rows()))
+        self.canvas.bind("<Alt-Next>", lambda e: self.move_selection(self.page_rows()))
+        self.canvas.bind("<Alt-Home>", lambda e: self.move_selection(-len(self.files)))
+        self.canvas.bind("<Alt-End>", lambda e: self.move_selection(len(self.files)))
 
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         sb.pack(side=tk.RIGHT, fill=tk.Y)
 
+        self.row_pool = []  # Recycled row widgets, row_pool[k] shows position first_row + k
+        self.first_row = 0
+        self.row_height = None  # Measured from the first row
+        self.drag_file = None
+        self.drag_line = None
+
         # Format Switch (Initially Hidden)
         self.format_frame = ttk.Frame(main)
         self.format_frame.pack_forget()
@@ -101,24 +140,99 @@ class FileMerger:
         ttk.Label(of, text="File Name:").pack(side=tk.LEFT)
         self.out_entry = ttk.Entry(of)
         self.out_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+        ttk.Checkbutton(of, text="Reuse last merge", variable=self.incremental).pack(side=tk.LEFT)
+        ttk.Checkbutton(of, text="Low memory (no bookmarks)", variable=self.large_job).pack(side=tk.LEFT)
 
         # Button frame
         button_frame = ttk.Frame(main)
         button_frame.pack(pady=5)
-        ttk.Button(button_frame, text="Merge Files", command=self.merge).pack(side=tk.LEFT, padx=2)
+        self.merge_button = ttk.Button(button_frame, text="Merge Files", command=self.merge)
+        self.merge_button.pack(side=tk.LEFT, padx=2)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_merge, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=2)
         ttk.Button(button_frame, text="Open Directory", command=self.open_result_directory).pack(side=tk.LEFT, padx=2)
 
+        # Progress (only shown while a merge is running)
+        self.progress = ttk.Progressbar(main, orient=tk.HORIZONTAL, mode='determinate')
+        self.merge_thread = None
+        self.merge_cancel = threading.Event()
+        self.merge_queue = queue.Queue()
+
+        # Converted images and text files are reused across merges
+        self.conversion_cache = ConversionCache(os.path.join(os.path.expanduser("~"), ".docmerger", "cache"))
+
+        # Previews are made in the background for the rows in view and kept on disk
+        self.thumbnail_loader = ThumbnailLoader(
+            ThumbnailCache(os.path.join(os.path.expanduser("~"), ".docmerger", "thumbnails")))
+        self.thumbnail_images = OrderedDict()  # (path, mtime) -> PhotoImage or None, least recently used first
+        self.blank_thumbnail = tk.PhotoImage(width=THUMBNAIL_SIZE[0], height=THUMBNAIL_SIZE[1])
+        self.root.after(100, self.poll_thumbnails)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
         # Status
         self.status = ttk.Label(main, wraplength=400)
         self.status.pack()
 
+        self.root.after(200, self.poll_index)
+
     def browse(self):
         dir = filedialog.askdirectory()
         if dir:
             self.source_dir = dir
             self.dir_entry.delete(0, tk.END)
             self.dir_entry.insert(0, dir)
-            self.update_list()
+            self.rescan_directory()
+
+    def rescan_directory(self):
+        """Indexes the source directory on a background thread, update_list() runs when it's done"""
+        if not self.source_dir:
+            return
+        if self.index is not None:
+            self.index.stop()
+        index = DirectoryIndex(self.source_dir, recursive=self.recursive.get(), exclude_dirs={"result"})
+        self.index = index
+
+        self.files.set_files([])
+        self.canvas.yview_moveto(0)
+        self.refresh_file_list()
+        self.on_file_select()
+        self.status.config(text="Scanning...")
+
+        def scan():
+            try:
+                self.index_queue.put(("scanned", index, index.scan()))
+            except OSError as e:
+                self.index_queue.put(("error", index, e))
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def poll_index(self):
+        """Applies directory scan results and changes on the Tk main loop"""
+        try:
+            while True:
+                msg = self.index_queue.get_nowait()
+                index = msg[1]
+                if index is not self.index:
+                    continue  # From a directory we already left
+
+                if msg[0] == "scanned":
+                    self.unreported_scan = index.scan_seconds
+                    self.status.config(text="")
+                    self.update_list()
+                    index.watch(INDEX_POLL_SECONDS,
+                                lambda added, removed: self.index_queue.put(("changed", index, added, removed)))
+                elif msg[0] == "changed":
+                    _, _, added, removed = msg
+                    self.files.remove_files(removed)
+                    self.files.add_files(sorted(f for f in added if index.get(f) is not None
+                                                and index.get(f).ext in self.extensions_filter))
+                    self.refresh_file_list()
+                    self.on_file_select()
+                else:
+                    self.status.config(text=f"Error: {str(msg[2])}")
+        except queue.Empty:
+            pass
+        self.root.after(200, self.poll_index)
 
     def filter_files(self):
         """Handles the extension filter checkboxes and updates file list"""
@@ -129,8 +243,7 @@ class FileMerger:
     def on_file_select(self, *args):
         """Handle individual file selection changes"""
         # Check if any files are selected
-        any_selected = any(var.get() for var in self.doc_vars.values())
-        if any_selected:
+        if self.files.checked:
             self.format_frame.pack(fill=tk.X, pady=2)
             self.update_format_options()
         else:
@@ -138,49 +251,27 @@ class FileMerger:
 
     def update_list(self, preserve_selection=False):
         """Updates the file list based on the selected directory and extension filter"""
-        # Store current selections if needed
-        current_selections = {}
-        if preserve_selection:
-            current_selections = {file: var.get() for file, var in self.doc_vars.items()}
-
-        # Clear existing variables
-        self.doc_vars.clear()
-
-        if self.source_dir:
-            for f in sorted(os.listdir(self.source_dir)):
-                ext = os.path.splitext(f)[1].lower()
-                if ext in self.extensions_filter:
-                    # Default to unselected (0), unless we're preserving a previous selected state
-                    initial_value = current_selections.get(f, 0)
-                    var = tk.IntVar(value=initial_value)
-                    var.trace_add('write', self.on_file_select)  # Add trace to variable
-                    self.doc_vars[f] = var
-
-            # After creating all variables, refresh the display
-            self.refresh_file_list()
+        # Files start unchecked, unless we're preserving a previous selected state
+        checked = self.files.checked if preserve_selection else ()
+
+        # Filtering only reads the cached index, not the filesystem
+        files = self.index.files(self.extensions_filter) if self.index is not None else []
+        self.files.set_files(files, checked)
+
+        if not preserve_selection:
+            self.canvas.yview_moveto(0)
+        self.refresh_file_list()
 
         # Show or hide format options based on selection state
         self.on_file_select()
 
     def update_format_options(self):
         """Update the export options based on selected file types"""
-        selected_files = [os.path.join(self.source_dir, file) for file, var in self.doc_vars.items() if var.get()]
-        
-        if not selected_files:
+        if not self.files.checked:
             self.format_frame.pack_forget()
             return
-        
-        file_types = {os.path.splitext(f)[1].lower() for f in selected_files}
-
-        # Always allow PDF as default
-        available_formats = [".pdf"]
 
-        # If all selected files are text files, allow txt format
-        if file_types == {".txt"}:
-            available_formats.append(".txt")
-        # If all selected files are images, allow png format
-        elif all(ext in self.image_types for ext in file_types):
-            available_formats.append(".png")
+        available_formats = merge_engine.formats_for_types(self.files.checked_types)
 
         self.format_dropdown.config(values=available_formats)
 
@@ -189,6 +280,9 @@ class FileMerger:
 
     def merge(self):
         """Merges the selected files and exports them in the chosen format"""
+        if self.merge_thread is not None:
+            return  # A merge is already running
+
         if not self.source_dir:
             messagebox.showerror("Error", "Select directory first!")
             return
@@ -198,8 +292,8 @@ class FileMerger:
             messagebox.showerror("Error", "Enter output filename!")
             return
 
-        # Get selected files in the order they appear in self.doc_vars
-        selected = [os.path.join(self.source_dir, file) for file, var in self.doc_vars.items() if var.get()]
+        # Get selected files in the order they appear in the list, with their page ranges
+        selected = self.files.merge_inputs(self.source_dir)
 
         if not selected:
             messagebox.showerror("Error", "Select at least one file!")
@@ -219,100 +313,88 @@ class FileMerger:
                 f"The file '{os.path.basename(out_file)}' already exists.\nDo you want to overwrite it?"):
                 return
 
+        # Run the merge on a worker thread, it reports back through merge_queue
+        self.merge_cancel.clear()
+        self.progress.config(value=0, maximum=len(selected) + 1)
+        self.progress.pack(fill=tk.X, pady=2, before=self.status)
+        self.merge_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.status.config(text="Merging...")
+
+        # The directory scan isn't part of the merge, it's only reported once
+        scan_seconds, self.unreported_scan = self.unreported_scan, None
+        self.merge_thread = threading.Thread(
+            target=self.run_merge,
+            args=(selected, out_file, self.selected_format.get(), self.incremental.get(), self.large_job.get(),
+                  scan_seconds),
+            daemon=True)
+        self.merge_thread.start()
+        self.root.after(50, self.poll_merge)
+
+    def run_merge(self, selected, out_file, format_type, incremental=False, large_job=False, scan_seconds=None):
+        """Worker thread body, never touches Tk widgets directly"""
+        def progress(done, total, message):
+            self.merge_queue.put(("progress", done, total, message))
+
+        def summary():
+            text = metrics.summary()
+            if scan_seconds is not None:
+                text += f", directory scan {scan_seconds:.1f} s"
+            return text
+
+        metrics = merge_metrics.MergeMetrics()
         try:
-            format_type = self.selected_format.get().lower()
-
-            if format_type == ".png":
-                # Get dimensions for the combined image
-                images = []
-                total_height = 0
-                max_width = 0
-
-                # Process images in the order they appear in the list
-                for file in selected:
-                    img = Image.open(file)
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    images.append(img)
-                    total_height += img.height
-                    max_width = max(max_width, img.width)
-
-                # Create a new image with the combined dimensions
-                combined_image = Image.new('RGB', (max_width, total_height), 'white')
-                
-                # Paste each image in order
-                y_offset = 0
-                for img in images:
-                    # Center the image if it's smaller than max_width
-                    x_offset = (max_width - img.width) // 2
-                    combined_image.paste(img, (x_offset, y_offset))
-                    y_offset += img.height
-
-                # Save the combined image
-                combined_image.save(out_file, 'PNG')
-                
-                if os.path.exists(out_file):
-                    self.status.config(text=f"✓ Success! Saved as: {out_file}")
-                return
-
-            elif format_type == ".txt":
-                # Merge text files in order
-                with open(out_file, 'w', encoding='utf-8') as outfile:
-                    for idx, file in enumerate(selected):
-                        with open(file, 'r', encoding='utf-8') as infile:
-                            if idx > 0:  # Add a separator between files
-                                outfile.write('\n\n' + '='*50 + '\n\n')
-                            outfile.write(infile.read())
-                
-                if os.path.exists(out_file):
-                    self.status.config(text=f"✓ Success! Saved as: {out_file}")
-                return
-
-            elif format_type == ".pdf":
-                pdf_merger = PdfMerger()
-                temp_pdf_files = []
-
-                # Convert each file to PDF in order
-                for file in selected:
-                    if file.lower().endswith(".pdf"):
-                        pdf_merger.append(file)
-                    elif file.lower().endswith((".jpg", ".jpeg", ".png")):
-                        img = Image.open(file).convert("RGB")
-                        temp_pdf_path = os.path.join(result_dir, f"temp_{os.path.basename(file)}.pdf")
-                        img.save(temp_pdf_path)
-                        pdf_merger.append(temp_pdf_path)
-                        temp_pdf_files.append(temp_pdf_path)
-                    elif file.lower().endswith(".txt"):
-                        pdf = FPDF()
-                        pdf.add_page()
-                        pdf.set_auto_page_break(auto=True, margin=15)
-                        pdf.set_font("Arial", size=12)
-                        with open(file, "r", encoding="utf-8") as f:
-                            text_content = f.read()
-                            pdf.multi_cell(0, 10, text_content)
-                        temp_pdf_path = os.path.join(result_dir, f"temp_{os.path.basename(file)}.pdf")
-                        pdf.output(temp_pdf_path)
-                        pdf_merger.append(temp_pdf_path)
-                        temp_pdf_files.append(temp_pdf_path)
-
-                if len(pdf_merger.pages) > 0:
-                    with open(out_file, 'wb') as f_out:
-                        pdf_merger.write(f_out)
-                        pdf_merger.close()
-                
-                # Clean up temporary files
-                for temp_pdf in temp_pdf_files:
-                    os.remove(temp_pdf)
+            result = merge_engine.merge(selected, out_file, format_type,
+                                        {"cache": self.conversion_cache, "incremental": incremental,
+                                         "large_job": large_job, "metrics": metrics},
+                                        progress=progress, cancel=self.merge_cancel)
+            self.merge_queue.put(("done", result, summary()))
+        except merge_engine.MergeCancelled:
+            self.merge_queue.put(("cancelled",))
+        except Exception as e:
+            self.merge_queue.put(("error", e, summary()))
 
-            else:
-                self.status.config(text="NotImplementedException")
+    def poll_merge(self):
+        """Applies progress messages from the worker thread on the Tk main loop"""
+        finished = False
+        try:
+            while True:
+                msg = self.merge_queue.get_nowait()
+                if msg[0] == "progress":
+                    _, done, total, message = msg
+                    self.progress.config(value=done, maximum=total)
+                    self.status.config(text=f"Merging {done}/{total}: {message}")
+                    continue
+
+                finished = True
+                if msg[0] == "done":
+                    _, result, summary = msg
+                    if result and os.path.exists(result):
+                        self.status.config(text=f"✓ Success! Saved as: {result} ({summary})")
+                    else:
+                        self.status.config(text="Nothing to merge.")
+                elif msg[0] == "cancelled":
+                    self.status.config(text="Merge cancelled.")
+                else:
+                    self.status.config(text=f"Error: {str(msg[1])}")
+                    print(f"Merge failed: {msg[1]} ({msg[2]})")
+        except queue.Empty:
+            pass
 
-            if os.path.exists(out_file):
-                self.status.config(text=f"✓ Success! Saved as: {out_file}")
+        if finished:
+            self.merge_thread = None
+            self.progress.pack_forget()
+            self.merge_button.config(state=tk.NORMAL)
+            self.cancel_button.config(state=tk.DISABLED)
+        else:
+            self.root.after(50, self.poll_merge)
 
-        except Exception as e:
-            self.status.config(text=f"Error: {str(e)}")
-            print(f"Merge failed: {e}")
+    def cancel_merge(self):
+        """Asks the running merge to stop, it cleans up its own partial output"""
+        if self.merge_thread is not None:
+            self.merge_cancel.set()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status.config(text="Cancelling...")
 
     def open_result_directory(self):
         """Opens the result directory in file explorer"""
@@ -327,9 +409,9 @@ class FileMerger:
 
     def select_all_files(self):
         """Select all files in the list"""
-        for var in self.doc_vars.values():
-            var.set(1)
-        if self.doc_vars:
+        self.files.check_all()
+        self.render_rows()
+        if self.files:
             self.format_frame.pack(fill=tk.X, pady=2)
             self.update_format_options()
         else:
@@ -337,196 +419,275 @@ class FileMerger:
 
     def select_none_files(self):
         """Deselect all files in the list"""
-        for var in self.doc_vars.values():
-            var.set(0)
+        self.files.check_none()
+        self.render_rows()
         self.format_frame.pack_forget()
         self.update_format_options()
 
-    def start_drag(self, event, row_frame):
-        """Start dragging a file"""
-        row_frame.drag_start_y = event.y_root
-        
-        # Find the checkbutton in the content frame and get its text
-        for child in row_frame.winfo_children():
-            if isinstance(child, ttk.Frame):  # content frame
-                for content_child in child.winfo_children():
-                    if isinstance(content_child, ttk.Checkbutton):
-                        row_frame.dragged_file = content_child.cget('text')
-                        break
-        
-        if not hasattr(row_frame, 'dragged_file'):
-            return  # Exit if we couldn't find the file name
-            
-        # Create a drag indicator line
-        self.drag_line = ttk.Separator(self.file_frame, orient='horizontal', style='DragLine.TSeparator')
-        # Configure drag style and lift
-        row_frame.configure(style='Dragged.TFrame')
-        row_frame.lift()
-        
-        # Add shadow effect
-        row_frame.configure(relief='solid', borderwidth=1)
+    def bind_mousewheel(self, widget):
+        """Scroll the file list with the mouse wheel over widget"""
+        widget.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda e: self.scroll_rows(-1))  # Linux
+        widget.bind("<Button-5>", lambda e: self.scroll_rows(1))
+
+    def scroll_rows(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.render_rows()
+
+    def on_scroll(self, *args):
+        """Scrollbar command, scrolls the canvas and recycles the rows"""
+        self.canvas.yview(*args)
+        self.render_rows()
+
+    def on_canvas_configure(self, event):
+        """Keep rows as wide as the canvas and fill newly visible space"""
+        for row_frame in self.row_pool:
+            self.canvas.itemconfigure(row_frame.window, width=max(1, event.width - 16))
+        self.render_rows()
+
+    def page_rows(self):
+        """Number of rows that fit in the list"""
+        return max(1, self.canvas.winfo_height() // (self.row_height or 1))
+
+    def create_row(self):
+        """Create a row widget for the pool, render_rows() fills in the file"""
+        # Create a frame for each file row
+        row_frame = ttk.Frame(self.canvas, style='FileRow.TFrame')
+        row_frame.filename = None
+        row_frame.var = tk.IntVar(value=0)
+        row_frame.pages_var = tk.StringVar(value="")
+        row_frame.loading = False  # Set while show_row() fills in the row
+
+        # Create a container for the drag handle
+        handle_frame = ttk.Frame(row_frame, style='FileRow.TFrame')
+        handle_frame.pack(side=tk.LEFT, padx=(0, 5))
+
+        # Add drag indicator with improved visibility
+        drag_handle = ttk.Label(handle_frame, text=" : ", cursor="fleur", style='DragHandle.TLabel')
+        drag_handle.pack(padx=(5, 0), pady=5)
+
+        # Create a container for the checkbox and filename
+        content_frame = ttk.Frame(row_frame, style='FileRow.TFrame')
+        content_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 8))
+        row_frame.inner_frames = (handle_frame, content_frame)
+
+        # Page range of a PDF, e.g. "1-3,10", empty for all pages
+        row_frame.pages = ttk.Entry(content_frame, textvariable=row_frame.pages_var, width=10)
+        row_frame.pages.pack(side=tk.RIGHT, padx=(5, 0))
+        row_frame.pages_var.trace_add("write", lambda *args: self.edit_page_range(row_frame))
+
+        # First page preview, filled in by poll_thumbnails() once it's ready
+        row_frame.thumb = ttk.Label(content_frame, image=self.blank_thumbnail, style='Thumbnail.TLabel')
+        row_frame.thumb.pack(side=tk.LEFT, padx=(0, 5), pady=2)
+
+        # Checkbutton for file selection, the row's variable is reused for whatever file it shows
+        row_frame.check = ttk.Checkbutton(content_frame, style='FileCheckbutton.TCheckbutton', width=50,
+                                          variable=row_frame.var, command=lambda: self.toggle_row(row_frame))
+        row_frame.check.pack(side=tk.LEFT, fill=tk.X, expand=True, anchor="w")
+
+        # Make both the handle and its container draggable, Ctrl/Shift-click selects several rows
+        for widget in (drag_handle, handle_frame):
+            widget.bind('<Button-1>', lambda e, rf=row_frame: self.start_drag(e, rf))
+            widget.bind('<Control-Button-1>', lambda e, rf=row_frame: self.start_drag(e, rf, toggle=True))
+            widget.bind('<Shift-Button-1>', lambda e, rf=row_frame: self.start_drag(e, rf, extend=True))
+            widget.bind('<B1-Motion>', lambda e, rf=row_frame: self.drag(e, rf))
+            widget.bind('<ButtonRelease-1>', lambda e, rf=row_frame: self.stop_drag(e, rf))
+        for widget in (row_frame, handle_frame, drag_handle, content_frame, row_frame.thumb, row_frame.check,
+                       row_frame.pages):
+            self.bind_mousewheel(widget)
+
+        row_frame.window = self.canvas.create_window(
+            8, 0, window=row_frame, anchor="nw", state="hidden",
+            width=max(1, self.canvas.winfo_width() - 16))
+        self.row_pool.append(row_frame)
+        return row_frame
+
+    def toggle_row(self, row_frame):
+        """Checkbutton command, copies the row's state into the list model"""
+        if row_frame.filename is not None:
+            self.files.set_checked(row_frame.filename, row_frame.var.get())
+            self.on_file_select()
+
+    def edit_page_range(self, row_frame):
+        """Entry trace, copies a typed page range into the list model"""
+        if row_frame.filename is not None and not row_frame.loading:
+            self.files.set_page_range(row_frame.filename, row_frame.pages_var.get())
+
+    def show_row(self, row_frame, idx):
+        """Point a pooled row at the file at position idx"""
+        filename = self.files[idx]
+        if row_frame.filename != filename:
+            row_frame.check.configure(text=filename)
+            row_frame.filename = filename
+            is_pdf = merge_engine.file_type(filename) in merge_engine.PDF_TYPES
+            row_frame.loading = True
+            row_frame.pages_var.set(self.files.page_range(filename))
+            row_frame.loading = False
+            row_frame.pages.configure(state=tk.NORMAL if is_pdf else tk.DISABLED)
+            self.show_thumbnail(row_frame)
+        row_frame.var.set(1 if self.files.is_checked(filename) else 0)
+        inner_style = 'Selected.TFrame' if filename in self.files.selected else 'FileRow.TFrame'
+        row_frame.configure(style='Dragged.TFrame' if filename == self.drag_file else inner_style)
+        for frame in row_frame.inner_frames:
+            frame.configure(style=inner_style)
+        self.canvas.coords(row_frame.window, 8, idx * self.row_height + 1)
+        self.canvas.itemconfigure(row_frame.window, state="normal")
+
+    def thumbnail_key(self, filename):
+        """Thumbnails are looked up by path and mtime, so an edited file gets a new one"""
+        entry = self.index.get(filename) if self.index is not None else None
+        return os.path.join(self.source_dir, filename), entry.mtime if entry is not None else None
+
+    def show_thumbnail(self, row_frame):
+        """Show the row's preview if it's loaded, otherwise ask for it"""
+        key = self.thumbnail_key(row_frame.filename)
+        if key in self.thumbnail_images:
+            self.thumbnail_images.move_to_end(key)
+            image = self.thumbnail_images[key] or self.blank_thumbnail
+        else:
+            image = self.blank_thumbnail
+            self.thumbnail_loader.request(key[0])
+        row_frame.thumb.configure(image=image)
+
+    def poll_thumbnails(self):
+        """Picks up finished thumbnails and shows them in the rows in view"""
+        for path, data in self.thumbnail_loader.poll():
+            filename = os.path.relpath(path, self.source_dir) if self.source_dir else path
+            key = self.thumbnail_key(filename)
+            image = tk.PhotoImage(data=base64.b64encode(data)) if data else None
+            self.thumbnail_images[key] = image
+            if len(self.thumbnail_images) > THUMBNAIL_MEMORY:
+                self.thumbnail_images.popitem(last=False)
+            for row_frame in self.row_pool:
+                if row_frame.filename == filename:
+                    row_frame.thumb.configure(image=image or self.blank_thumbnail)
+        self.root.after(100, self.poll_thumbnails)
+
+    def close(self):
+        """Window close, stops the background work before Tk goes away"""
+        self.thumbnail_loader.close()
+        if self.index is not None:
+            self.index.stop()
+        self.root.destroy()
+
+    def render_rows(self, changed=None):
+        """Show the rows in view, reusing pooled widgets. Costs O(visible rows).
+
+        changed is an optional (first, last) range of positions that changed;
+        if the view didn't scroll only the rows showing those positions are updated.
+        """
+        if self.row_height is None:
+            if not self.files:
+                return
+            # Measure the row height once from a real row
+            row_frame = self.create_row()
+            row_frame.update_idletasks()
+            self.row_height = row_frame.winfo_reqheight() + 2
+            self.canvas.configure(yscrollincrement=self.row_height)
+
+        first = max(0, int(self.canvas.canvasy(0) // self.row_height))
+        visible = self.canvas.winfo_height() // self.row_height + 2
+        if changed is not None and first == self.first_row and len(self.row_pool) >= visible:
+            lo, hi = changed
+            for idx in range(max(lo, first), min(hi, first + visible - 1, len(self.files) - 1) + 1):
+                self.show_row(self.row_pool[idx - first], idx)
+            return
+
+        total_height = len(self.files) * self.row_height
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), total_height))
+        self.first_row = first
+        while len(self.row_pool) < visible:
+            self.create_row()
+
+        for offset, row_frame in enumerate(self.row_pool):
+            idx = first + offset
+            if offset >= visible or idx >= len(self.files):
+                self.canvas.itemconfigure(row_frame.window, state="hidden")
+                row_frame.filename = None
+            else:
+                self.show_row(row_frame, idx)
+
+        # Thumbnails still queued for rows that scrolled away aren't needed anymore
+        self.thumbnail_loader.retain(os.path.join(self.source_dir, rf.filename)
+                                     for rf in self.row_pool if rf.filename is not None)
+
+    def scroll_to(self, idx):
+        """Scroll just enough to make position idx visible"""
+        if not self.row_height:
+            return
+        first = int(self.canvas.canvasy(0) // self.row_height)
+        rows = self.page_rows()
+        if idx < first:
+            self.canvas.yview_scroll(idx - first, "units")
+        elif idx >= first + rows:
+            self.canvas.yview_scroll(idx - first - rows + 1, "units")
+
+    def move_selection(self, step):
+        """Keyboard reordering, moves the selected rows step rows up or down"""
+        if self.drag_file is not None or not self.files.selected:
+            return "break"
+        changed = self.files.move_selection(step)
+        positions = self.files.selected_positions()
+        self.scroll_to(positions[0] if step < 0 else positions[-1])
+        self.render_rows(changed)
+        return "break"
+
+    def start_drag(self, event, row_frame, toggle=False, extend=False):
+        """Select the row and start dragging the selected files"""
+        if row_frame.filename is None:
+            return  # Exit if the row isn't showing a file
+        self.canvas.focus_set()  # For the keyboard shortcuts
+        self.files.select(row_frame.filename, toggle=toggle, extend=extend)
+        if row_frame.filename in self.files.selected:
+            self.drag_file = row_frame.filename
+            # Create a drag indicator line
+            self.drag_line = self.canvas.create_line(0, 0, 0, 0, fill='#0078d7', width=2)
+        self.render_rows()
 
     def drag(self, event, row_frame):
-        """Handle dragging of a file"""
-        if not hasattr(row_frame, 'drag_start_y') or not hasattr(row_frame, 'dragged_file'):
+        """Handle dragging of the selected files"""
+        if self.drag_file is None or not self.row_height:
             return
 
-        # Get mouse position relative to file frame
-        mouse_y = event.y_root - self.file_frame.winfo_rooty()
-        
-        # Get all row frames except the dragged one
-        frames = [w for w in self.file_frame.winfo_children() 
-                 if isinstance(w, ttk.Frame) and w != row_frame and not isinstance(w, ttk.Separator)]
-        
-        # Move the dragged frame with slight transparency effect
-        row_frame.place(y=max(0, mouse_y - row_frame.winfo_height()/2))
-        
-        # Reset all frames to normal style
-        for frame in frames:
-            frame.configure(style='FileRow.TFrame')
-        
-        # Get current index of dragged file in the ordered dictionary
-        files = list(self.doc_vars.keys())
-        try:
-            current_index = files.index(row_frame.dragged_file)
-            
-            # Find insertion point and show drag line
-            new_index = current_index  # Default to current position
-            insert_y = 0
-            
-            # If no frames, just show the line at mouse position
-            if not frames:
-                insert_y = mouse_y
+        # Scroll when the mouse leaves the list while dragging
+        mouse_y = event.y_root - self.canvas.winfo_rooty()
+        if mouse_y < 0:
+            self.canvas.yview_scroll(-1, "units")
+        elif mouse_y > self.canvas.winfo_height():
+            self.canvas.yview_scroll(1, "units")
+
+        current_index = self.files.position(self.drag_file)
+        new_index = int(self.canvas.canvasy(mouse_y) // self.row_height)
+        new_index = min(max(new_index, 0), len(self.files) - 1)
+
+        # Only reorder if the position has changed, and only redraw the rows that moved
+        changed = None
+        if new_index != current_index:
+            positions = self.files.selected_positions()
+            if len(positions) == 1:
+                changed = self.files.move(current_index, new_index)
             else:
-                # Get the frame positions and heights
-                frame_positions = [(frame.winfo_y(), frame.winfo_height()) for frame in frames]
-                
-                # Find the appropriate insertion point
-                found_position = False
-                for i, (frame_y, frame_height) in enumerate(frame_positions):
-                    frame_bottom = frame_y + frame_height
-                    
-                    if mouse_y < frame_y + (frame_height * 0.5):  # Upper half of the frame
-                        new_index = i
-                        if i >= current_index:
-                            new_index = i
-                        else:
-                            new_index = i
-                        insert_y = frame_y
-                        frames[i].configure(style='DropTarget.TFrame')
-                        found_position = True
-                        break
-                
-                # If we haven't found a position, we're at the bottom
-                if not found_position:
-                    new_index = len(frames)
-                    if current_index < len(frames):  # Only adjust if we're moving down
-                        new_index = len(frames)
-                    insert_y = frame_positions[-1][0] + frame_positions[-1][1]
-            
-            # Update drag line position with more visible style
-            self.drag_line.place(y=insert_y, relwidth=1, height=2)
-            self.drag_line.lift()
-            row_frame.lift()
-
-            # Only reorder if the position has changed
-            if new_index != current_index:
-                # Move the file to new position
-                files_copy = files.copy()
-                file_to_move = files_copy.pop(current_index)
-                files_copy.insert(new_index, file_to_move)
-                
-                # Recreate ordered dictionary with new order
-                selections = {f: self.doc_vars[f].get() for f in self.doc_vars}
-                self.doc_vars.clear()
-                for f in files_copy:
-                    var = tk.IntVar(value=selections[f])
-                    var.trace_add('write', self.on_file_select)
-                    self.doc_vars[f] = var
-                
-                # Update display but keep the dragged frame
-                self.refresh_file_list(dragged_frame=row_frame)
-                
-                # Restore drag state
-                row_frame.drag_start_y = event.y_root
-                row_frame.dragged_file = file_to_move
-                row_frame.lift()
-                self.drag_line.lift()
-        except ValueError:
-            pass
+                # Keep the dragged file under the mouse, the rest of the selection packs around it
+                changed = self.files.move_block(positions, new_index - positions.index(current_index))
+        self.render_rows(changed)
+
+        # Update drag line position above the dragged file
+        line_y = self.files.position(self.drag_file) * self.row_height
+        self.canvas.coords(self.drag_line, 0, line_y, self.canvas.winfo_width(), line_y)
+        self.canvas.tag_raise(self.drag_line)
 
     def stop_drag(self, event, row_frame):
         """Stop dragging a file"""
-        if hasattr(row_frame, 'drag_start_y'):
-            del row_frame.drag_start_y
-        if hasattr(row_frame, 'dragged_file'):
-            del row_frame.dragged_file
+        self.drag_file = None
         # Remove drag line
-        if hasattr(self, 'drag_line'):
-            self.drag_line.destroy()
-            del self.drag_line
-        # Update display normally
-        self.refresh_file_list()
-
-    def refresh_file_list(self, dragged_frame=None):
-        """Refresh the file list display"""
-        # Store current frames' positions
-        current_frames = {}
-        for w in self.file_frame.winfo_children():
-            if isinstance(w, ttk.Frame) and w != dragged_frame:
-                # Find the checkbutton in the content frame
-                for child in w.winfo_children():
-                    if isinstance(child, ttk.Frame):  # This is the content frame
-                        for content_child in child.winfo_children():
-                            if isinstance(content_child, ttk.Checkbutton):
-                                current_frames[content_child.cget('text')] = w.winfo_y()
-                                break
-        
-        # Clear all frames except the dragged one
-        for w in self.file_frame.winfo_children():
-            if w != dragged_frame and not isinstance(w, ttk.Separator):
-                w.destroy()
-
-        # Configure row style
-        style = ttk.Style()
-        style.configure('FileRow.TFrame', background='white')
-
-        for idx, (filename, var) in enumerate(self.doc_vars.items()):
-            # Skip creating new frame for dragged item
-            if dragged_frame and hasattr(dragged_frame, 'dragged_file') and dragged_frame.dragged_file == filename:
-                continue
-
-            # Create a frame for each file row
-            row_frame = ttk.Frame(self.file_frame, style='FileRow.TFrame')
-            row_frame.pack(fill=tk.X, padx=8, pady=1)
-
-            # Create a container for the drag handle
-            handle_frame = ttk.Frame(row_frame, style='FileRow.TFrame')
-            handle_frame.pack(side=tk.LEFT, padx=(0, 5))
-
-            # Add drag indicator with improved visibility
-            drag_handle = ttk.Label(handle_frame, text=" : ", cursor="fleur", style='DragHandle.TLabel')
-            drag_handle.pack(padx=(5, 0), pady=5)
-
-            # Create a container for the checkbox and filename that allows text wrapping
-            content_frame = ttk.Frame(row_frame, style='FileRow.TFrame')
-            content_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 8))
-
-            # Checkbutton for file selection with improved layout and text wrapping
-            check = ttk.Checkbutton(content_frame, text=filename, variable=var, 
-                                  style='FileCheckbutton.TCheckbutton', width=63)  # Set width to allow wrapping
-            check.pack(side=tk.LEFT, fill=tk.X, expand=True, anchor="w")
-            
-            # Make both the handle and its container draggable
-            for widget in (drag_handle, handle_frame):
-                widget.bind('<Button-1>', lambda e, rf=row_frame: self.start_drag(e, rf))
-                widget.bind('<B1-Motion>', lambda e, rf=row_frame: self.drag(e, rf))
-                widget.bind('<ButtonRelease-1>', lambda e, rf=row_frame: self.stop_drag(e, rf))
-
-            # Try to maintain position if it existed before
-            if filename in current_frames:
-                row_frame.update_idletasks()
-                self.canvas.yview_moveto(current_frames[filename] / self.file_frame.winfo_height())
+        if self.drag_line is not None:
+            self.canvas.delete(self.drag_line)
+            self.drag_line = None
+        self.render_rows()
+
+    def refresh_file_list(self):
+        """Refresh the file list display after the list was replaced"""
+        self.render_rows()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+"""Deterministic test corpus for merge_benchmark.py.
+
+generate(directory, scale) writes the same files byte for byte on every run,
+so timings and output sizes can be compared between runs and machines:
+
+    many_small/   one page PDFs sharing a font and a logo, like letters or invoices
+    huge/         a single PDF with a deep page tree and inherited attributes
+    scans/        full A4 page scans at 300 dpi as JPEG, and at 150 dpi as PNG
+    text/         large UTF-8 logs, with a few cp1252 lines mixed in
+    text_small/   short text files, for rendering text to PDF
+    mixed/        a folder with a bit of everything, as the GUI usually sees it
+
+scale multiplies every file count and size; 1 is a quick run of a minute or
+so, about 40 gets the text folder into the multi-GB range of real workloads.
+A corpus.json records the scale, a folder generated at the same scale by the
+same CORPUS_VERSION is reused.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import zlib
+
+from PIL import Image, ImageDraw
+
+
+# Bump when the generated files change, so old corpora are generated again
+CORPUS_VERSION = 1
+
+SEED = 20240501
+
+# Counts and sizes at scale 1
+MANY_SMALL_PDFS = 500
+HUGE_PDF_PAGES = 2000
+PAGE_TREE_FANOUT = 16
+JPEG_SCANS = 12
+PNG_SCANS = 4
+TEXT_FILES = 4
+TEXT_FILE_BYTES = 16 * 1024 * 1024
+SMALL_TEXT_FILES = 20
+SMALL_TEXT_BYTES = 20 * 1024
+MIXED_FILES = 60
+
+A4_POINTS = (595, 842)
+A4_300DPI = (2480, 3508)
+A4_150DPI = (1240, 1754)
+
+WORDS = ("invoice", "total", "amount", "customer", "order", "delivery", "report", "quarter", "summary",
+         "payment", "account", "balance", "reference", "page", "section", "review", "approved", "pending",
+         "shipment", "warehouse", "contract", "signature", "schedule", "attached", "the", "and", "of", "for")
+
+
+def _scaled(count, scale):
+    return max(1, round(count * scale))
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _logo():
+    """A small RGB image shared by every generated PDF, returns (width, height, raw pixels)"""
+    size = 64
+    pixels = bytearray()
+    for y in range(size):
+        for x in range(size):
+            pixels += bytes((x * 4 % 256, y * 4 % 256, (x + y) * 2 % 256))
+    return size, size, bytes(pixels)
+
+
+def _page_content(rng, lines=40):
+    out = [b"q 48 0 0 48 500 770 cm /Im1 Do Q", b"BT /F1 10 Tf 14 TL 56 780 Td"]
+    for _ in range(lines):
+        out.append(b"(%s) '" % _sentence(rng).encode("ascii"))
+    out.append(b"ET")
+    return b"\n".join(out)
+
+
+def write_pdf(path, contents, fanout=None):
+    """Writes a PDF with one page per content stream.
+
+    Every page uses a Helvetica font and a logo from the page tree's shared
+    /Resources. With fanout, pages are grouped into a tree of /Pages nodes
+    with at most fanout kids each, and the page size is inherited from the root.
+    """
+    objects = {}  # Number -> body
+    font_num, logo_num = 3, 4
+    objects[font_num] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    width, height, pixels = _logo()
+    data = zlib.compress(pixels, 6)
+    objects[logo_num] = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                         b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                         % (width, height, len(data), data))
+    next_num = [5]
+
+    def allocate():
+        num = next_num[0]
+        next_num[0] += 1
+        return num
+
+    # Pages and their content streams
+    kids = []
+    for content in contents:
+        content = zlib.compress(content, 6)
+        content_num, page_num = allocate(), allocate()
+        objects[content_num] = b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content)
+        objects[page_num] = [b"<< /Type /Page /Contents %d 0 R" % content_num, None]
+        kids.append((page_num, 1))
+
+    # Group them into intermediate /Pages nodes until the root's kids fit
+    while fanout and len(kids) > fanout:
+        grouped = []
+        for start in range(0, len(kids), fanout):
+            node_num = allocate()
+            group = kids[start:start + fanout]
+            objects[node_num] = [b"<< /Type /Pages /Kids [%s] /Count %d"
+                                 % (b" ".join(b"%d 0 R" % num for num, _ in group), sum(c for _, c in group)), None]
+            for num, _ in group:
+                objects[num][1] = node_num
+            grouped.append((node_num, sum(c for _, c in group)))
+        kids = grouped
+    for num, _ in kids:
+        objects[num][1] = 2
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = (b"<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 %d %d] "
+                  b"/Resources << /Font << /F1 %d 0 R >> /XObject << /Im1 %d 0 R >> >> >>"
+                  % (b" ".join(b"%d 0 R" % num for num, _ in kids), sum(c for _, c in kids), A4_POINTS[0], A4_POINTS[1],
+                     font_num, logo_num))
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = {}
+        for num in range(1, next_num[0]):
+            body = objects[num]
+            if isinstance(body, list):
+                body = body[0] + b" /Parent %d 0 R >>" % body[1]
+            offsets[num] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (num, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % next_num[0])
+        for num in range(1, next_num[0]):
+            f.write(b"%010d 00000 n \n" % offsets[num])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_num[0], xref))
+
+
+def write_scan(path, size, rng):
+    """Writes a grayish page with lines of "text" and paper noise, like a scanner would"""
+    img = Image.new("L", size, 245)
+    draw = ImageDraw.Draw(img)
+    margin = size[0] // 12
+    line = size[1] // 60
+    y = margin
+    while y < size[1] - margin:
+        x = margin
+        while x < size[0] - margin:
+            word = rng.randint(line, line * 5)
+            draw.rectangle((x, y, min(x + word, size[0] - margin), y + line // 2), fill=rng.randint(20, 80))
+            x += word + line // 2
+        y += line
+    noise = Image.frombytes("L", size, rng.randbytes(size[0] * size[1]))
+    img = Image.blend(img, noise, 0.08).convert("RGB")
+    if path.endswith(".png"):
+        img.save(path, "PNG")
+    else:
+        img.save(path, "JPEG", quality=85, dpi=(300, 300))
+
+
+def write_text(path, size, rng):
+    """Writes about size bytes of log lines, built from a few blocks to keep it fast"""
+    blocks = []
+    for _ in range(8):
+        lines = [f"{rng.randint(0, 10 ** 6):07d} {_sentence(rng, rng.randint(4, 16))}" for _ in range(250)]
+        blocks.append(("\n".join(lines) + "\n").encode("utf-8"))
+    # A few lines that are not valid UTF-8, so the fallback encoding gets used
+    blocks.append("caf\xe9 r\xe9sum\xe9 na\xefve € 12,50\n".encode("cp1252"))
+    written = 0
+    with open(path, 'wb') as f:
+        for block in itertools.cycle(blocks):
+            if written >= size:
+                break
+            f.write(block)
+            written += len(block)
+
+
+def generate(directory, scale=1.0, progress=None):
+    """Writes the corpus into directory, unless it's already there at this scale"""
+    info_path = os.path.join(directory, "corpus.json")
+    info = {"version": CORPUS_VERSION, "scale": scale}
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == info:
+                return directory
+    except (OSError, ValueError):
+        pass
+
+    rng = random.Random(SEED)
+    report = progress or (lambda message: None)
+
+    def folder(name):
+        path = os.path.join(directory, name)
+        os.makedirs(path, exist_ok=True)
+        for old in os.listdir(path):
+            os.remove(os.path.join(path, old))
+        return path
+
+    path = folder("many_small")
+    report(f"{_scaled(MANY_SMALL_PDFS, scale)} small PDFs")
+    for i in range(_scaled(MANY_SMALL_PDFS, scale)):
+        write_pdf(os.path.join(path, f"letter{i:05d}.pdf"), [_page_content(rng)])
+
+    path = folder("huge")
+    report(f"a {_scaled(HUGE_PDF_PAGES, scale)} page PDF")
+    write_pdf(os.path.join(path, "huge.pdf"),
+              (_page_content(rng) for _ in range(_scaled(HUGE_PDF_PAGES, scale))), fanout=PAGE_TREE_FANOUT)
+
+    path = folder("scans")
+    report(f"{_scaled(JPEG_SCANS, scale)} JPEG and {_scaled(PNG_SCANS, scale)} PNG scans")
+    for i in range(_scaled(JPEG_SCANS, scale)):
+        write_scan(os.path.join(path, f"scan{i:04d}.jpg"), A4_300DPI, rng)
+    for i in range(_scaled(PNG_SCANS, scale)):
+        write_scan(os.path.join(path, f"scan{i:04d}.png"), A4_150DPI, rng)
+
+    path = folder("text")
+    report(f"{_scaled(TEXT_FILES * TEXT_FILE_BYTES, scale) // 2 ** 20} MB of text")
+    for i in range(TEXT_FILES):
+        write_text(os.path.join(path, f"log{i:02d}.txt"), _scaled(TEXT_FILE_BYTES, scale), rng)
+
+    path = folder("text_small")
+    for i in range(_scaled(SMALL_TEXT_FILES, scale)):
+        write_text(os.path.join(path, f"note{i:04d}.txt"), SMALL_TEXT_BYTES, rng)
+
+    path = folder("mixed")
+    report(f"{_scaled(MIXED_FILES, scale)} mixed files")
+    for i in range(_scaled(MIXED_FILES, scale)):
+        kind = i % 4
+        name = os.path.join(path, f"file{i:04d}")
+        if kind == 0:
+            write_pdf(name + ".pdf", [_page_content(rng) for _ in range(rng.randint(1, 5))])
+        elif kind == 1:
+            write_scan(name + ".jpg", (827, 1170), rng)
+        elif kind == 2:
+            write_text(name + ".txt", SMALL_TEXT_BYTES, rng)
+        else:
+            write_scan(name + ".png", (413, 585), rng)
+
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the benchmark corpus.")
+    parser.add_argument("directory", help="folder to write the corpus to")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies file counts and sizes (default: 1)")
+    args = parser.parse_args(argv)
+    generate(args.directory, args.scale, lambda message: print("Generating " + message))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
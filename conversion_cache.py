@@ -0,0 +1,150 @@
+"""Persistent cache of converted per-file PDFs.
+
+Entries are keyed by the input (its content hash, or path + size + mtime) plus
+the conversion settings, so an unchanged input converted with the same
+settings is never converted twice. The cache is bounded in size and evicts
+the least recently used entries first. Recency is kept in the entry file's
+mtime, which keeps the cache safe to share between processes. Within a
+process, one cache object can be used from several threads at once.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Bump when a converter changes its output so old entries are not reused
+CACHE_VERSION = 1
+
+KEY_MODES = ("content", "stat")
+
+
+class ConversionCache:
+    SUFFIX = ".pdf"  # Extension of the entry files
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, key_mode="content"):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"key_mode must be one of {', '.join(KEY_MODES)}")
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._total = None  # Bytes on disk, computed on the first store
+        self._lock = threading.RLock()  # Guards the counters, _total and eviction
+
+    def key(self, files, settings):
+        """Returns the cache key for converting a file, or a list of files into one document"""
+        if isinstance(files, (str, os.PathLike)):
+            files = [files]
+        h = hashlib.sha256()
+        h.update(json.dumps({"version": CACHE_VERSION, "settings": settings}, sort_keys=True).encode())
+        for file in files:
+            if self.key_mode == "stat":
+                st = os.stat(file)
+                h.update(f"{os.path.abspath(file)}\0{st.st_size}\0{st.st_mtime_ns}".encode())
+            else:
+                with open(file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        h.update(chunk)
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.SUFFIX)
+
+    def get(self, key):
+        """Returns the cached bytes for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Stores data under key and evicts old entries if the cache is too big"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so readers never see half an entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self.stores += 1
+            if self._total is None:
+                self._total = sum(size for _, _, size in self._entries())
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        """Yields (path, mtime, size) for every entry on disk"""
+        if not os.path.isdir(self.directory):
+            return
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue  # Removed by another process
+                    yield entry.path, st.st_mtime, st.st_size
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[1])
+            total = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+            self._total = total
+
+    def clear(self):
+        """Removes every entry"""
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total = 0
+
+    def stats(self):
+        """Returns hit/miss statistics for this cache object"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
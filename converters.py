@@ -0,0 +1,169 @@
+"""Registry of the file types that can be merged into each output format.
+
+Each (input extension, output format) pair maps to a Converter. For PDF
+output the converter turns the input into PDF bytes; PDFs themselves have no
+converter and are appended as they are. For PNG and TXT output the stitcher
+and the text concatenation read the inputs directly, so those entries only
+say which types they accept.
+
+Converters are registered as "module:function" strings and the module is
+imported the first time a file of that type is converted, so the GUI and the
+command line start without loading Pillow or fpdf, and a merge only loads the
+backends its inputs need.
+
+Plugins add types by calling register(), for example a Markdown renderer:
+
+    # docmerger_markdown.py
+    import converters
+    converters.register(".md", ".pdf", "markdown_pdf:render_markdown_files", batch=True, version=1)
+    converters.register(".md", ".txt")
+
+Plugins are loaded on the first lookup, from the DOCMERGER_PLUGINS
+environment variable (module names separated by commas, importing the module
+registers it) and from "docmerger.converters" entry points of installed
+packages (the entry point is called without arguments). Registering from one
+of these rather than from the calling script means conversion worker
+processes see the plugin too. A plugin that fails to load is logged and
+skipped, the others still load.
+
+Converted PDFs are cached and reused by incremental merges under a key that
+includes the converter's identity, so replacing the converter for a type, or
+bumping the version it was registered with, makes them convert again.
+"""
+import importlib
+import logging
+import os
+
+
+OUTPUT_FORMATS = (".pdf", ".txt", ".png")
+
+PDF_TYPES = {".pdf"}
+TEXT_TYPES = {".txt"}
+IMAGE_TYPES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".webp"}
+
+PLUGIN_ENV = "DOCMERGER_PLUGINS"
+PLUGIN_GROUP = "docmerger.converters"
+
+log = logging.getLogger("docmerger.converters")
+
+
+class Converter:
+    """Turns input files into the output format, importing its backend on first use.
+
+    target is a callable, a "module:function" string, or None when the
+    output writer reads the file as it is. A batch converter gets a list of
+    files and makes one document of them, other converters get one file.
+    Both get the conversion settings and return the output bytes. Bump
+    version when the converter's output changes.
+    """
+
+    def __init__(self, target=None, batch=False, version=None):
+        self.target = target
+        self.batch = batch
+        self.version = version
+        self._function = None if isinstance(target, str) else target
+
+    @property
+    def identity(self):
+        """Names the converter and its version, part of the keys its output is cached under"""
+        target = self.target
+        if target is not None and not isinstance(target, str):
+            target = f"{getattr(target, '__module__', '')}:{getattr(target, '__qualname__', repr(target))}"
+        return target if self.version is None else f"{target}@{self.version}"
+
+    @property
+    def function(self):
+        if self._function is None and self.target is not None:
+            module, _, name = self.target.partition(":")
+            self._function = getattr(importlib.import_module(module), name)
+        return self._function
+
+    def __call__(self, files, settings):
+        if self.batch:
+            return self.function(list(files), settings)
+        file, = files
+        return self.function(file, settings)
+
+
+_converters = {}  # (extension, output format) -> Converter, in registration order
+_plugins_loaded = False
+
+
+def _normalize(ext):
+    ext = ext.strip().lower()
+    return ext if ext.startswith(".") else "." + ext
+
+
+def register(extensions, output_format, target=None, batch=False, version=None):
+    """Registers a converter for one or more extensions, replacing any earlier one. Returns it"""
+    output_format = _normalize(output_format)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if isinstance(extensions, str):
+        extensions = [extensions]
+    converter = Converter(target, batch, version)
+    for ext in extensions:
+        _converters[(_normalize(ext), output_format)] = converter
+    return converter
+
+
+def load_plugins():
+    """Imports the plugins named in DOCMERGER_PLUGINS and runs the installed entry points, once.
+
+    A plugin that fails is logged and skipped, so one bad entry doesn't keep
+    the others from loading.
+    """
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for name in os.environ.get(PLUGIN_ENV, "").split(","):
+        if name.strip():
+            try:
+                importlib.import_module(name.strip())
+            except Exception:
+                log.exception("Could not load DocMerger plugin %s", name.strip())
+
+    from importlib import metadata
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=PLUGIN_GROUP)
+    else:
+        entry_points = entry_points.get(PLUGIN_GROUP, [])  # Python < 3.10
+    for entry_point in entry_points:
+        try:
+            entry_point.load()()
+        except Exception:
+            log.exception("Could not load DocMerger plugin %s", entry_point.name)
+
+
+def get(ext, output_format):
+    """Returns the Converter for files with extension ext to output_format, or None"""
+    load_plugins()
+    return _converters.get((_normalize(ext), _normalize(output_format)))
+
+
+def input_types(output_format=None):
+    """Returns the extensions that can be merged, into output_format or into anything"""
+    load_plugins()
+    types = {}  # Keeps the registration order
+    for ext, fmt in _converters:
+        if output_format is None or fmt == _normalize(output_format):
+            types[ext] = None
+    return list(types)
+
+
+def formats_for_types(file_types):
+    """Returns the output formats every one of the given extensions can be merged into"""
+    load_plugins()
+    file_types = {_normalize(t) for t in file_types}
+    if not file_types:
+        return []
+    return [fmt for fmt in OUTPUT_FORMATS if all((ext, fmt) in _converters for ext in file_types)]
+
+
+register(sorted(PDF_TYPES), ".pdf")  # Appended as they are
+register(sorted(TEXT_TYPES), ".pdf", "text_pdf:render_text_files", batch=True)
+register(sorted(IMAGE_TYPES), ".pdf", "image_pdf:image_to_pdf")
+register(sorted(TEXT_TYPES), ".txt")  # Concatenated by text_concat
+register(sorted(IMAGE_TYPES), ".png")  # Stacked by png_stitcher, multi-page images give their first page
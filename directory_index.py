@@ -0,0 +1,194 @@
+"""Cached index of the files in a source directory.
+
+The index is built once with os.scandir, optionally recursing into
+subdirectories, and keeps each file's name, extension, size and mtime.
+Filtering by extension only reads the cached index. refresh() picks up added
+and removed files by re-listing only the directories whose mtime changed, and
+watch() runs refresh() on a background thread.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+
+FileEntry = namedtuple("FileEntry", ["path", "name", "ext", "size", "mtime"])
+
+
+class DirectoryIndex:
+    def __init__(self, root, recursive=False, exclude_dirs=()):
+        self.root = os.path.abspath(root)
+        self.recursive = recursive
+        self.exclude_dirs = set(exclude_dirs)
+        self.entries = {}  # Path relative to root -> FileEntry
+        self.dir_files = {}  # Relative directory -> set of relative file paths
+        self.dir_subdirs = {}  # Relative directory -> set of relative subdirectories
+        self.dir_mtimes = {}  # Relative directory -> mtime_ns when it was listed
+        self.lock = threading.Lock()
+        self._sorted = None
+        self.scan_seconds = None  # How long the last full scan took
+        self._watch_thread = None
+        self._stop = threading.Event()
+
+    def _list_dir(self, rel_dir):
+        """Lists one directory, returns (file entries, subdirectories, mtime_ns)"""
+        path = os.path.join(self.root, rel_dir)
+        mtime = os.stat(path).st_mtime_ns
+        files = {}
+        subdirs = set()
+        with os.scandir(path) as it:
+            for entry in it:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and entry.name not in self.exclude_dirs:
+                            subdirs.add(rel)
+                    elif entry.is_file():
+                        st = entry.stat()  # Cached by scandir on Windows
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        files[rel] = FileEntry(rel, entry.name, ext, st.st_size, st.st_mtime)
+                except OSError:
+                    continue  # Removed while we were listing
+        return files, subdirs, mtime
+
+    def _scan_tree(self, rel_dir):
+        """Lists rel_dir and everything below it, returns the new index parts"""
+        entries, dir_files, dir_subdirs, dir_mtimes = {}, {}, {}, {}
+        pending = [rel_dir]
+        while pending:
+            current = pending.pop()
+            try:
+                files, subdirs, mtime = self._list_dir(current)
+            except OSError:
+                continue
+            entries.update(files)
+            dir_files[current] = set(files)
+            dir_subdirs[current] = subdirs
+            dir_mtimes[current] = mtime
+            pending.extend(subdirs)
+        return entries, dir_files, dir_subdirs, dir_mtimes
+
+    def scan(self):
+        """Builds the index from scratch, returns the number of files found"""
+        start = time.perf_counter()
+        entries, dir_files, dir_subdirs, dir_mtimes = self._scan_tree("")
+        with self.lock:
+            self.entries = entries
+            self.dir_files = dir_files
+            self.dir_subdirs = dir_subdirs
+            self.dir_mtimes = dir_mtimes
+            self._sorted = None
+        self.scan_seconds = time.perf_counter() - start
+        return len(entries)
+
+    def _drop_tree(self, rel_dir, removed):
+        """Forgets rel_dir and everything below it, collecting removed files"""
+        for path in self.dir_files.pop(rel_dir, ()):
+            self.entries.pop(path, None)
+            removed.add(path)
+        self.dir_mtimes.pop(rel_dir, None)
+        for sub in self.dir_subdirs.pop(rel_dir, ()):
+            self._drop_tree(sub, removed)
+
+    def refresh(self):
+        """Re-lists the directories that changed since the last scan.
+
+        Returns (added, removed) sets of relative paths. Only directory mtimes
+        are checked, so a file rewritten in place keeps its cached size/mtime
+        until its directory changes or scan() runs again.
+        """
+        with self.lock:
+            known = list(self.dir_mtimes.items())
+
+        changed = []
+        for rel_dir, mtime in known:
+            try:
+                if os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns != mtime:
+                    changed.append(rel_dir)
+            except OSError:
+                changed.append(rel_dir)  # Gone, dropped below
+        if not changed:
+            return set(), set()
+
+        added, removed = set(), set()
+        for rel_dir in changed:
+            try:
+                files, subdirs, mtime = self._list_dir(rel_dir)
+            except OSError:
+                with self.lock:
+                    self._drop_tree(rel_dir, removed)
+                    self._sorted = None
+                continue
+
+            # New subdirectories are scanned outside the lock
+            with self.lock:
+                new_subdirs = subdirs - self.dir_subdirs.get(rel_dir, set())
+            subtrees = [self._scan_tree(sub) for sub in new_subdirs]
+
+            with self.lock:
+                old_files = self.dir_files.get(rel_dir, set())
+                for path in old_files - set(files):
+                    self.entries.pop(path, None)
+                    removed.add(path)
+                added.update(set(files) - old_files)
+                self.entries.update(files)
+                self.dir_files[rel_dir] = set(files)
+                self.dir_mtimes[rel_dir] = mtime
+
+                for sub in self.dir_subdirs.get(rel_dir, set()) - subdirs:
+                    self._drop_tree(sub, removed)
+                self.dir_subdirs[rel_dir] = subdirs
+                for entries, dir_files, dir_subdirs, dir_mtimes in subtrees:
+                    self.entries.update(entries)
+                    self.dir_files.update(dir_files)
+                    self.dir_subdirs.update(dir_subdirs)
+                    self.dir_mtimes.update(dir_mtimes)
+                    added.update(entries)
+                self._sorted = None
+        return added - removed, removed - added
+
+    def files(self, extensions=None):
+        """Returns relative paths in sorted order, optionally only some extensions.
+
+        Only reads the cached index, the filesystem is not touched.
+        """
+        with self.lock:
+            if self._sorted is None:
+                self._sorted = sorted(self.entries)
+            if extensions is None:
+                return list(self._sorted)
+            entries = self.entries
+            return [p for p in self._sorted if entries[p].ext in extensions]
+
+    def get(self, path):
+        """Returns the cached FileEntry for a relative path, or None"""
+        with self.lock:
+            return self.entries.get(path)
+
+    def watch(self, interval, callback):
+        """Polls for changes every interval seconds on a daemon thread.
+
+        callback(added, removed) is called from that thread whenever files
+        were added or removed.
+        """
+        self.stop()
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    added, removed = self.refresh()
+                except OSError:
+                    continue
+                if added or removed:
+                    callback(added, removed)
+
+        self._watch_thread = threading.Thread(target=run, daemon=True)
+        self._watch_thread.start()
+
+    def stop(self):
+        """Stops watching for changes"""
+        if self._watch_thread is not None:
+            self._stop.set()
+            self._watch_thread.join()
+            self._watch_thread = None
@@ -0,0 +1,190 @@
+"""Ordered file list behind the GUI's file view.
+
+Keeps the display order, which files are checked for merging, their page
+ranges and which rows are selected for reordering, without any Tk variables.
+Positions are indexed, so moving a file by one row is O(1) and a move only
+touches the rows between its old and new position.
+"""
+import os
+from collections import Counter
+
+
+class FileListModel:
+    def __init__(self, files=(), checked=()):
+        self.page_ranges = {}  # File -> page range spec like "1-3,10"
+        self.set_files(files, checked)
+
+    def set_files(self, files, checked=()):
+        """Replaces the list, keeping only checked files and page ranges that are still present"""
+        self.files = list(files)
+        self.positions = {f: i for i, f in enumerate(self.files)}
+        self.checked = {f for f in checked if f in self.positions}
+        self.page_ranges = {f: spec for f, spec in self.page_ranges.items() if f in self.positions}
+        self.checked_types = Counter(os.path.splitext(f)[1].lower() for f in self.checked)
+        self.selected = set()
+        self.anchor = None  # Start of a shift-click range selection
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, idx):
+        return self.files[idx]
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def position(self, file):
+        return self.positions[file]
+
+    def add_files(self, files):
+        """Appends files that aren't in the list yet, keeping the current order"""
+        for f in files:
+            if f not in self.positions:
+                self.positions[f] = len(self.files)
+                self.files.append(f)
+
+    def remove_files(self, files):
+        """Drops files from the list, keeping the order of the others"""
+        files = set(files) & set(self.positions)
+        if not files:
+            return
+        for f in files:
+            self.set_checked(f, False)
+        self.selected -= files
+        for f in files:
+            self.page_ranges.pop(f, None)
+        if self.anchor in files:
+            self.anchor = None
+        self.files = [f for f in self.files if f not in files]
+        self.positions = {f: i for i, f in enumerate(self.files)}
+
+    # Checked files (the ones that get merged)
+
+    def is_checked(self, file):
+        return file in self.checked
+
+    def set_checked(self, file, value):
+        if value and file not in self.checked:
+            self.checked.add(file)
+            self.checked_types[os.path.splitext(file)[1].lower()] += 1
+        elif not value and file in self.checked:
+            self.checked.discard(file)
+            ext = os.path.splitext(file)[1].lower()
+            self.checked_types[ext] -= 1
+            if not self.checked_types[ext]:
+                del self.checked_types[ext]
+
+    def check_all(self):
+        self.checked = set(self.files)
+        self.checked_types = Counter(os.path.splitext(f)[1].lower() for f in self.files)
+
+    def check_none(self):
+        self.checked = set()
+        self.checked_types = Counter()
+
+    def checked_files(self):
+        """Returns the checked files in display order"""
+        if len(self.checked) == len(self.files):
+            return list(self.files)
+        return sorted(self.checked, key=self.positions.__getitem__)
+
+    def page_range(self, file):
+        """Returns the file's page range spec, "" for all pages"""
+        return self.page_ranges.get(file, "")
+
+    def set_page_range(self, file, spec):
+        spec = spec.strip()
+        if spec:
+            self.page_ranges[file] = spec
+        else:
+            self.page_ranges.pop(file, None)
+
+    def merge_inputs(self, directory=""):
+        """Returns the checked files as merge_engine.merge() inputs, (path, page range) pairs"""
+        return [(os.path.join(directory, f), self.page_ranges.get(f)) for f in self.checked_files()]
+
+    # Selected rows (the ones that get moved)
+
+    def select(self, file, toggle=False, extend=False):
+        """Click selection: plain replaces, toggle adds/removes one, extend selects a range"""
+        if extend and self.anchor in self.positions:
+            lo, hi = sorted((self.positions[self.anchor], self.positions[file]))
+            self.selected = set(self.files[lo:hi + 1])
+            return
+        if toggle:
+            self.selected ^= {file}
+        else:
+            self.selected = {file}
+        self.anchor = file
+
+    def clear_selection(self):
+        self.selected = set()
+        self.anchor = None
+
+    def selected_positions(self):
+        return sorted(self.positions[f] for f in self.selected)
+
+    # Reordering, every method returns the (first, last) positions that changed
+
+    def _reindex(self, lo, hi):
+        for i in range(lo, hi + 1):
+            self.positions[self.files[i]] = i
+
+    def swap(self, i, j):
+        """Swaps two rows, O(1)"""
+        self.files[i], self.files[j] = self.files[j], self.files[i]
+        self.positions[self.files[i]] = i
+        self.positions[self.files[j]] = j
+        return min(i, j), max(i, j)
+
+    def move(self, src, dst):
+        """Moves the file at src to dst, shifting only the rows in between"""
+        if src == dst:
+            return src, src
+        if abs(src - dst) == 1:
+            return self.swap(src, dst)
+        self.files.insert(dst, self.files.pop(src))
+        lo, hi = min(src, dst), max(src, dst)
+        self._reindex(lo, hi)
+        return lo, hi
+
+    def move_block(self, positions, dst):
+        """Moves the files at positions so they sit together starting at dst"""
+        positions = sorted(positions)
+        if not positions:
+            return 0, -1
+        if len(positions) == 1:
+            return self.move(positions[0], min(max(dst, 0), len(self.files) - 1))
+
+        moving = [self.files[i] for i in positions]
+        moving_set = set(moving)
+        dst = min(max(dst, 0), len(self.files) - len(moving))
+        lo = min(positions[0], dst)
+        rest = [f for f in self.files[lo:] if f not in moving_set]
+        split = dst - lo
+        self.files[lo:] = rest[:split] + moving + rest[split:]
+        hi = max(positions[-1], dst + len(moving) - 1)
+        self._reindex(lo, hi)
+        return lo, hi
+
+    def move_selection(self, step):
+        """Moves the selected rows step rows up (negative) or down.
+
+        Single steps keep the gaps between selected rows, bigger jumps gather
+        them into one block.
+        """
+        positions = self.selected_positions()
+        if not positions:
+            return 0, -1
+        if positions[0] + step < 0 or positions[-1] + step >= len(self.files):
+            step = -positions[0] if step < 0 else len(self.files) - 1 - positions[-1]
+        if step == 0:
+            return 0, -1
+
+        if abs(step) == 1:
+            # Bubble every selected row past its neighbour, O(1) per row
+            order = positions if step < 0 else reversed(positions)
+            for pos in order:
+                self.swap(pos, pos + step)
+            return min(positions) + min(step, 0), max(positions) + max(step, 0)
+        return self.move_block(positions, positions[0] + step)
@@ -0,0 +1,30 @@
+"""Finds a Unicode TrueType font for rendering text to PDF.
+
+Kept apart from text_pdf so the lookup doesn't import fpdf and Pillow, merge
+jobs without text files never need them.
+"""
+import functools
+import os
+
+
+# Checked in order when no font file is configured
+UNICODE_FONT_CANDIDATES = (
+    r"C:\Windows\Fonts\arial.ttf",
+    r"C:\Windows\Fonts\segoeui.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSans-Regular.ttf",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def find_unicode_font():
+    """Returns the path of a Unicode TTF font on this machine, or None"""
+    for path in UNICODE_FONT_CANDIDATES:
+        if os.path.isfile(path):
+            return path
+    return None
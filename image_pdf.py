@@ -0,0 +1,176 @@
+"""Single page PDFs from images.
+
+JPEGs can be embedded as they are: the original DCT stream goes into the PDF
+without being decoded, which is lossless and much faster than re-encoding.
+With a target DPI (and optionally a page size) oversized scans are downsampled
+once, using the JPEG decoder's draft mode so big scans are never fully decoded.
+Multi-page TIFFs get one page per frame.
+"""
+import io
+import zlib
+
+from PIL import Image, ImageSequence
+
+
+# Page sizes in points
+PAGE_SIZES = {
+    "a3": (841.89, 1190.55),
+    "a4": (595.28, 841.89),
+    "a5": (419.53, 595.28),
+    "letter": (612.0, 792.0),
+    "legal": (612.0, 1008.0),
+}
+
+# JPEG modes a PDF viewer can decode straight from the DCT stream
+PASSTHROUGH_MODES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+
+def page_size_points(page_size):
+    """Returns (width, height) in points for a size name like "A4" or a [w, h] pair"""
+    if isinstance(page_size, str):
+        try:
+            return PAGE_SIZES[page_size.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown page size: {page_size}") from None
+    width, height = page_size
+    return float(width), float(height)
+
+
+def image_pdf(data, width, height, color_space, filter_name, page=None, decode=None):
+    """Builds a one page PDF showing an encoded image.
+
+    page is (page width, page height, x, y, drawn width, drawn height) in
+    points, by default the page is the image at 72 dpi.
+    """
+    return images_pdf([(data, width, height, color_space, filter_name, page, decode)])
+
+
+def images_pdf(images):
+    """Builds a PDF with a page for each tuple of image_pdf() arguments"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % (3 + 3 * i) for i in range(len(images))), len(images)),
+    ]
+    for data, width, height, color_space, filter_name, page, decode in images:
+        if page is None:
+            page = (width, height, 0, 0, width, height)
+        page_w, page_h, x, y, draw_w, draw_h = page
+
+        content = f"q {draw_w:.2f} 0 0 {draw_h:.2f} {x:.2f} {y:.2f} cm /Im0 Do Q".encode()
+        image_dict = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                      f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter {filter_name} ")
+        if decode:
+            image_dict += f"/Decode [{' '.join(str(v) for v in decode)}] "
+        image_dict += f"/Length {len(data)} >>"
+
+        num = len(objects) + 1  # This page's object, its content and image follow it
+        objects += [
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}] "
+             f"/Resources << /XObject << /Im0 {num + 2} 0 R >> >> /Contents {num + 1} 0 R >>").encode(),
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+            image_dict.encode() + b"\nstream\n" + data + b"\nendstream",
+        ]
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % num + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _layout(img, settings):
+    """Works out the page and the most pixels worth keeping for an image.
+
+    Returns (page tuple for image_pdf(), (max width, max height)) or
+    (None, None) when the image should keep its default 72 dpi page.
+    """
+    target_dpi = settings.get("target_dpi")
+    page_size = settings.get("page_size")
+    if not target_dpi and not page_size:
+        return None, None
+
+    width, height = img.size
+    dpi = img.info.get("dpi", (72, 72))
+    dpi_x, dpi_y = (float(dpi[0]) or 72.0), (float(dpi[1]) or 72.0)
+    # Physical size of the image
+    draw_w, draw_h = width * 72.0 / dpi_x, height * 72.0 / dpi_y
+
+    if page_size:
+        page_w, page_h = page_size_points(page_size)
+        # Fit the image on the page keeping its aspect ratio, landscape pages for landscape images
+        if (draw_w > draw_h) != (page_w > page_h):
+            page_w, page_h = page_h, page_w
+        scale = min(page_w / draw_w, page_h / draw_h)
+        draw_w, draw_h = draw_w * scale, draw_h * scale
+        page = (page_w, page_h, (page_w - draw_w) / 2, (page_h - draw_h) / 2, draw_w, draw_h)
+    else:
+        page = (draw_w, draw_h, 0, 0, draw_w, draw_h)
+
+    if not target_dpi:
+        return page, None
+    max_px = (max(1, round(draw_w * target_dpi / 72.0)), max(1, round(draw_h * target_dpi / 72.0)))
+    return page, max_px
+
+
+def _frame_image(frame, settings):
+    """Encodes one frame of a multi-page image, returns the image_pdf() arguments for its page"""
+    page, max_px = _layout(frame, settings)
+    if max_px is not None and (frame.width > max_px[0] or frame.height > max_px[1]):
+        small = frame.convert("RGB")
+        small.thumbnail(max_px, Image.LANCZOS)
+        buf = io.BytesIO()
+        small.save(buf, "JPEG", quality=settings.get("jpeg_quality", 85))
+        return buf.getvalue(), small.width, small.height, "/DeviceRGB", "/DCTDecode", page, None
+    # Bilevel and grayscale scans stay gray, which Flate compresses far better than RGB
+    gray = frame.mode in ("1", "L")
+    pixels = frame.convert("L" if gray else "RGB")
+    return (zlib.compress(pixels.tobytes()), pixels.width, pixels.height,
+            "/DeviceGray" if gray else "/DeviceRGB", "/FlateDecode", page, None)
+
+
+def image_to_pdf(file, settings):
+    """Converts one image file to a PDF and returns the bytes.
+
+    Images get one page, multi-page TIFFs a page per frame.
+    """
+    with Image.open(file) as img:
+        if img.format == "TIFF" and getattr(img, "n_frames", 1) > 1:
+            return images_pdf([_frame_image(frame, settings) for frame in ImageSequence.Iterator(img)])
+
+        page, max_px = _layout(img, settings)
+        is_jpeg = img.format == "JPEG"
+        oversized = max_px is not None and (img.width > max_px[0] or img.height > max_px[1])
+
+        if oversized:
+            # Downsample once; draft() lets the JPEG decoder scale down while decoding
+            if is_jpeg:
+                img.draft("RGB", max_px)
+            small = img.convert("RGB")
+            small.thumbnail(max_px, Image.LANCZOS)
+            buf = io.BytesIO()
+            small.save(buf, "JPEG", quality=settings.get("jpeg_quality", 85))
+            return image_pdf(buf.getvalue(), small.width, small.height, "/DeviceRGB", "/DCTDecode", page)
+
+        if is_jpeg and settings.get("jpeg_passthrough") and img.mode in PASSTHROUGH_MODES:
+            # Embed the original DCT stream, the image is never decoded
+            with open(file, "rb") as f:
+                data = f.read()
+            decode = [1, 0] * 4 if img.mode == "CMYK" and "adobe" in img.info else None
+            return image_pdf(data, img.width, img.height, PASSTHROUGH_MODES[img.mode], "/DCTDecode",
+                             page, decode)
+
+        rgb = img.convert("RGB")
+        if page is None:
+            buf = io.BytesIO()
+            rgb.save(buf, "PDF")
+            return buf.getvalue()
+        # Custom page layout, keep the pixels lossless
+        return image_pdf(zlib.compress(rgb.tobytes()), rgb.width, rgb.height, "/DeviceRGB", "/FlateDecode", page)
@@ -0,0 +1,262 @@
+"""Benchmarks every merge path on the corpus from benchmark_corpus.py.
+
+Examples:
+    python merge_benchmark.py --corpus ~/bench --save-baseline
+    python merge_benchmark.py --corpus ~/bench
+    python merge_benchmark.py --corpus ~/bench --scale 40 --case text_to_txt --repeat 3
+
+Each case runs merge_engine.merge() headlessly in a fresh process, so the
+memory it reports is its own. That is the largest peak RSS of any single
+process of the case: the merge process or one of the conversion workers it
+started (on POSIX), not their sum. Wall time is the fastest of --repeat runs,
+RSS and output size the largest of them. The stage timings of the fastest run
+(see merge_metrics) are stored with it.
+
+Results are compared with a baseline JSON, <corpus>/baseline.json unless
+--baseline says otherwise. Timings only compare on the same machine, so the
+baseline is kept with the corpus rather than in the repository; record one
+with --save-baseline before a change, then run again after it. A case that
+got slower, used more memory or wrote a bigger file than the baseline allows
+(--tolerance) is reported and the exit status is 1.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import benchmark_corpus
+import merge_cli
+import merge_engine
+import merge_metrics
+
+
+BASELINE_VERSION = 3
+
+# Name -> (input pattern in the corpus, output format, engine options)
+CASES = {
+    "pdf_many_small": ("many_small/*.pdf", ".pdf", {"large_job": False}),
+    "pdf_many_small_large_job": ("many_small/*.pdf", ".pdf", {"large_job": True}),
+    "pdf_many_small_optimize": ("many_small/*.pdf", ".pdf", {"large_job": True, "optimize": True}),
+    "pdf_huge": ("huge/*.pdf", ".pdf", {}),
+    "pdf_huge_page_range": ("huge/huge.pdf#1-10", ".pdf", {}),
+    "images_to_pdf": ("scans/*", ".pdf", {}),
+    "images_to_png": ("scans/*.png", ".png", {}),
+    "text_to_txt": ("text/*.txt", ".txt", {}),
+    "text_to_pdf": ("text_small/*.txt", ".pdf", {}),
+    "mixed_to_pdf": ("mixed/*", ".pdf", {}),
+}
+
+# Output size may grow this much before it counts as a regression, it doesn't depend on the machine
+OUTPUT_SIZE_TOLERANCE = 0.01
+
+# Differences in wall time below this many seconds are noise, whatever the ratio
+MIN_TIME_DIFFERENCE = 0.05
+
+
+def case_inputs(corpus, pattern):
+    """Expands a case's input pattern, keeping a "#pages" suffix on the matches"""
+    pattern, _, spec = pattern.partition("#")
+    files = sorted(glob.glob(os.path.join(corpus, pattern)))
+    return [(f, spec) for f in files] if spec else files
+
+
+def largest_rss():
+    """Largest peak resident memory of this process or any one of its finished children, in bytes.
+
+    The kernel keeps the peak of the biggest reaped child, not a total over
+    all of them, so this is not the memory a worker pool used together.
+    """
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss()  # This process only
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = _linux_peak_rss() or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    return max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit)
+
+
+def _linux_peak_rss():
+    """Peak RSS of this process from /proc, None where there is no /proc.
+
+    On Linux a spawned process starts with the ru_maxrss of the process that
+    started it, so after generating a corpus every case would report at least
+    the memory that took. VmHWM only counts this process's own address space.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _windows_peak_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def run_case(inputs, output, format_type, options):
+    """Runs one merge, in the process started for it. Returns (seconds, largest RSS, output size, stage seconds)"""
+    metrics = merge_metrics.MergeMetrics()
+    start = time.perf_counter()
+    merge_engine.merge(inputs, output, format_type, {**options, "metrics": metrics})
+    seconds = time.perf_counter() - start
+    return seconds, largest_rss(), os.path.getsize(output), metrics.stages
+
+
+def measure(corpus, name, repeat=1, options=None, work_dir=None):
+    """Runs a case repeat times, each in a new process. Returns its result dict"""
+    pattern, format_type, case_options = CASES[name]
+    inputs = case_inputs(corpus, pattern)
+    out_dir = tempfile.mkdtemp(prefix="merge-bench-", dir=work_dir)
+    output = os.path.join(out_dir, "out" + format_type)
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    try:
+        for _ in range(repeat):
+            if os.path.exists(output):
+                os.remove(output)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(run_case, inputs, output, format_type,
+                                        {**case_options, **(options or {})}).result())
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    rss = [r[1] for r in runs if r[1] is not None]
+    fastest = min(runs, key=lambda r: r[0])
+    return {
+        "inputs": len(inputs),
+        "seconds": round(fastest[0], 4),
+        "largest_rss": max(rss) if rss else None,
+        "output_size": max(r[2] for r in runs),
+        # Where the fastest run spent its time, for finding what changed
+        "stages": {stage: round(seconds, 4) for stage, seconds in fastest[3].items()},
+    }
+
+
+def compare(result, base, tolerance):
+    """Returns the regressions of a case against its baseline, as messages"""
+    problems = []
+    slower = result["seconds"] - base["seconds"]
+    if slower > base["seconds"] * tolerance and slower > MIN_TIME_DIFFERENCE:
+        problems.append(f"time {base['seconds']:.2f}s -> {result['seconds']:.2f}s")
+    rss, base_rss = result["largest_rss"], base.get("largest_rss")
+    if rss and base_rss and rss > base_rss * (1 + tolerance):
+        problems.append(f"largest RSS {base_rss / 2 ** 20:.0f} MB -> {rss / 2 ** 20:.0f} MB")
+    if result["output_size"] > base["output_size"] * (1 + OUTPUT_SIZE_TOLERANCE):
+        problems.append(f"output {base['output_size']:,} -> {result['output_size']:,} bytes")
+    return problems
+
+
+def load_baseline(path, scale):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        return None
+    if baseline.get("version") != BASELINE_VERSION or baseline.get("scale") != scale:
+        raise ValueError(f"{path} was recorded at another scale or by another version, record it again "
+                         "with --save-baseline")
+    return baseline
+
+
+def save_baseline(path, scale, results, previous=None):
+    """Writes the results as the new baseline, keeping cases that weren't run this time"""
+    cases = dict(previous["cases"]) if previous else {}
+    cases.update(results)
+    data = {"version": BASELINE_VERSION, "scale": scale, "machine": platform.platform(),
+            "python": platform.python_version(), "cases": cases}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def _format_row(name, result, note=""):
+    rss = f"{result['largest_rss'] / 2 ** 20:8.0f}" if result["largest_rss"] else "       ?"
+    return (f"{name:<26} {result['inputs']:>6} {result['seconds']:>9.2f} {rss} "
+            f"{result['output_size'] / 2 ** 20:>10.1f}  {note}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the merge engine on a generated corpus.")
+    parser.add_argument("--corpus", required=True, help="corpus folder, generated there if it isn't yet")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus scale, see benchmark_corpus.py (default: 1)")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the fastest one counts")
+    parser.add_argument("--baseline", help="baseline JSON (default: baseline.json in the corpus folder)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown and memory growth over the baseline (default: 0.25)")
+    parser.add_argument("--work-dir", help="folder for the merged outputs (default: the system temp folder)")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="engine option applied to every case, VALUE is parsed as JSON when possible")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    baseline_path = args.baseline or os.path.join(args.corpus, "baseline.json")
+
+    try:
+        options = merge_cli.parse_options(args.option)
+        try:
+            baseline = load_baseline(baseline_path, args.scale)
+        except ValueError:
+            if not args.save_baseline:
+                raise
+            baseline = None  # Replaced by this run
+    except (OSError, ValueError, merge_engine.MergeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    benchmark_corpus.generate(args.corpus, args.scale, lambda message: print("Generating " + message))
+
+    print(f"{'case':<26} {'inputs':>6} {'seconds':>9} {'RSS MB':>8} {'output MB':>10}")
+    results, regressions = {}, 0
+    for name in args.case or CASES:
+        result = results[name] = measure(args.corpus, name, args.repeat, options, args.work_dir)
+        base = baseline["cases"].get(name) if baseline and not args.save_baseline else None
+        problems = compare(result, base, args.tolerance) if base else []
+        if base:
+            note = "REGRESSION: " + ", ".join(problems) if problems else f"{result['seconds'] / base['seconds']:.2f}x baseline"
+        else:
+            note = ""
+        regressions += bool(problems)
+        print(_format_row(name, result, note), flush=True)
+
+    if args.save_baseline:
+        save_baseline(baseline_path, args.scale, results, baseline)
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline is None:
+        print(f"No baseline at {baseline_path} yet, record one with --save-baseline")
+    if regressions:
+        print(f"{regressions} case(s) regressed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Command line front end for the merge engine.
+
+Examples:
+    python merge_cli.py -o out/report.pdf cover.pdf "scans/*.jpg" notes.txt
+    python merge_cli.py -o out/cover.pdf "report.pdf#1" appendix.pdf#3-5,10
+    python merge_cli.py --manifest jobs.json --jobs 8
+    python merge_cli.py --metrics --profile -o out/slow.pdf "inbox/*"
+
+A "#1-3,10" suffix on a PDF input takes only those pages (1-based, "5-" runs
+to the last page).
+
+A manifest is a JSON list of jobs (or an object with a "jobs" list). Each job
+has "inputs", "output" and optionally "format" and "options". Inputs are
+paths or {"path": ..., "pages": "1-3"} objects. Relative paths are resolved
+against the directory of the manifest.
+
+--metrics writes stage timings and per-input counters next to each output as
+<output>.metrics.json and prints where the time went, --profile writes cProfile
+stats as <output>.prof. See merge_metrics for what is measured.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import converters
+import merge_engine
+import merge_metrics
+from conversion_cache import ConversionCache, DEFAULT_MAX_BYTES as DEFAULT_CACHE_SIZE
+
+
+# "report.pdf#1-3,10" selects pages of an input
+PAGES_SUFFIX = re.compile(r"#([\d\s,-]+)$")
+
+
+def split_pages(pattern):
+    """Splits a "#1-3,10" page range suffix off an input, returns (pattern, spec or None)"""
+    match = PAGES_SUFFIX.search(pattern)
+    if match is None or os.path.exists(pattern):
+        return pattern, None
+    return pattern[:match.start()], match.group(1)
+
+
+def expand_inputs(patterns, base_dir=""):
+    """Expands glob patterns in order, keeping plain paths as they are.
+
+    Inputs with a page range come back as (path, spec) pairs.
+    """
+    files = []
+    for pattern in patterns:
+        if isinstance(pattern, dict):
+            pattern, spec = pattern["path"], pattern.get("pages")
+        else:
+            pattern, spec = split_pages(pattern)
+        pattern = os.path.join(base_dir, os.path.expanduser(pattern))
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise merge_engine.MergeError(f"No files match: {pattern}")
+        else:
+            matches = [pattern]
+        files.extend(matches if spec is None else [(f, spec) for f in matches])
+    return files
+
+
+def load_manifest(path, base_dir=None):
+    """Reads jobs from a JSON manifest, relative paths are resolved against base_dir or the manifest's directory"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    jobs = data.get("jobs", []) if isinstance(data, dict) else data
+    if base_dir is None:
+        base_dir = os.path.dirname(os.path.abspath(path))
+
+    loaded = []
+    for job in jobs:
+        if "inputs" not in job or "output" not in job:
+            raise merge_engine.MergeError(f"Manifest job needs 'inputs' and 'output': {job}")
+        loaded.append({
+            "inputs": expand_inputs(job["inputs"], base_dir),
+            "output": os.path.join(base_dir, job["output"]),
+            "format": job.get("format"),
+            "options": job.get("options", {}),
+        })
+    return loaded
+
+
+def run_job(job):
+    """Runs a single job, used as the process pool entry point.
+
+    Returns a dict with the output path, the conversion cache statistics and
+    a one line summary of the job's metrics.
+    """
+    options = dict(job.get("options") or {})
+    metrics = options["metrics"] = merge_metrics.MergeMetrics()
+    cache = None
+    if options.get("cache_dir"):
+        cache = ConversionCache(options.pop("cache_dir"),
+                                options.pop("cache_size", DEFAULT_CACHE_SIZE),
+                                options.pop("cache_key", "content"))
+        options["cache"] = cache
+    output = merge_engine.merge(job["inputs"], job["output"], job.get("format"), options)
+    return {"output": output, "cache": cache.stats() if cache is not None else None, "summary": metrics.summary()}
+
+
+def run_jobs(jobs, workers=None):
+    """Runs jobs on a process pool and yields (job, run_job() result, error) as they finish"""
+    if len(jobs) == 1 or workers == 1:
+        for job in jobs:
+            try:
+                yield job, run_job(job), None
+            except Exception as e:
+                yield job, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Merge PDF, image and text files without the GUI.")
+    parser.add_argument("inputs", nargs="*", help="input files or glob patterns, merged in the given order")
+    parser.add_argument("-o", "--output", help="output file, the format defaults to its extension")
+    parser.add_argument("-f", "--format", choices=converters.OUTPUT_FORMATS, help="output format")
+    parser.add_argument("-m", "--manifest", action="append", default=[],
+                        help="JSON manifest with merge jobs, can be given more than once")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of merge jobs to run at once (default: number of cores)")
+    parser.add_argument("--cache-dir", help="keep converted files in this directory and reuse them on later runs")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="maximum conversion cache size in bytes (default: 1 GiB)")
+    parser.add_argument("--large-job", action="store_true",
+                        help="copy pages straight into the output so memory stays flat, bookmarks are dropped")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="engine option applied to every job, VALUE is parsed as JSON when possible")
+    parser.add_argument("--metrics", action="store_true",
+                        help="write stage timings and per-input counters to <output>.metrics.json")
+    parser.add_argument("--profile", action="store_true", help="write cProfile stats to <output>.prof")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="add peak Python memory and the top allocation sites to the metrics (slow)")
+    return parser
+
+
+def parse_options(pairs):
+    options = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise merge_engine.MergeError(f"Options must look like KEY=VALUE: {pair}")
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+    return options
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        options = parse_options(args.option)
+        if args.large_job:
+            options["large_job"] = True
+        if args.cache_dir:
+            options.update(cache_dir=args.cache_dir, cache_size=args.cache_size)
+        jobs = []
+        for manifest in args.manifest:
+            jobs.extend(load_manifest(manifest))
+        if args.inputs:
+            if not args.output:
+                parser.error("--output is required when input files are given")
+            jobs.append({"inputs": expand_inputs(args.inputs), "output": args.output,
+                         "format": args.format, "options": {}})
+    except (OSError, ValueError, merge_engine.MergeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if not jobs:
+        parser.error("nothing to merge, give input files or a manifest")
+    for job in jobs:
+        job["options"] = {**options, **job["options"]}
+        if len(jobs) > 1 and args.jobs != 1:
+            # Jobs already run in parallel, don't start a conversion pool per job too
+            job["options"].setdefault("workers", 1)
+        if args.metrics or args.trace_memory:
+            job["options"].setdefault("metrics_file", job["output"] + ".metrics.json")
+        if args.profile:
+            job["options"].setdefault("profile", job["output"] + ".prof")
+        if args.trace_memory:
+            job["options"]["trace_memory"] = True
+
+    failed = 0
+    hits = misses = 0
+    for job, result, error in run_jobs(jobs, args.jobs):
+        if error is not None:
+            failed += 1
+            print(f"Merge failed: {job['output']}: {error}", file=sys.stderr)
+            continue
+        if result["cache"]:
+            hits += result["cache"]["hits"]
+            misses += result["cache"]["misses"]
+        if result["output"] is None:
+            print(f"Nothing to write: {job['output']}")
+        else:
+            print(f"✓ Saved as: {result['output']}")
+        if args.metrics:
+            print(f"  {result['summary']}")
+
+    if hits or misses:
+        print(f"Conversion cache: {hits} hits, {misses} misses")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
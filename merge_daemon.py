@@ -0,0 +1,452 @@
+"""Unattended merging from watched folders and a spool directory of job manifests.
+
+Examples:
+    python merge_daemon.py --spool spool/ --workers 4
+    python merge_daemon.py --watch scans=merged/scans-%Y%m%d-%H%M%S.pdf
+    python merge_daemon.py --config daemon.json
+
+Spool directory: drop a manifest in the merge_cli.py format into it (write it
+under another name first and rename it to .json when it's complete). The
+daemon claims it by moving it to spool/processing, runs its jobs and moves it
+to spool/done, or to spool/failed with a .log of the errors. Relative paths
+in a manifest are resolved against the spool directory. Manifests left in
+processing by a daemon that was stopped are picked up again on start. Only one
+daemon can use a spool directory at a time, it holds a lock on spool/.lock and
+a second one refuses to start.
+
+Watched folders: once files stop arriving in a folder for `settle` seconds,
+everything in it is merged into `output` (a strftime pattern, relative to the
+folder; use a subfolder so outputs aren't merged again) and the inputs are
+moved to a processed/ subfolder, or failed/ when the merge keeps failing.
+
+Jobs run on a process pool, at most `workers` at a time. A job that fails
+with an OS error (a locked file, a full disk, a share that went away), or
+whose worker process died, is retried `retries` times, waiting retry_delay seconds, doubled each time. Other
+errors, like unsupported files or bad page ranges, fail the job right away.
+The engine writes outputs to a temporary file and renames it into place, so
+nothing downstream ever sees a half written file. When the daemon stops, the
+jobs still running are finished and reported before it exits.
+
+A config file is a JSON object with any of "spool", "workers", "retries",
+"retry_delay", "poll", "options" (engine options for every job) and "watch",
+a list of {"folder", "output", "extensions", "settle", "options"}.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import converters
+import merge_cli
+import merge_engine
+from directory_index import DirectoryIndex
+
+
+log = logging.getLogger("docmerger.daemon")
+
+# Failures that may go away when the job runs again, anything else fails it at once.
+# BrokenProcessPool means a worker died (e.g. killed for running out of memory).
+TRANSIENT_ERRORS = (OSError, BrokenProcessPool)
+
+
+def _move(path, directory):
+    """Moves a file into directory, renaming it if the name is taken, returns the new path"""
+    os.makedirs(directory, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(directory, name + ext)
+    for n in itertools.count(1):
+        if not os.path.exists(target):
+            break
+        target = os.path.join(directory, f"{name}-{n}{ext}")
+    os.replace(path, target)
+    return target
+
+
+def _ignore_sigint():
+    """Pool initializer, Ctrl+C stops the daemon which lets running jobs finish"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _unique_output(path):
+    """Adds a counter to an output name that already exists"""
+    base, ext = os.path.splitext(path)
+    for n in itertools.count(1):
+        if not os.path.exists(path):
+            return path
+        path = f"{base}-{n}{ext}"
+
+
+class _Task:
+    """One merge job on its way through the queue"""
+
+    def __init__(self, job, source):
+        self.job = job
+        self.source = source  # SpoolEntry or WatchFolder, told how the job ended
+        self.attempts = 0
+
+
+class SpoolEntry:
+    """A claimed manifest, moved on once all its jobs have finished"""
+
+    def __init__(self, spool, path, jobs):
+        self.spool = spool
+        self.path = path
+        self.remaining = len(jobs)
+        self.errors = []
+
+    def job_done(self, task, error=None):
+        if error is not None:
+            self.errors.append(f"{task.job['output']}: {error}")
+        self.remaining -= 1
+        if self.remaining > 0:
+            return
+        if self.errors:
+            target = _move(self.path, os.path.join(self.spool.directory, "failed"))
+            with open(target + ".log", 'w', encoding='utf-8') as f:
+                f.write("\n".join(self.errors) + "\n")
+            log.warning("Manifest failed: %s", os.path.basename(self.path))
+        else:
+            _move(self.path, os.path.join(self.spool.directory, "done"))
+            log.info("Manifest done: %s", os.path.basename(self.path))
+
+
+def _lock_file(path):
+    """Opens path and takes an exclusive lock on it, the OS drops it when the process ends.
+
+    Returns the open file, or None when another process holds the lock.
+    """
+    f = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class Spool:
+    """Spool directory of JSON job manifests, used by one daemon at a time"""
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = _lock_file(os.path.join(self.directory, ".lock"))
+        if self.lock is None:
+            raise merge_engine.MergeError(f"Another merge daemon is using the spool directory {self.directory}")
+        self.processing = os.path.join(self.directory, "processing")
+        os.makedirs(self.processing, exist_ok=True)
+        # Manifests a stopped daemon didn't finish go back into the queue, with the
+        # lock held no other daemon can be running them
+        for name in os.listdir(self.processing):
+            os.replace(os.path.join(self.processing, name), os.path.join(self.directory, name))
+
+    def close(self):
+        """Releases the spool directory for another daemon"""
+        if self.lock is not None:
+            self.lock.close()
+            self.lock = None
+
+    def claim(self):
+        """Claims the manifests waiting in the spool directory, returns their tasks"""
+        waiting = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".json"):
+                    waiting.append((entry.stat().st_mtime, entry.path))
+
+        tasks = []
+        for _, path in sorted(waiting):
+            claimed = os.path.join(self.processing, os.path.basename(path))
+            if os.path.exists(claimed):
+                continue  # A manifest with this name is still running, take this one later
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue  # Taken away meanwhile
+            try:
+                jobs = merge_cli.load_manifest(claimed, self.directory)
+            except (OSError, ValueError, KeyError, TypeError, merge_engine.MergeError) as e:
+                entry = SpoolEntry(self, claimed, [None])
+                entry.job_done(_Task({"output": os.path.basename(path)}, entry), f"Invalid manifest: {e}")
+                continue
+            log.info("Claimed %s with %d jobs", os.path.basename(path), len(jobs))
+            if not jobs:
+                SpoolEntry(self, claimed, [None]).job_done(None)
+                continue
+            entry = SpoolEntry(self, claimed, jobs)
+            tasks.extend(_Task(job, entry) for job in jobs)
+        return tasks
+
+
+class WatchFolder:
+    """A folder whose files are merged once new ones stop arriving"""
+
+    def __init__(self, folder, output, extensions=None, settle=10.0, options=None):
+        self.folder = os.path.abspath(folder)
+        self.output = output
+        self.extensions = {e.lower() if e.startswith(".") else "." + e.lower()
+                           for e in (extensions or converters.input_types())}
+        self.settle = settle
+        self.options = options or {}
+        self.index = DirectoryIndex(self.folder)
+        self.last_change = None
+        self.claimed = set()  # Files in a job that hasn't finished yet
+        self.seen = {}  # File -> (size, mtime) when it was last checked
+        self.lock = threading.Lock()
+
+    def start(self, interval):
+        self.index.scan()
+        if self.index.files(self.extensions):
+            self.last_change = time.monotonic()
+        self.index.watch(interval, self._changed)
+
+    def stop(self):
+        self.index.stop()
+
+    def _changed(self, added, removed):
+        with self.lock:
+            self.last_change = time.monotonic()
+
+    def ready(self, now):
+        """Returns a task for the files that have settled, or None"""
+        with self.lock:
+            if self.last_change is None or now - self.last_change < self.settle:
+                return None
+            self.last_change = None
+        files = [f for f in self.index.files(self.extensions) if f not in self.claimed]
+        if not files:
+            return None
+        if not self._unchanged(files):
+            with self.lock:
+                self.last_change = now  # Still being written, wait for it to settle
+            return None
+        self.claimed.update(files)
+
+        output = self.output if os.path.isabs(self.output) else os.path.join(self.folder, self.output)
+        output = _unique_output(time.strftime(output))
+        job = {"inputs": [os.path.join(self.folder, f) for f in files], "output": output,
+               "format": None, "options": dict(self.options)}
+        log.info("%d files settled in %s", len(files), self.folder)
+        return _Task(job, self)
+
+    def _unchanged(self, files):
+        """Checks the files kept their size and mtime since they were last looked at"""
+        unchanged = True
+        for f in files:
+            entry = self.index.get(f)
+            before = self.seen.get(f) or (entry and (entry.size, entry.mtime))
+            try:
+                st = os.stat(os.path.join(self.folder, f))
+            except OSError:
+                return False
+            self.seen[f] = (st.st_size, st.st_mtime)
+            unchanged = unchanged and before == self.seen[f]
+        return unchanged
+
+    def job_done(self, task, error=None):
+        """Moves the merged inputs out of the folder"""
+        target = os.path.join(self.folder, "failed" if error is not None else "processed")
+        for path in task.job["inputs"]:
+            try:
+                _move(path, target)
+            except OSError as e:
+                log.warning("Could not move %s: %s", path, e)
+            rel = os.path.relpath(path, self.folder)
+            self.claimed.discard(rel)
+            self.seen.pop(rel, None)
+
+
+class MergeDaemon:
+    def __init__(self, spool=None, watches=(), workers=None, retries=3, retry_delay=5.0, poll=2.0, options=None):
+        self.spool = Spool(spool) if spool else None
+        self.watches = list(watches)
+        self.workers = workers or os.cpu_count() or 1
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.poll = poll
+        self.options = options or {}
+        self.stop_event = threading.Event()
+
+    def _prepare(self, task):
+        # Jobs already run in parallel, don't start a conversion pool per job too
+        task.job["options"] = {**self.options, **(task.job.get("options") or {})}
+        task.job["options"].setdefault("workers", 1)
+        return task
+
+    def run(self):
+        """Runs until stop() is called (or KeyboardInterrupt)"""
+        for watch in self.watches:
+            watch.start(self.poll)
+        queued = []  # Tasks ready to run
+        delayed = []  # Heap of (time to retry, sequence number, task)
+        sequence = itertools.count()
+        running = {}  # Future -> task
+
+        pool = self._new_pool()
+        try:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                if self.spool is not None:
+                    queued.extend(self._prepare(t) for t in self.spool.claim())
+                for watch in self.watches:
+                    task = watch.ready(now)
+                    if task is not None:
+                        queued.append(self._prepare(task))
+                while delayed and delayed[0][0] <= now:
+                    queued.append(heapq.heappop(delayed)[2])
+
+                # Never more than workers jobs in the pool, the rest waits here
+                while queued and len(running) < self.workers:
+                    task = queued.pop(0)
+                    task.attempts += 1
+                    try:
+                        future = pool.submit(merge_cli.run_job, task.job)
+                    except BrokenProcessPool:
+                        # A worker died, the jobs it took down are retried when their futures fail
+                        log.warning("A merge worker died, starting a new pool")
+                        pool.shutdown(wait=False)
+                        pool = self._new_pool()
+                        future = pool.submit(merge_cli.run_job, task.job)
+                    running[future] = task
+
+                if not running:
+                    self.stop_event.wait(self.poll)
+                    continue
+                done, _ = wait(running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    delay = self._finished(future, task)
+                    if delay is not None:
+                        heapq.heappush(delayed, (time.monotonic() + delay, next(sequence), task))
+        finally:
+            for watch in self.watches:
+                watch.stop()
+            # Let the running jobs finish and move their inputs on, so they aren't merged again
+            # on the next start. Unfinished manifests stay in processing/ and are picked up then.
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future, task in running.items():
+                if not future.cancelled():
+                    self._finished(future, task, retry=False)
+            if self.spool is not None:
+                self.spool.close()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_sigint)
+
+    def _finished(self, future, task, retry=True):
+        """Reports a finished job to its source.
+
+        Returns the seconds to wait before retrying it after a transient
+        failure, or None. Without retry a transient failure is left for the
+        next start instead.
+        """
+        try:
+            result = future.result()
+        except TRANSIENT_ERRORS as e:
+            if not retry:
+                log.warning("Merge failed while stopping, it runs again on the next start: %s: %s",
+                            task.job["output"], e)
+                return None
+            if task.attempts <= self.retries:
+                delay = self.retry_delay * 2 ** (task.attempts - 1)
+                log.warning("Merge failed (attempt %d), retrying in %gs: %s: %s",
+                            task.attempts, delay, task.job["output"], e)
+                return delay
+            log.error("Merge failed: %s: %s", task.job["output"], e)
+            task.source.job_done(task, e)
+            return None
+        except Exception as e:
+            log.error("Merge failed: %s: %s", task.job["output"], e)
+            task.source.job_done(task, e)
+            return None
+        log.info("Saved %s (%s)", result["output"] or f"nothing for {task.job['output']}", result["summary"])
+        task.source.job_done(task)
+        return None
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Merge files from watched folders and a spool directory.")
+    parser.add_argument("-c", "--config", help="JSON config file, see the module documentation")
+    parser.add_argument("--spool", help="directory to take JSON job manifests from")
+    parser.add_argument("--watch", action="append", default=[], metavar="FOLDER=OUTPUT",
+                        help="merge files settling in FOLDER into OUTPUT (a strftime pattern)")
+    parser.add_argument("--settle", type=float, default=10.0,
+                        help="seconds without new files before a watched folder is merged (default: 10)")
+    parser.add_argument("-j", "--workers", type=int, help="merge jobs to run at once (default: number of cores)")
+    parser.add_argument("--retries", type=int, help="times to retry a failed job (default: 3)")
+    parser.add_argument("--retry-delay", type=float, help="seconds before the first retry, doubled each time (default: 5)")
+    parser.add_argument("--poll", type=float, help="seconds between checks for new work (default: 2)")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="engine option applied to every job, VALUE is parsed as JSON when possible")
+    return parser
+
+
+def load_config(path):
+    """Reads a daemon config file, relative paths are resolved against its directory"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if config.get("spool"):
+        config["spool"] = os.path.join(base_dir, config["spool"])
+    for watch in config.get("watch", []):
+        watch["folder"] = os.path.join(base_dir, watch["folder"])
+    return config
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    log.setLevel(logging.INFO)
+
+    try:
+        config = load_config(args.config) if args.config else {}
+        options = {**config.get("options", {}), **merge_cli.parse_options(args.option)}
+        watches = [WatchFolder(w["folder"], w["output"], w.get("extensions"), w.get("settle", args.settle),
+                               w.get("options")) for w in config.get("watch", [])]
+        for pair in args.watch:
+            folder, sep, output = pair.partition("=")
+            if not sep:
+                raise merge_engine.MergeError(f"Watched folders must look like FOLDER=OUTPUT: {pair}")
+            watches.append(WatchFolder(folder, output, settle=args.settle))
+        spool = args.spool or config.get("spool")
+        if not spool and not watches:
+            parser.error("nothing to do, give a spool directory or folders to watch")
+        daemon = MergeDaemon(
+            spool, watches,
+            workers=args.workers or config.get("workers"),
+            retries=args.retries if args.retries is not None else config.get("retries", 3),
+            retry_delay=args.retry_delay if args.retry_delay is not None else config.get("retry_delay", 5.0),
+            poll=args.poll if args.poll is not None else config.get("poll", 2.0),
+            options=options)
+    except (OSError, ValueError, KeyError, merge_engine.MergeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    log.info("Merge daemon started with %d workers", daemon.workers)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        log.info("Stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
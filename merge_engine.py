@@ -0,0 +1,740 @@
+"""Headless merge engine shared by the DocMerger GUI and the command line.
+
+Nothing in here touches Tk, so merges can run on machines without a display.
+PyPDF2, Pillow and fpdf are only imported once a merge needs them, and the
+converters for each input type come from the converters registry.
+"""
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+
+import converters
+import fonts
+import merge_manifest
+import merge_metrics
+import page_ranges
+import text_concat
+from conversion_cache import ConversionCache, DEFAULT_MAX_BYTES as DEFAULT_CACHE_SIZE
+from converters import PDF_TYPES, TEXT_TYPES
+
+
+# Options understood by merge(); callers only pass the ones they want to change
+DEFAULT_OPTIONS = {
+    "text_separator": "\n\n" + "=" * 50 + "\n\n",
+    # Encoding assumed for text files that aren't valid UTF-8
+    "text_fallback_encoding": "cp1252",
+    # Text is rendered with this TTF font, None picks a Unicode font installed on
+    # the machine and "" uses the core `font`, which only covers Latin-1
+    "font_file": None,
+    "font": "helvetica",
+    "font_size": 12,
+    "line_height": 10,
+    # Render runs of consecutive text files into one shared document
+    "text_batch": True,
+    # Processes used to convert images and text to PDF, None means one per core
+    "workers": None,
+    # Embed JPEGs as they are instead of decoding and re-encoding them
+    "jpeg_passthrough": True,
+    # Downsample images above this resolution, pages get the image's physical size
+    "target_dpi": None,
+    # Fit images on pages of this size, e.g. "A4", "Letter" or [width, height] in points
+    "page_size": None,
+    "jpeg_quality": 85,
+    # Converted PDFs are kept in memory up to this many bytes, then spill to temp files
+    "memory_limit": 256 * 1024 * 1024,
+    "spill_dir": None,
+    # Copy pages straight into the output instead of holding every input open until
+    # the end, for jobs too big for memory. Outlines and other document level
+    # structures are not copied in this mode.
+    "large_job": False,
+    # Write fonts, images and other objects shared between inputs only once, and
+    # pack objects into Flate compressed object streams at compress_level (0-9)
+    "optimize": False,
+    "compress_level": 6,
+    # Rewrite the output as a linearized ("fast web view") PDF, needs qpdf on the PATH
+    "linearize": False,
+    # Keep a manifest next to PDF outputs and, when merging to the same output
+    # again, copy the pages of unchanged inputs from it instead of redoing them.
+    # Re-merges are written like large jobs, without outlines.
+    "incremental": False,
+    # Conversion cache, either a ConversionCache object or a directory to keep one in
+    "cache": None,
+    "cache_dir": None,
+    "cache_size": DEFAULT_CACHE_SIZE,
+    "cache_key": "content",  # "content" hashes the input, "stat" uses path + size + mtime
+    # Stage timings and per-input counters, see merge_metrics. Pass a MergeMetrics to
+    # read them after the job, a path to have them written as JSON, and/or a hook
+    # that gets every timed step as it happens.
+    "metrics": None,
+    "metrics_file": None,
+    "metrics_hook": None,
+    # Write cProfile stats of the whole job to this path
+    "profile": None,
+    # Record peak Python memory and the top allocation sites in the metrics (slow)
+    "trace_memory": False,
+}
+
+
+# Options that change the converted output, they are part of the cache key
+CONVERSION_OPTIONS = ("font_file", "font", "font_size", "line_height", "text_fallback_encoding",
+                      "jpeg_passthrough", "target_dpi", "page_size", "jpeg_quality")
+
+
+class MergeError(Exception):
+    """Raised when a merge job cannot be run with the given inputs"""
+
+
+class MergeCancelled(MergeError):
+    """Raised when a merge job is cancelled before it finished"""
+
+
+class _Progress:
+    """Reports per-file progress and checks for cancellation between steps"""
+
+    def __init__(self, total, callback=None, cancel=None, metrics=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.cancel = cancel
+        self.metrics = metrics or merge_metrics.MergeMetrics()
+
+    def check(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise MergeCancelled("Merge cancelled")
+
+    def step(self, message):
+        """Marks one step as finished, then raises if the job was cancelled"""
+        self.done += 1
+        if self.callback is not None:
+            self.callback(self.done, self.total, message)
+        self.check()
+
+    def finish(self, message):
+        """Reports the final step, the job can no longer be cancelled here"""
+        self.done = self.total
+        if self.callback is not None:
+            self.callback(self.done, self.total, message)
+
+
+def normalize_format(format_type):
+    """Returns the output format as a lower case extension with a leading dot"""
+    format_type = format_type.strip().lower()
+    if not format_type.startswith("."):
+        format_type = "." + format_type
+    return format_type
+
+
+def file_type(path):
+    """Returns the lower case extension of a file"""
+    return os.path.splitext(path)[1].lower()
+
+
+def available_formats(files):
+    """Returns the output formats that can be produced from the given files"""
+    return formats_for_types({file_type(f) for f in files})
+
+
+def formats_for_types(file_types):
+    """Returns the output formats that can be produced from the given extensions"""
+    return converters.formats_for_types(file_types)
+
+
+def split_inputs(inputs):
+    """Splits merge() inputs into a list of paths and a parallel list of page specs.
+
+    An input is a path, a (path, pages) pair or a {"path": ..., "pages": ...}
+    dict, where pages is a page range spec like "1-3,10" or None for all pages.
+    """
+    paths, specs = [], []
+    for item in inputs:
+        if isinstance(item, dict):
+            path, spec = item["path"], item.get("pages")
+        elif isinstance(item, (tuple, list)):
+            path, spec = item
+        else:
+            path, spec = item, None
+        if spec is not None:
+            spec = str(spec).strip() or None
+        paths.append(os.fspath(path))
+        specs.append(spec)
+    return paths, specs
+
+
+def merge(inputs, output, format_type=None, options=None, progress=None, cancel=None):
+    """Merges the input files in order and writes the result to output.
+
+    inputs are paths, or (path, pages) pairs to take only some pages of a
+    PDF, see split_inputs().
+    format_type defaults to the extension of output. progress is called as
+    progress(done, total, message) after every input and after the final
+    write. cancel is any object with is_set(), e.g. a threading.Event; when
+    it gets set the job stops at the next file and MergeCancelled is raised.
+
+    The output is written to a temporary file next to it and renamed into
+    place at the end, so readers never see a partial file and a cancelled or
+    failed job leaves an existing output as it was.
+
+    Returns the output path, or None when the inputs produced nothing to write.
+    """
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    metrics = opts["metrics"] or merge_metrics.MergeMetrics()
+    if opts["metrics_hook"] is not None:
+        metrics.hook = opts["metrics_hook"]
+
+    result = error = None
+    try:
+        with contextlib.ExitStack() as stack:
+            if opts["profile"]:
+                stack.enter_context(merge_metrics.profile(opts["profile"]))
+            if opts["trace_memory"]:
+                stack.enter_context(merge_metrics.trace_memory(metrics))
+            result = _merge(inputs, output, format_type, opts, metrics, progress, cancel)
+        return result
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        metrics.finish(result, error)
+        if opts["metrics_file"]:
+            metrics.save(opts["metrics_file"])
+
+
+def _merge(inputs, output, format_type, opts, metrics, progress, cancel):
+    inputs, page_specs = split_inputs(inputs)
+    output = os.path.normpath(os.fspath(output))
+    format_type = normalize_format(format_type or file_type(output))
+
+    if not inputs:
+        raise MergeError("Select at least one file!")
+    with metrics.stage("setup"):
+        converters.load_plugins()
+        supported = set(converters.input_types())
+        formats = available_formats(inputs)
+    with metrics.stage("scan"):
+        missing = [f for f in inputs if not os.path.isfile(f)]
+        if missing:
+            raise MergeError(f"Input file not found: {missing[0]}")
+        units = conversion_groups(inputs, opts["text_batch"]) if format_type == ".pdf" else [[f] for f in inputs]
+        for unit in units:
+            metrics.add_bytes(unit, sum(os.path.getsize(f) for f in unit))
+    unsupported = [f for f in inputs if file_type(f) not in supported]
+    if unsupported:
+        raise MergeError(f"Unsupported file type: {os.path.basename(unsupported[0])}")
+    if format_type not in formats:
+        raise MergeError(f"Cannot export {', '.join(sorted({file_type(f) for f in inputs}))} files as {format_type}")
+    for file, spec in zip(inputs, page_specs):
+        if spec is None:
+            continue
+        if file_type(file) not in PDF_TYPES:
+            raise MergeError(f"Page ranges only apply to PDF files: {os.path.basename(file)}")
+        try:
+            page_ranges.parse_page_ranges(spec)
+        except ValueError as e:
+            raise MergeError(f"{os.path.basename(file)}: {e}") from None
+
+    out_dir = os.path.dirname(output)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    tracker = _Progress(len(inputs) + 1, progress, cancel, metrics)
+    tracker.check()
+    tmp = temp_output_path(output)
+    try:
+        if format_type == ".png":
+            written = merge_images(inputs, tmp, tracker)
+        elif format_type == ".txt":
+            written = merge_text(inputs, tmp, opts, tracker)
+        else:
+            written = merge_pdf(inputs, output, opts, tracker, page_specs, target=tmp, groups=units)
+        if written is None:
+            return None
+        os.replace(tmp, output)
+    finally:
+        # Never leave a half written file behind
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    tracker.finish("Saved " + os.path.basename(output))
+    return output
+
+
+def temp_output_path(output):
+    """Returns a unique hidden file name next to output to write it under"""
+    directory, name = os.path.split(output)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex[:12]}.tmp")
+
+
+class _StepTimer:
+    """Accounts the time between per-file callbacks to that file's append stage"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.last = time.perf_counter()
+
+    def __call__(self, file):
+        now = time.perf_counter()
+        self.tracker.metrics.record("append", now - self.last, [file])
+        self.tracker.step(os.path.basename(file))
+        self.last = time.perf_counter()
+
+    def finish(self):
+        """The time since the last file went into writing the output"""
+        self.tracker.metrics.record("write", time.perf_counter() - self.last)
+
+
+def merge_images(inputs, output, tracker):
+    """Stitches images vertically into a single PNG without holding the whole canvas"""
+    metrics = tracker.metrics
+    with metrics.stage("setup"):
+        import png_stitcher
+    with metrics.stage("open"):
+        sizes = png_stitcher.image_sizes(inputs)
+    for file in inputs:
+        metrics.add_pages([file], 1)
+    timer = _StepTimer(tracker)
+    png_stitcher.stitch_vertical(inputs, output, timer, sizes=sizes)
+    timer.finish()
+    return output
+
+
+def merge_text(inputs, output, opts, tracker):
+    """Concatenates text files with a separator between them, streaming the bytes"""
+    with tracker.metrics.stage("open"):
+        encodings = [text_concat.detect_encoding(f, opts["text_fallback_encoding"]) for f in inputs]
+    timer = _StepTimer(tracker)
+    text_concat.concat(inputs, output, opts["text_separator"], opts["text_fallback_encoding"], timer,
+                       detected=encodings)
+    timer.finish()
+    return output
+
+
+def conversion_settings(opts):
+    """Returns the options that change what convert_to_pdf() produces"""
+    return {key: opts[key] for key in CONVERSION_OPTIONS}
+
+
+def _with_font(settings):
+    """Returns settings with font_file None replaced by the Unicode font found on this machine"""
+    if settings.get("font_file") is not None:
+        return settings
+    return {**settings, "font_file": fonts.find_unicode_font()}
+
+
+def converter_identity(files):
+    """Returns which converter turns a unit into PDF, or None for PDFs, see converters.Converter.identity"""
+    converter = converters.get(file_type(files[0]), ".pdf")
+    if converter is None or converter.target is None:
+        return None
+    return converter.identity
+
+
+def unit_settings(files, settings):
+    """The conversion settings of a unit with its converter added, cache entries are keyed by them.
+
+    The default font is only looked up for text, other units never use it.
+    """
+    if file_type(files[0]) in TEXT_TYPES:
+        settings = _with_font(settings)
+    return {**settings, "converter": converter_identity(files)}
+
+
+def conversion_groups(inputs, batch_text=True):
+    """Splits inputs into the units that get converted (or appended) together.
+
+    PDFs and images are units of their own, runs of consecutive files with
+    the same batch converter (text files) become one unit when batch_text is
+    set so they share one document.
+    """
+    groups = []
+    previous = None
+    for file in inputs:
+        converter = converters.get(file_type(file), ".pdf")
+        if batch_text and converter is not None and converter.batch and converter is previous:
+            groups[-1].append(file)
+        else:
+            groups.append([file])
+        previous = converter
+    return groups
+
+
+def convert_to_pdf(files, settings):
+    """Converts an image, or a batch of text files, to PDF with its registered converter and returns the PDF bytes"""
+    converter = converters.get(file_type(files[0]), ".pdf")
+    if converter is None or converter.target is None:
+        raise MergeError(f"No PDF converter for {file_type(files[0])} files")
+    return converter(files, settings)
+
+
+def _convert_task(files, settings, cache_dir=None, key_mode="content"):
+    """Pool entry point, returns (cache key, PDF bytes, cache hit, seconds).
+
+    Looks the files up in the conversion cache first when one is configured.
+    Only the calling process stores new entries, so eviction stays in one place.
+    """
+    start = time.perf_counter()
+    key = data = None
+    if cache_dir is not None:
+        cache = ConversionCache(cache_dir, key_mode=key_mode)
+        key = cache.key(files, settings)
+        data = cache.get(key)
+        if data is not None:
+            return key, data, True, time.perf_counter() - start
+    data = convert_to_pdf(files, settings)
+    return key, data, False, time.perf_counter() - start
+
+
+class _Buffers:
+    """Holds converted PDFs until the merger writes the output.
+
+    Buffers stay in memory until memory_limit bytes are used, after that they
+    spill to anonymous temp files that the OS removes even if we crash.
+    """
+
+    def __init__(self, memory_limit, spill_dir=None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.in_memory = 0
+        self.buffers = []
+
+    def wrap(self, data):
+        if self.in_memory + len(data) <= self.memory_limit:
+            self.in_memory += len(data)
+            buf = io.BytesIO(data)
+        else:
+            buf = tempfile.TemporaryFile(dir=self.spill_dir)
+            buf.write(data)
+            buf.seek(0)
+        self.buffers.append(buf)
+        return buf
+
+    def close(self):
+        for buf in self.buffers:
+            buf.close()
+        self.buffers = []
+        self.in_memory = 0
+
+
+class _Conversions:
+    """Runs conversion tasks and hands out their results in input order.
+
+    With more than one task and more than one worker the tasks run on a
+    process pool while earlier inputs are being appended. At most
+    PREFETCH_PER_WORKER tasks per worker are in flight or waiting to be
+    picked up, so finished results never pile up in memory.
+    """
+
+    PREFETCH_PER_WORKER = 4
+
+    def __init__(self, tasks, workers, tracker, cache=None):
+        self.tasks = list(tasks)
+        self.tracker = tracker
+        self.cache = cache
+        self.pool = None
+        self.futures = {}
+        self.next_index = 0
+        self.next_submit = 0
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(self.tasks) > 1:
+            workers = min(workers, len(self.tasks))
+            self.window = workers * self.PREFETCH_PER_WORKER
+            self.pool = ProcessPoolExecutor(max_workers=workers)
+            self._submit()
+
+    def _submit(self):
+        while self.next_submit < len(self.tasks) and self.next_submit < self.next_index + self.window:
+            self.futures[self.next_submit] = self.pool.submit(_convert_task, *self.tasks[self.next_submit])
+            self.next_submit += 1
+
+    def next(self):
+        idx = self.next_index
+        self.next_index += 1
+        files = self.tasks[idx][0]
+        if self.pool is None:
+            key, data, hit, seconds = _convert_task(*self.tasks[idx])
+        else:
+            future = self.futures.pop(idx)
+            self._submit()
+            with self.tracker.metrics.stage("wait", files):
+                while True:
+                    try:
+                        key, data, hit, seconds = future.result(timeout=0.1)
+                        break
+                    except FuturesTimeout:
+                        self.tracker.check()
+        self.tracker.metrics.record("convert", seconds, files)
+
+        if self.cache is not None:
+            if hit:
+                self.cache.hits += 1
+            else:
+                self.cache.misses += 1
+                self.cache.put(key, data)
+        return data
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+
+def _selected_pages(reader, spec, file):
+    """Looks up only the pages a spec asks for, see page_ranges.lazy_pages()"""
+    try:
+        indices = page_ranges.page_indices(spec, page_ranges.page_count(reader))
+        return list(page_ranges.lazy_pages(reader, indices))
+    except (ValueError, IndexError) as e:
+        raise MergeError(f"{os.path.basename(file)}: {e}") from None
+
+
+def _previous_pages(reader, first, count, output):
+    """Looks up a span of pages in the previous output of an incremental merge"""
+    try:
+        return list(page_ranges.lazy_pages(reader, range(first, first + count)))
+    except (ValueError, IndexError) as e:
+        raise MergeError(f"{os.path.basename(output)}: {e}") from None
+
+
+def extract_pages(file, spec):
+    """Copies the pages of a PDF selected by a page range spec into a new PDF, returns the bytes"""
+    from PyPDF2 import PdfReader
+    import pdf_stream
+
+    out = io.BytesIO()
+    with open(file, 'rb') as src:
+        writer = pdf_stream.StreamingPdfWriter(out)
+        writer.add_pages(_selected_pages(PdfReader(src), spec, file))
+        writer.close()
+    return out.getvalue()
+
+
+def _writer_options(opts):
+    """StreamingPdfWriter arguments for the optimize options"""
+    if not opts["optimize"]:
+        return {}
+    return {"dedupe": True, "compress_level": opts["compress_level"]}
+
+
+def linearize(path):
+    """Rewrites a PDF in place as a linearized file, using qpdf"""
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        raise MergeError("Linearized output needs qpdf, it was not found on the PATH")
+    result = subprocess.run([qpdf, "--linearize", "--replace-input", path], capture_output=True, text=True)
+    if result.returncode not in (0, 3):  # 3 means it worked but had warnings
+        raise MergeError(f"qpdf could not linearize the output: {result.stderr.strip()}")
+
+
+def _finish_pdf(output, target, opts, tracker, plan=None):
+    with tracker.metrics.stage("write"):
+        if opts["linearize"]:
+            linearize(target)
+        if plan is not None:
+            plan.manifest.save(output, target)
+    return target
+
+
+class _RemergePlan:
+    """Which groups of an incremental merge are unchanged since the previous output"""
+
+    def __init__(self, output, groups, page_specs, settings):
+        self.output = output
+        previous = merge_manifest.MergeManifest.load(output, settings)
+        self.manifest = merge_manifest.MergeManifest(settings)
+        self.hashes = []
+        self.reuse = []  # (first page, page count) in the previous output, or None
+        pos = 0
+        for group in groups:
+            hashes = [self.manifest.file_hash(f, previous) for f in group]
+            key = merge_manifest.MergeManifest.unit_key(hashes, page_specs[pos], converter_identity(group))
+            self.hashes.append(hashes)
+            self.reuse.append(previous.span(key) if previous is not None else None)
+            pos += len(group)
+
+    def reusable(self):
+        return any(span is not None for span in self.reuse)
+
+    def record(self, idx, group, spec, start, count):
+        self.manifest.add_unit(group, self.hashes[idx], spec, start, count, converter_identity(group))
+
+
+def _copy_groups(writer, groups, page_specs, converted, tracker, plan=None, previous=None):
+    """Copies every group's pages into a StreamingPdfWriter in order.
+
+    With a plan and the previous output's reader, unchanged groups are copied
+    from the previous output.
+    """
+    from PyPDF2 import PdfReader
+
+    metrics = tracker.metrics
+    previous_map = {}  # The previous output's objects already in the output, kept across its groups
+    pos = 0
+    for idx, group in enumerate(groups):
+        spec = page_specs[pos]
+        pos += len(group)
+        start = writer.page_count
+        span = plan.reuse[idx] if previous is not None else None
+        if span is not None:
+            # Unchanged since the last merge, take its pages from the previous output
+            first, count = span
+            with metrics.stage("append", group):
+                writer.resume_source(previous_map)
+                writer.add_pages(_previous_pages(previous, first, count, plan.output))
+                previous_map = writer.end_source()
+        elif file_type(group[0]) in PDF_TYPES:
+            with open(group[0], 'rb') as src:
+                with metrics.stage("open", group):
+                    reader = PdfReader(src)
+                with metrics.stage("append", group):
+                    if spec is None:
+                        writer.add_reader(reader)
+                    else:
+                        writer.add_pages(_selected_pages(reader, spec, group[0]))
+                        writer.end_source()
+        else:
+            data = converted.next()
+            with metrics.stage("open", group):
+                reader = PdfReader(io.BytesIO(data))
+            with metrics.stage("append", group):
+                writer.add_reader(reader)
+        metrics.add_pages(group, writer.page_count - start)
+        if plan is not None:
+            plan.record(idx, group, spec, start, writer.page_count - start)
+        for file in group:
+            tracker.step(os.path.basename(file))
+
+
+def _merge_pdf_streaming(groups, page_specs, output, target, converted, opts, tracker, plan=None):
+    """Large job mode, copies each input's pages into the output and closes it right away"""
+    import pdf_stream
+
+    with open(target, 'wb') as f_out:
+        writer = pdf_stream.StreamingPdfWriter(f_out, **_writer_options(opts))
+        _copy_groups(writer, groups, page_specs, converted, tracker, plan)
+        with tracker.metrics.stage("write"):
+            writer.close()
+
+    if writer.page_count == 0:
+        return None
+    return _finish_pdf(output, target, opts, tracker, plan)
+
+
+def _remerge_pdf(groups, page_specs, output, target, converted, opts, tracker, plan):
+    """Incremental merge, builds the new output from the previous one and the changed groups"""
+    from PyPDF2 import PdfReader
+    import pdf_stream
+
+    with open(output, 'rb') as previous, open(target, 'wb') as f_out:
+        writer = pdf_stream.StreamingPdfWriter(f_out, **_writer_options(opts))
+        with tracker.metrics.stage("open"):
+            reader = PdfReader(previous)
+        _copy_groups(writer, groups, page_specs, converted, tracker, plan, reader)
+        with tracker.metrics.stage("write"):
+            writer.close()
+
+    if writer.page_count == 0:
+        return None
+    return _finish_pdf(output, target, opts, tracker, plan)
+
+
+def merge_pdf(inputs, output, opts, tracker, page_specs=None, target=None, groups=None):
+    """Converts images and text files to PDF and appends everything in order.
+
+    page_specs optionally holds a page range spec (or None) for each input
+    and groups the inputs' conversion_groups() when the caller has them.
+    The PDF is written to target, by default output itself; an incremental
+    re-merge reads the previous output, so it needs a different target.
+    Returns the file written, or None when there were no pages.
+    """
+    metrics = tracker.metrics
+    with metrics.stage("setup"):
+        from PyPDF2 import PdfMerger, PdfReader
+        import pdf_stream
+
+        if target is None:
+            target = output
+        if page_specs is None:
+            page_specs = [None] * len(inputs)
+        if opts["linearize"] and shutil.which("qpdf") is None:
+            raise MergeError("Linearized output needs qpdf, it was not found on the PATH")
+
+        cache = opts["cache"]
+        if cache is None and opts["cache_dir"]:
+            cache = ConversionCache(opts["cache_dir"], opts["cache_size"], opts["cache_key"])
+        cache_args = (cache.directory, cache.key_mode) if cache is not None else ()
+
+        settings = conversion_settings(opts)
+        if groups is None:
+            groups = conversion_groups(inputs, opts["text_batch"])
+    with metrics.stage("scan"):  # Hashes the inputs
+        plan = _RemergePlan(output, groups, page_specs, _with_font(settings)) if opts["incremental"] else None
+    remerge = plan is not None and plan.reusable() and target != output
+    reuse = plan.reuse if remerge else [None] * len(groups)
+
+    # Everything that is not a PDF yet gets converted up front, unless the previous output has it
+    with metrics.stage("setup"):
+        tasks = [(tuple(group), unit_settings(group, settings), *cache_args) for group, span in zip(groups, reuse)
+                 if span is None and file_type(group[0]) not in PDF_TYPES]
+        converted = _Conversions(tasks, opts["workers"], tracker, cache)
+    pdf_merger = PdfMerger()
+    buffers = _Buffers(opts["memory_limit"], opts["spill_dir"])
+
+    if remerge:
+        try:
+            return _remerge_pdf(groups, page_specs, output, target, converted, opts, tracker, plan)
+        finally:
+            converted.close()
+    if opts["large_job"]:
+        try:
+            return _merge_pdf_streaming(groups, page_specs, output, target, converted, opts, tracker, plan)
+        finally:
+            converted.close()
+
+    try:
+        # Append in the user's order, converted files as soon as they are ready.
+        # PdfMerger parses each input as it's appended, so opening is part of append here.
+        pos = 0
+        for idx, group in enumerate(groups):
+            spec = page_specs[pos]
+            pos += len(group)
+            start = len(pdf_merger.pages)
+            if file_type(group[0]) in PDF_TYPES and spec is not None:
+                # Only the selected pages are read, instead of the whole page tree
+                with metrics.stage("open", group):
+                    data = extract_pages(group[0], spec)
+                with metrics.stage("append", group):
+                    pdf_merger.append(buffers.wrap(data))
+            elif file_type(group[0]) in PDF_TYPES:
+                with metrics.stage("append", group):
+                    pdf_merger.append(group[0])
+            else:
+                data = converted.next()
+                with metrics.stage("append", group):
+                    pdf_merger.append(buffers.wrap(data))
+            metrics.add_pages(group, len(pdf_merger.pages) - start)
+            if plan is not None:
+                plan.record(idx, group, spec, start, len(pdf_merger.pages) - start)
+            for file in group:
+                tracker.step(os.path.basename(file))
+
+        if len(pdf_merger.pages) == 0:
+            return None
+        with metrics.stage("write"), open(target, 'wb') as f_out:
+            if opts["optimize"]:
+                # PdfMerger writes every input's copy of shared objects, copy its output
+                # once more through a writer that keeps only one of each
+                with tempfile.SpooledTemporaryFile(opts["memory_limit"], dir=opts["spill_dir"]) as spool:
+                    pdf_merger.write(spool)
+                    spool.seek(0)
+                    pdf_stream.rewrite(PdfReader(spool), f_out, **_writer_options(opts))
+            else:
+                pdf_merger.write(f_out)
+        return _finish_pdf(output, target, opts, tracker, plan)
+    finally:
+        converted.close()
+        pdf_merger.close()
+        buffers.close()
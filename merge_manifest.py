@@ -0,0 +1,109 @@
+"""Record of what went into a merged PDF, for incremental re-merges.
+
+The manifest is written next to the output as <output>.manifest.json. It lists
+every unit that was merged (a PDF, an image or a batch of text files) with the
+content hashes of its files, its page range, the converter that made it and
+the pages it produced in the output, along with the conversion settings. On
+the next merge, units whose files and page range are unchanged are copied
+straight from the previous output and only the rest is converted again.
+
+Files are only hashed again when their size or mtime differ from the manifest,
+and a manifest is ignored once its output was changed by anything else.
+"""
+import hashlib
+import json
+import os
+
+
+MANIFEST_VERSION = 2
+SUFFIX = ".manifest.json"
+
+
+def manifest_path(output):
+    return output + SUFFIX
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _normalized(settings):
+    """Settings the way they read back from JSON, so they compare equal"""
+    return json.loads(json.dumps(settings, sort_keys=True))
+
+
+class MergeManifest:
+    def __init__(self, settings):
+        self.settings = _normalized(settings)
+        self.files = {}  # Absolute path -> {"size", "mtime_ns", "hash"}
+        self.units = []  # {"files", "hashes", "pages", "converter", "start", "count"} in output order
+        self._spans = {}  # Unit key -> (first page, page count) in the output
+
+    @classmethod
+    def load(cls, output, settings):
+        """Reads the manifest of output, or returns None when it can't be reused"""
+        try:
+            with open(manifest_path(output), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            st = os.stat(output)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION or data.get("settings") != _normalized(settings):
+            return None
+        if data.get("output") != [st.st_size, st.st_mtime_ns]:
+            return None  # The output was changed since, its pages can't be trusted
+
+        manifest = cls(settings)
+        manifest.files = data.get("files", {})
+        for unit in data.get("units", []):
+            key = cls.unit_key(unit["hashes"], unit["pages"], unit["converter"])
+            manifest._spans.setdefault(key, (unit["start"], unit["count"]))
+        return manifest
+
+    @staticmethod
+    def unit_key(hashes, pages, converter=None):
+        return json.dumps([hashes, pages, converter])
+
+    def file_hash(self, path, previous=None):
+        """Hashes a file, reusing the previous manifest's hash while its size and mtime match"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = previous.files.get(path) if previous is not None else None
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            digest = known["hash"]
+        else:
+            digest = _hash_file(path)
+        self.files[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        return digest
+
+    def span(self, key):
+        """Returns (first page, page count) of a unit in the output, or None"""
+        return self._spans.get(key)
+
+    def add_unit(self, files, hashes, pages, start, count, converter=None):
+        self.units.append({"files": [os.path.abspath(f) for f in files], "hashes": hashes,
+                           "pages": pages, "converter": converter, "start": start, "count": count})
+        self._spans.setdefault(self.unit_key(hashes, pages, converter), (start, count))
+
+    def save(self, output, written=None):
+        """Writes the manifest for a finished output.
+
+        written is the file that is about to be renamed to output, if it isn't there yet.
+        """
+        st = os.stat(written or output)
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "output": [st.st_size, st.st_mtime_ns],
+            "files": self.files,
+            "units": self.units,
+        }
+        path = manifest_path(output)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
@@ -0,0 +1,158 @@
+"""Per-stage timings and per-input counters for merge jobs.
+
+merge() fills in a MergeMetrics as it goes, when one is passed in the
+"metrics" option or when "metrics_file" or "metrics_hook" ask for one. Time
+is accounted to these stages:
+
+    setup     importing the backends, loading plugins and starting the conversion pool
+    scan      finding the inputs on disk, and hashing them for incremental merges
+    open      opening and parsing inputs, and decoding PDFs cut to page ranges
+    convert   turning images and text into PDF, as measured in the worker
+    wait      time the merge spent waiting for a conversion to finish
+    append    copying pages, image rows or text into the output
+    write     writing the output file and the finishing passes
+
+Each input unit (a PDF, an image or a batch of text files that is converted
+together) gets its bytes on disk, the pages it added and its time per stage,
+so a slow job can be traced to the file that made it slow. Conversions run in
+parallel, so per-stage totals can add up to more than the wall time.
+
+A hook gets every timed step as a dict as soon as it's done, e.g. to feed a
+monitoring system: {"stage": "convert", "seconds": 0.12, "files": [...]}.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+STAGES = ("setup", "scan", "open", "convert", "wait", "append", "write")
+
+# Allocation sites listed by trace_memory
+TOP_ALLOCATIONS = 10
+
+
+class MergeMetrics:
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.units = {}  # Tuple of files -> {"files", "bytes", "pages", "seconds"}
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.output = None
+        self.output_bytes = None
+        self.error = None
+        self.memory = None
+
+    def unit(self, files):
+        """Returns the counters of an input unit, created on first use"""
+        files = tuple(files)
+        unit = self.units.get(files)
+        if unit is None:
+            unit = self.units[files] = {"files": list(files), "bytes": 0, "pages": 0,
+                                        "seconds": dict.fromkeys(STAGES, 0.0)}
+        return unit
+
+    def record(self, stage, seconds, files=None):
+        """Adds seconds to a stage, and to the input unit of files if given"""
+        self.stages[stage] += seconds
+        if files:
+            self.unit(files)["seconds"][stage] += seconds
+        if self.hook is not None:
+            self.hook({"stage": stage, "seconds": seconds, "files": list(files) if files else None})
+
+    @contextmanager
+    def stage(self, stage, files=None):
+        """Times the block as a stage of the given input unit"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, files)
+
+    def add_pages(self, files, pages):
+        self.unit(files)["pages"] += pages
+
+    def add_bytes(self, files, size):
+        self.unit(files)["bytes"] += size
+
+    def finish(self, output=None, error=None):
+        self.wall_seconds = time.perf_counter() - self.started
+        if output is not None and os.path.exists(output):
+            self.output = output
+            self.output_bytes = os.path.getsize(output)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def slowest_stage(self):
+        """Returns (stage, seconds) of the stage that took longest"""
+        return max(self.stages.items(), key=lambda item: item[1])
+
+    def slowest_units(self, count=5):
+        """Returns the input units that took longest, slowest first"""
+        return sorted(self.units.values(), key=lambda u: sum(u["seconds"].values()), reverse=True)[:count]
+
+    def summary(self):
+        """One line for a status bar or a log"""
+        stage, seconds = self.slowest_stage()
+        text = f"{self.wall_seconds or 0:.1f} s"
+        if seconds > 0:
+            text += f", mostly {stage} ({seconds:.1f} s)"
+        units = self.slowest_units(1)
+        if units and sum(units[0]["seconds"].values()) > 0:
+            text += f", slowest input {os.path.basename(units[0]['files'][0])}"
+        return text
+
+    def to_dict(self):
+        return {
+            "wall_seconds": self.wall_seconds,
+            "stages": self.stages,
+            "output": self.output,
+            "output_bytes": self.output_bytes,
+            "input_bytes": sum(u["bytes"] for u in self.units.values()),
+            "pages": sum(u["pages"] for u in self.units.values()),
+            "error": self.error,
+            "memory": self.memory,
+            "inputs": list(self.units.values()),
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+@contextmanager
+def trace_memory(metrics):
+    """Records the peak traced memory and the top allocation sites of the block in metrics.memory"""
+    import tracemalloc
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+        if started:
+            tracemalloc.stop()
+        metrics.memory = {
+            "peak_bytes": peak,
+            "current_bytes": current,
+            "top": [{"where": str(stat.traceback), "bytes": stat.size, "count": stat.count} for stat in top],
+        }
+
+
+@contextmanager
+def profile(path):
+    """Runs the block under cProfile and writes the stats to path, for pstats or snakeviz"""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
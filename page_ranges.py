@@ -0,0 +1,125 @@
+"""Page range specifications and lazy page lookup.
+
+A spec like "1-3,10" lists 1-based pages in the order they should appear.
+"5-" runs to the last page and "-3" starts at the first one.
+
+lazy_pages() finds pages by walking the page tree from its root and using each
+node's /Count to skip whole subtrees, so only the nodes on the way to a
+requested page are read through the xref. Taking the cover of a 2000 page
+report costs a handful of object reads instead of PyPDF2 flattening the whole
+page tree first.
+"""
+import bisect
+import re
+
+
+# Page attributes a page inherits from its ancestors in the page tree
+INHERITABLE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+_RANGE = re.compile(r"^\s*(\d*)\s*(-?)\s*(\d*)\s*$")
+
+
+def parse_page_ranges(spec):
+    """Parses a spec like "1-3,10" into (first, last) pairs, 1-based and inclusive.
+
+    last is None for ranges open to the end. Raises ValueError for bad specs.
+    """
+    ranges = []
+    for part in str(spec).split(","):
+        match = _RANGE.match(part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"Invalid page range: {part.strip() or spec}")
+        first, dash, last = match.groups()
+        if not dash:
+            first = last = int(first)
+        else:
+            first = int(first) if first else 1
+            last = int(last) if last else None
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range: {part.strip()}")
+        ranges.append((first, last))
+    return ranges
+
+
+def page_indices(spec, page_count):
+    """Resolves a spec against a document's page count, returns 0-based page indices"""
+    indices = []
+    for first, last in parse_page_ranges(spec):
+        last = page_count if last is None else last
+        if first > page_count or last > page_count:
+            raise ValueError(f"Page {max(first, last)} is out of range, the document has {page_count} pages")
+        indices.extend(range(first - 1, last))
+    return indices
+
+
+def page_count(reader):
+    """Returns the number of pages from the root node, without reading the page tree"""
+    return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+
+
+def lazy_page(reader, index):
+    """Looks up one page by its 0-based index, reading only the nodes on its path.
+
+    Returns a copy of the page dictionary with its inherited attributes filled
+    in and indirect_reference set, ready for StreamingPdfWriter.add_pages().
+    """
+    return next(lazy_pages(reader, [index]))
+
+
+def lazy_pages(reader, indices):
+    """Yields the pages at the given 0-based indices, in the order given.
+
+    All of them are found in one walk of the page tree, so a span of pages
+    reads each node on the way once instead of once per page.
+    """
+    indices = list(indices)
+    found = {}
+    root = reader.trailer["/Root"].raw_get("/Pages")
+    _collect_pages(root, root.get_object(), 0, sorted(set(indices)), {}, found, set())
+    for index in indices:
+        yield found[index]
+
+
+def _is_leaf(node):
+    return node.get("/Type") == "/Page" or "/Kids" not in node
+
+
+def _collect_pages(node_ref, node, first, wanted, inherited, found, path):
+    """Fills found with the pages in wanted, sorted indices under the node whose first page is first"""
+    from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject
+
+    if _is_leaf(node):
+        if wanted != [first]:
+            raise ValueError("The page tree has fewer pages than its /Count says")
+        page = DictionaryObject(node)
+        for key, value in inherited.items():
+            if key not in page:
+                page[NameObject(key)] = value
+        page.indirect_reference = node_ref if isinstance(node_ref, IndirectObject) else None
+        found[first] = page
+        return
+
+    if isinstance(node_ref, IndirectObject):
+        if node_ref.idnum in path:
+            raise ValueError("The page tree contains a cycle")
+        path = path | {node_ref.idnum}
+    inherited = dict(inherited)
+    for key in INHERITABLE_KEYS:
+        if key in node:
+            inherited[key] = node.raw_get(key)
+
+    # A node's /Count can match its number of kids without every kid being
+    # a single page (an empty /Pages next to a bigger one), so always walk them
+    start = 0
+    for kid in node["/Kids"]:
+        if start == len(wanted):
+            return
+        kid_node = kid.get_object()
+        count = 1 if _is_leaf(kid_node) else int(kid_node.get("/Count", 0))
+        end = bisect.bisect_left(wanted, first + count, start)
+        if end > start:
+            _collect_pages(kid, kid_node, first, wanted[start:end], inherited, found, path)
+            start = end
+        first += count
+    if start < len(wanted):
+        raise ValueError("The page tree has fewer pages than its /Count says")
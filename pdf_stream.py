@@ -0,0 +1,326 @@
+"""PDF writer that copies pages into the output as it goes.
+
+PdfMerger keeps every source open and parsed until write(). This writer
+instead serializes each copied page, and every object it references, straight
+to the output file, then forgets the source. Memory and file handles stay flat
+however many inputs are merged; only one int per written object (its offset)
+and one per page is kept until close().
+
+Only pages and what they reference are copied. Document level structures
+such as outlines, named destinations and forms are dropped, and references to
+pages that were not copied become null. rewrite() copies a whole document
+instead, keeping those structures.
+
+With dedupe, objects are compared by content across all sources, so a font,
+logo or letterhead shared by many inputs is written once; this keeps one hash
+per written object in memory. With a compress_level, small objects are packed
+into Flate compressed object streams, unfiltered streams are compressed and
+the cross-reference table is written as a compressed xref stream.
+"""
+import hashlib
+import io
+import zlib
+
+from PyPDF2.generic import (ArrayObject, DictionaryObject, IndirectObject, NameObject,
+                            NullObject, NumberObject, StreamObject)
+
+
+CATALOG_NUM = 1
+PAGES_NUM = 2
+
+# Page keys that point back into the source document's structure
+SKIPPED_PAGE_KEYS = {"/Parent", "/StructParents", "/B"}
+
+# Objects per object stream
+OBJSTM_SIZE = 100
+
+# Deeper reference chains (e.g. long linked lists) are copied without deduplication
+MAX_DEDUPE_DEPTH = 100
+
+
+def _ref(num):
+    return IndirectObject(num, 0, None)
+
+
+def _dedupable(obj):
+    """Objects whose identity matters, like annotations, form fields and outline items, are never merged"""
+    if isinstance(obj, DictionaryObject):
+        return obj.get("/Type") != "/Annot" and not any(key in obj for key in ("/Parent", "/Rect", "/FT"))
+    return True
+
+
+class StreamingPdfWriter:
+    def __init__(self, f, dedupe=False, compress_level=None):
+        self.f = f
+        self.dedupe = dedupe
+        self.compress_level = compress_level
+        self.offsets = {}  # Object number -> byte offset, or (object stream number, index)
+        self.next_num = PAGES_NUM + 1
+        self.page_nums = []
+        self._map = {}  # (idnum, generation) in the current source -> number in the output
+        self._pending = []
+        self._hashes = {}  # Content digest -> number in the output, kept across sources
+        self._visiting = set()
+        self._packed = []  # (number, body) waiting for the next object stream
+
+        f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self):
+        return len(self.page_nums)
+
+    def _allocate(self):
+        num = self.next_num
+        self.next_num += 1
+        return num
+
+    def _encode(self, obj):
+        """Serializes a remapped object, returns (body, is_stream)"""
+        out = io.BytesIO()
+        if isinstance(obj, tuple):  # (dictionary, stream data), streams keep their encoded data as is
+            obj, data = obj
+            if self.compress_level is not None and "/Filter" not in obj:
+                data = zlib.compress(data, self.compress_level)
+                obj[NameObject("/Filter")] = NameObject("/FlateDecode")
+            obj[NameObject("/Length")] = NumberObject(len(data))
+            obj.write_to_stream(out, None)
+            out.write(b"\nstream\n")
+            out.write(data)
+            out.write(b"\nendstream")
+            return out.getvalue(), True
+        obj.write_to_stream(out, None)
+        return out.getvalue(), False
+
+    def _store(self, num, body, is_stream):
+        """Writes an encoded object, or queues it for an object stream"""
+        if self.compress_level is not None and not is_stream:
+            self._packed.append((num, body))
+            if len(self._packed) >= OBJSTM_SIZE:
+                self._flush_packed()
+            return
+        f = self.f
+        self.offsets[num] = f.tell()
+        f.write(b"%d 0 obj\n" % num)
+        f.write(body)
+        f.write(b"\nendobj\n")
+
+    def _write_object(self, num, obj):
+        self._store(num, *self._encode(obj))
+
+    def _flush_packed(self):
+        """Writes the queued objects as one compressed object stream"""
+        if not self._packed:
+            return
+        header, bodies, offset = [], [], 0
+        for num, body in self._packed:
+            header.append(b"%d %d" % (num, offset))
+            bodies.append(body)
+            offset += len(body) + 1
+        header = b" ".join(header) + b"\n"
+        data = zlib.compress(header + b"\n".join(bodies), self.compress_level)
+
+        stm_num = self._allocate()
+        for idx, (num, _) in enumerate(self._packed):
+            self.offsets[num] = (stm_num, idx)
+        stm = DictionaryObject({
+            NameObject("/Type"): NameObject("/ObjStm"),
+            NameObject("/N"): NumberObject(len(self._packed)),
+            NameObject("/First"): NumberObject(len(header)),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+        })
+        self._packed = []
+        self._write_object(stm_num, (stm, data))
+
+    def _digest(self, obj):
+        """Hashes a remapped object's content"""
+        body, data = obj if isinstance(obj, tuple) else (obj, b"")
+        out = io.BytesIO()
+        body.write_to_stream(out, None)
+        return hashlib.sha256(out.getvalue() + b"\0" + data).digest()
+
+    def _remap_ref(self, ref):
+        key = (ref.idnum, ref.generation)
+        num = self._map.get(key)
+        if num is not None:
+            return _ref(num)
+        target = ref.get_object()
+        if isinstance(target, DictionaryObject) and target.get("/Type") in ("/Page", "/Pages"):
+            return NullObject()  # A page we don't copy, or the source page tree
+
+        if not self.dedupe or not _dedupable(target) or len(self._visiting) >= MAX_DEDUPE_DEPTH:
+            num = self._allocate()
+            self._map[key] = num
+            self._pending.append((num, ref))
+            return _ref(num)
+        if key in self._visiting:
+            # A reference cycle, this object gets its number before its content is known
+            num = self._allocate()
+            self._map[key] = num
+            return _ref(num)
+
+        # Copy everything it references first, so identical objects remap to identical copies
+        self._visiting.add(key)
+        try:
+            copy = self._remap(target)
+        finally:
+            self._visiting.discard(key)
+        num = self._map.get(key)
+        if num is None:
+            digest = self._digest(copy)
+            num = self._hashes.get(digest)
+            if num is not None:
+                self._map[key] = num
+                return _ref(num)
+            num = self._allocate()
+            self._hashes[digest] = num
+            self._map[key] = num
+        self._write_object(num, copy)
+        return _ref(num)
+
+    def _remap(self, obj):
+        """Copies a direct object, swapping source references for output ones"""
+        if isinstance(obj, IndirectObject):
+            return self._remap_ref(obj)
+        if isinstance(obj, StreamObject):
+            copy = DictionaryObject()
+            for key, value in obj.items():
+                if key != "/Length":
+                    copy[key] = self._remap(value)
+            return copy, obj._data
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for key, value in obj.items():
+                copy[key] = self._remap(value)
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._remap(value) for value in obj)
+        return obj
+
+    def _drain(self):
+        """Writes every object referenced so far"""
+        while self._pending:
+            num, ref = self._pending.pop()
+            self._write_object(num, self._remap(ref.get_object()))
+
+    def add_pages(self, pages, skipped_keys=SKIPPED_PAGE_KEYS):
+        """Copies pages (PyPDF2 PageObjects, all from one source) into the output"""
+        pages = list(pages)
+        # Number the pages first so links between copied pages stay intact
+        nums = []
+        for page in pages:
+            num = self._allocate()
+            ref = page.indirect_reference
+            if ref is not None:
+                self._map[(ref.idnum, ref.generation)] = num
+            nums.append(num)
+
+        for page, num in zip(pages, nums):
+            copy = DictionaryObject()
+            for key, value in page.items():
+                if key not in skipped_keys and key != "/Parent":
+                    copy[key] = self._remap(value)
+            copy[NameObject("/Parent")] = _ref(PAGES_NUM)
+            self._write_object(num, copy)
+            self._drain()
+        self.page_nums.extend(nums)
+
+    def add_reader(self, reader):
+        """Copies every page of a PdfReader, then forgets the source's objects"""
+        self.add_pages(reader.pages)
+        self.end_source()
+
+    def end_source(self):
+        """Call after the last page of a source, so its object map can be dropped.
+
+        Returns the map, so more pages of the same source can be copied later
+        through resume_source() without writing the objects they share again.
+        """
+        source_map, self._map = self._map, {}
+        return source_map
+
+    def resume_source(self, source_map):
+        """Continues with a source set aside by end_source(), call end_source() again after"""
+        self._map = source_map
+
+    def close(self, catalog=None, info=None):
+        """Writes the page tree, catalog, cross-reference table and trailer.
+
+        catalog and info are the source's catalog and document info to copy,
+        for rewrite(); their references are resolved against the last source.
+        """
+        kids = ArrayObject(_ref(num) for num in self.page_nums)
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(self.page_nums)),
+        })
+        self._write_object(PAGES_NUM, pages)
+
+        root = DictionaryObject()
+        for key, value in (catalog or {}).items():
+            if key not in ("/Type", "/Pages"):
+                root[NameObject(key)] = self._remap(value)
+        root[NameObject("/Type")] = NameObject("/Catalog")
+        root[NameObject("/Pages")] = _ref(PAGES_NUM)
+        self._write_object(CATALOG_NUM, root)
+        info_ref = self._remap(info) if isinstance(info, IndirectObject) else None
+        self._drain()
+
+        if self.compress_level is None:
+            self._write_xref_table(info_ref)
+        else:
+            self._flush_packed()
+            self._write_xref_stream(info_ref)
+
+    def _write_xref_table(self, info_ref):
+        f = self.f
+        xref = f.tell()
+        size = self.next_num
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for num in range(1, size):
+            f.write(b"%010d 00000 n \n" % self.offsets[num])
+        info = b" /Info %d 0 R" % info_ref.idnum if info_ref else b""
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R%s >>\nstartxref\n%d\n%%%%EOF\n"
+                % (size, CATALOG_NUM, info, xref))
+
+    def _write_xref_stream(self, info_ref):
+        f = self.f
+        xref_num = self._allocate()
+        xref = f.tell()
+        self.offsets[xref_num] = xref
+        size = self.next_num
+
+        # Field widths: type, offset or object stream number, index in the object stream
+        width = max(1, (max(max(v) if isinstance(v, tuple) else v for v in self.offsets.values()).bit_length() + 7) // 8)
+        rows = [b"\x00" + (0).to_bytes(width, "big") + b"\xff\xff"]
+        for num in range(1, size):
+            where = self.offsets[num]
+            if isinstance(where, tuple):
+                rows.append(b"\x02" + where[0].to_bytes(width, "big") + where[1].to_bytes(2, "big"))
+            else:
+                rows.append(b"\x01" + where.to_bytes(width, "big") + b"\x00\x00")
+        data = zlib.compress(b"".join(rows), self.compress_level)
+
+        trailer = DictionaryObject({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(size),
+            NameObject("/Root"): _ref(CATALOG_NUM),
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)]),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+            NameObject("/Length"): NumberObject(len(data)),
+        })
+        if info_ref:
+            trailer[NameObject("/Info")] = info_ref
+        f.write(b"%d 0 obj\n" % xref_num)
+        trailer.write_to_stream(f, None)
+        f.write(b"\nstream\n")
+        f.write(data)
+        f.write(b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % xref)
+
+
+def rewrite(reader, f, dedupe=True, compress_level=None):
+    """Copies a whole document, keeping its outlines, names, forms and document info"""
+    writer = StreamingPdfWriter(f, dedupe, compress_level)
+    writer.add_pages(reader.pages, skipped_keys=())
+    writer.close(reader.trailer["/Root"], reader.trailer.raw_get("/Info") if "/Info" in reader.trailer else None)
+    return writer
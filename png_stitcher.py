@@ -0,0 +1,128 @@
+"""Streaming vertical image stitching into a PNG file.
+
+The stitched image is never held in memory. A first pass reads only the image
+headers to work out the canvas size, the second pass decodes one image at a
+time and streams its rows through zlib into the PNG's IDAT chunks, so peak
+memory is about one decoded input image whatever the number of inputs.
+"""
+import struct
+import zlib
+
+from PIL import Image, ImageChops
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Rows encoded per strip and compressed bytes per IDAT chunk
+STRIP_ROWS = 256
+IDAT_SIZE = 256 * 1024
+
+FILTER_UP = 2
+
+
+class PngWriter:
+    """Writes an 8-bit RGB PNG row strip by row strip"""
+
+    def __init__(self, f, width, height, level=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(level)
+        self.pending = []
+        self.pending_size = 0
+        self.prev_row = Image.new('RGB', (width, 1), 'black')  # Row above the first one counts as zero
+
+        f.write(PNG_SIGNATURE)
+        # Bit depth 8, color type 2 (RGB), default compression, filter and no interlace
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(tag)
+        self.f.write(data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+
+    def _compress(self, data):
+        out = self.compressor.compress(data)
+        if out:
+            self.pending.append(out)
+            self.pending_size += len(out)
+            if self.pending_size >= IDAT_SIZE:
+                self._flush_idat()
+
+    def _flush_idat(self):
+        if self.pending:
+            self._chunk(b'IDAT', b''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_strip(self, strip):
+        """Appends an RGB image exactly `width` pixels wide below the rows written so far"""
+        w, h = strip.size
+        if w != self.width or self.rows_written + h > self.height:
+            raise ValueError("Strip does not fit in the PNG")
+
+        # PNG "Up" filter: every byte minus the byte above it, computed by Pillow in C
+        above = Image.new('RGB', (w, h))
+        above.paste(self.prev_row, (0, 0))
+        if h > 1:
+            above.paste(strip.crop((0, 0, w, h - 1)), (0, 1))
+        filtered = ImageChops.subtract_modulo(strip, above).tobytes()
+        self.prev_row = strip.crop((0, h - 1, w, h))
+
+        row_size = w * 3
+        filter_byte = bytes([FILTER_UP])
+        self._compress(b''.join(
+            filter_byte + filtered[i:i + row_size] for i in range(0, len(filtered), row_size)))
+        self.rows_written += h
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}")
+        tail = self.compressor.flush()
+        if tail:
+            self.pending.append(tail)
+        self._flush_idat()
+        self._chunk(b'IEND', b'')
+
+
+def image_sizes(files):
+    """First pass, reads only the image headers"""
+    sizes = []
+    for file in files:
+        with Image.open(file) as img:
+            sizes.append(img.size)
+    return sizes
+
+
+def stitch_vertical(files, output, on_image=None, level=6, sizes=None):
+    """Stacks images top to bottom, centered on a white canvas, into a PNG.
+
+    on_image(file) is called after every input has been written. sizes skips
+    the first pass when the caller already has image_sizes(files).
+    """
+    if sizes is None:
+        sizes = image_sizes(files)
+    max_width = max(w for w, _ in sizes)
+    total_height = sum(h for _, h in sizes)
+
+    with open(output, 'wb') as f:
+        writer = PngWriter(f, max_width, total_height, level)
+        for file, (width, height) in zip(files, sizes):
+            with Image.open(file) as img:
+                img = img.convert('RGB') if img.mode != 'RGB' else img
+                # Center the image if it's smaller than max_width
+                x_offset = (max_width - width) // 2
+                for y in range(0, height, STRIP_ROWS):
+                    strip_height = min(STRIP_ROWS, height - y)
+                    strip = img.crop((0, y, width, y + strip_height))
+                    if width != max_width:
+                        canvas = Image.new('RGB', (max_width, strip_height), 'white')
+                        canvas.paste(strip, (x_offset, 0))
+                        strip = canvas
+                    writer.write_strip(strip)
+            if on_image is not None:
+                on_image(file)
+        writer.close()
+    return output
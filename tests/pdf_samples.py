@@ -0,0 +1,121 @@
+"""Small hand built PDFs for the tests"""
+
+
+def build_pdf(objects, root=1):
+    """Serializes {object number: body bytes} into a PDF with a classic xref table"""
+    out = bytearray(b"%PDF-1.7\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, objects[num])
+    size = max(objects) + 1
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for num in range(1, size):
+        if num in offsets:
+            out += b"%010d 00000 n \n" % offsets[num]
+        else:
+            out += b"0000000000 65535 f \n"
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, root, xref)
+    return bytes(out)
+
+
+def _stream(data, extra=b""):
+    return b"<< /Length %d %s>>\nstream\n%s\nendstream" % (len(data), extra, data)
+
+
+def sample_pdf(pages, label=b"doc", outline=False):
+    """A PDF with the given number of pages that all use one shared font and logo.
+
+    Every page draws its own text, so pages differ while the font and logo
+    are identical across documents built by this function. With outline, the
+    document gets one bookmark per page.
+    """
+    font, logo = 3, 4
+    objects = {
+        font: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        logo: _stream(b"\xff\x00\xff\x00", b"/Type /XObject /Subtype /Image /Width 2 /Height 2 "
+                                           b"/ColorSpace /DeviceGray /BitsPerComponent 8 "),
+    }
+    kids = []
+    num = 5
+    for idx in range(pages):
+        page, content = num, num + 1
+        num += 2
+        text = b"BT /F1 12 Tf 72 720 Td (%s page %d) Tj ET" % (label, idx + 1)
+        objects[content] = _stream(text)
+        objects[page] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                         b"/Resources << /Font << /F1 %d 0 R >> /XObject << /Im1 %d 0 R >> >> >>"
+                         % (content, font, logo))
+        kids.append(page)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    catalog = b"<< /Type /Catalog /Pages 2 0 R"
+    if outline and kids:
+        outlines, items = num, list(range(num + 1, num + 1 + len(kids)))
+        for idx, (item, page) in enumerate(zip(items, kids)):
+            links = b""
+            if idx > 0:
+                links += b" /Prev %d 0 R" % items[idx - 1]
+            if idx < len(items) - 1:
+                links += b" /Next %d 0 R" % items[idx + 1]
+            objects[item] = (b"<< /Title (%s %d) /Parent %d 0 R /Dest [%d 0 R /Fit]%s >>"
+                             % (label, idx + 1, outlines, page, links))
+        objects[outlines] = (b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>"
+                             % (items[0], items[-1], len(items)))
+        catalog += b" /Outlines %d 0 R" % outlines
+    objects[1] = catalog + b" >>"
+    return build_pdf(objects)
+
+
+def write_sample(path, pages, label=b"doc", outline=False):
+    with open(path, "wb") as f:
+        f.write(sample_pdf(pages, label, outline))
+    return str(path)
+
+
+def count_objects(path, **match):
+    """Counts the objects of a PDF whose dictionary has all the given /Key: value pairs"""
+    from PyPDF2 import PdfReader
+    from PyPDF2.generic import DictionaryObject, IndirectObject
+
+    reader = PdfReader(str(path))
+    count = 0
+    nums = set(reader.xref.get(0, {})) | set(reader.xref_objStm)
+    for num in sorted(nums):
+        obj = reader.get_object(IndirectObject(num, 0, reader))
+        if isinstance(obj, DictionaryObject) and all(obj.get("/" + k) == v for k, v in match.items()):
+            count += 1
+    return count
+
+
+def check_pdf(path):
+    """Reads every page of a PDF strictly and runs qpdf's checks on it, through
+    pikepdf or the qpdf command, whichever is installed.
+
+    Returns the PdfReader.
+    """
+    import shutil
+    import subprocess
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(str(path), strict=True)
+    for page in reader.pages:
+        page.get_contents()
+    qpdf = shutil.which("qpdf")
+    try:
+        import pikepdf
+    except ImportError:
+        pikepdf = None
+    if pikepdf is not None:
+        with pikepdf.open(path) as pdf:
+            assert pdf.check_pdf_syntax() == []
+    elif qpdf is not None:
+        result = subprocess.run([qpdf, "--check", str(path)], capture_output=True, text=True)
+        assert result.returncode == 0, result.stdout + result.stderr
+    return reader
+
+
+def page_texts(reader):
+    """The raw content stream of every page"""
+    return [page.get_contents().get_data() for page in reader.pages]
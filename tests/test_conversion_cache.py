@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from conversion_cache import ConversionCache
+
+
+def _disk_bytes(cache):
+    return sum(size for _, _, size in cache._entries())
+
+
+def test_round_trip_and_stats(tmp_path):
+    src = tmp_path / "a.txt"
+    src.write_text("hello")
+    cache = ConversionCache(tmp_path / "cache")
+    key = cache.key([src], {"font_size": 12})
+    assert cache.get(key) is None
+    cache.put(key, b"%PDF")
+    assert cache.get(key) == b"%PDF"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "stores": 1, "evictions": 0}
+
+
+@pytest.mark.parametrize("key_mode", ["content", "stat"])
+def test_key_follows_input_and_settings(tmp_path, key_mode):
+    src = tmp_path / "a.txt"
+    src.write_text("hello")
+    cache = ConversionCache(tmp_path / "cache", key_mode=key_mode)
+    key = cache.key([src], {"font_size": 12})
+    assert cache.key(str(src), {"font_size": 12}) == key
+    assert cache.key([src], {"font_size": 14}) != key
+    src.write_text("changed")
+    assert cache.key([src], {"font_size": 12}) != key
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=300)
+    for idx, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, b"x" * 100)
+        os.utime(cache._path(key), (idx, idx))
+    cache.get("aa1")  # Now the most recently used
+    cache.put("dd4", b"x" * 100)
+    assert [cache.get(k) is not None for k in ["aa1", "bb2", "cc3", "dd4"]] == [True, False, True, True]
+    assert cache.evictions == 1
+    assert cache._total == _disk_bytes(cache) == 300
+
+
+def test_concurrent_puts(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=50 * 1000)
+    start = threading.Barrier(4)
+
+    def store(worker):
+        start.wait()
+        for idx in range(100):
+            cache.put(f"{worker:02d}{idx:04d}", b"x" * 1000)
+
+    threads = [threading.Thread(target=store, args=(w,)) for w in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert cache.stores == 400
+    assert cache._total == _disk_bytes(cache) <= cache.max_bytes
+    assert cache.evictions == 400 - len(list(cache._entries()))
+
+
+def test_thumbnail_cache_is_still_a_conversion_cache(tmp_path):
+    from thumbnails import ThumbnailCache
+
+    src = tmp_path / "a.png"
+    src.write_bytes(b"png")
+    cache = ThumbnailCache(tmp_path / "thumbs")
+    assert cache.thumbnail_key(src, (40, 40)) != cache.thumbnail_key(src, (80, 80))
+    # The base class key still works the same way
+    assert cache.key([src], {}) == ConversionCache(tmp_path / "other", key_mode="stat").key([src], {})
+    cache.put(cache.thumbnail_key(src), b"thumb")
+    assert cache.get(cache.thumbnail_key(src)) == b"thumb"
+    assert cache._path("abc").endswith(".png")
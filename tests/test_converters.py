@@ -0,0 +1,78 @@
+import pytest
+
+import converters
+import merge_engine
+from conversion_cache import ConversionCache
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Lets a test register converters and load plugins without leaking them into other tests"""
+    monkeypatch.setattr(converters, "_converters", dict(converters._converters))
+    monkeypatch.setattr(converters, "_plugins_loaded", False)
+    monkeypatch.delenv(converters.PLUGIN_ENV, raising=False)
+    return converters
+
+
+def _render_upper(files, settings):
+    return b"%PDF upper"
+
+
+def test_identity():
+    assert converters.Converter("text_pdf:render_text_files").identity == "text_pdf:render_text_files"
+    assert converters.Converter("text_pdf:render_text_files", version=2).identity == "text_pdf:render_text_files@2"
+    assert converters.Converter(_render_upper).identity == "test_converters:_render_upper"
+    assert converters.Converter().identity is None
+
+
+def test_replacing_a_converter_changes_the_cache_key(registry, tmp_path):
+    src = tmp_path / "a.txt"
+    src.write_text("hello")
+    cache = ConversionCache(tmp_path / "cache")
+    settings = {"font_size": 12}
+    before = cache.key([src], merge_engine.unit_settings([str(src)], settings))
+
+    registry.register(".txt", ".pdf", _render_upper, batch=True)
+    after = cache.key([src], merge_engine.unit_settings([str(src)], settings))
+    assert before != after
+
+    registry.register(".txt", ".pdf", _render_upper, batch=True, version=2)
+    assert cache.key([src], merge_engine.unit_settings([str(src)], settings)) not in (before, after)
+
+
+def test_pdfs_have_no_converter():
+    assert merge_engine.converter_identity(["a.pdf"]) is None
+    assert merge_engine.converter_identity(["a.png"]) == "image_pdf:image_to_pdf"
+
+
+def test_a_bad_plugin_does_not_stop_the_others(registry, monkeypatch, tmp_path, caplog):
+    (tmp_path / "good_docmerger_plugin.py").write_text(
+        "import converters\nconverters.register('.md', '.txt')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv(converters.PLUGIN_ENV, "no_such_docmerger_plugin, good_docmerger_plugin")
+
+    assert ".md" in registry.input_types(".txt")
+    assert "no_such_docmerger_plugin" in caplog.text
+
+
+def _render_sample(file, settings):
+    from pdf_samples import sample_pdf
+    return sample_pdf(1, b"replaced")
+
+
+def test_remerge_converts_again_with_a_replaced_converter(registry, tmp_path):
+    PyPDF2 = pytest.importorskip("PyPDF2")
+    Image = pytest.importorskip("PIL.Image")
+    from pdf_samples import write_sample
+
+    pdf = write_sample(tmp_path / "a.pdf", 1, b"a")
+    png = str(tmp_path / "b.png")
+    Image.new("RGB", (20, 10), "red").save(png)
+    out = tmp_path / "out.pdf"
+    options = {"incremental": True, "workers": 1}
+    merge_engine.merge([pdf, png], out, options=options)
+
+    registry.register(".png", ".pdf", _render_sample)
+    merge_engine.merge([pdf, png], out, options=options)
+    page = PyPDF2.PdfReader(str(out)).pages[1]
+    assert b"replaced" in page["/Contents"].get_object().get_data()
@@ -0,0 +1,83 @@
+import os
+
+from directory_index import DirectoryIndex
+
+
+def _touch(path, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    _bump(path.parent)
+
+
+def _bump(directory):
+    """Moves a directory's mtime on, changes within one timestamp tick would not show"""
+    st = os.stat(directory)
+    os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def _index(root, **kwargs):
+    index = DirectoryIndex(root, **kwargs)
+    index.scan()
+    return index
+
+
+def test_refresh_finds_added_and_removed_files(tmp_path):
+    _touch(tmp_path / "a.pdf")
+    _touch(tmp_path / "b.txt")
+    index = _index(tmp_path)
+    assert index.refresh() == (set(), set())
+
+    _touch(tmp_path / "c.pdf", b"longer")
+    (tmp_path / "a.pdf").unlink()
+    _bump(tmp_path)
+    assert index.refresh() == ({"c.pdf"}, {"a.pdf"})
+    assert index.files() == ["b.txt", "c.pdf"]
+    assert index.files({".pdf"}) == ["c.pdf"]
+    assert index.get("c.pdf").size == 6
+    assert index.get("a.pdf") is None
+
+
+def test_refresh_scans_new_and_drops_removed_subdirectories(tmp_path):
+    _touch(tmp_path / "old" / "deep" / "x.pdf")
+    _touch(tmp_path / "old" / "y.pdf")
+    index = _index(tmp_path, recursive=True)
+    assert index.files() == [os.path.join("old", "deep", "x.pdf"), os.path.join("old", "y.pdf")]
+
+    _touch(tmp_path / "new" / "inner" / "z.pdf")
+    _bump(tmp_path)
+    assert index.refresh() == ({os.path.join("new", "inner", "z.pdf")}, set())
+
+    for path in ("old/deep/x.pdf", "old/y.pdf"):
+        (tmp_path / path).unlink()
+    (tmp_path / "old" / "deep").rmdir()
+    (tmp_path / "old").rmdir()
+    _bump(tmp_path)
+    assert index.refresh() == (set(), {os.path.join("old", "deep", "x.pdf"), os.path.join("old", "y.pdf")})
+    assert index.files() == [os.path.join("new", "inner", "z.pdf")]
+
+    # A file added to the new subdirectory is found through the mtime recorded for it
+    _touch(tmp_path / "new" / "inner" / "w.pdf")
+    assert index.refresh() == ({os.path.join("new", "inner", "w.pdf")}, set())
+
+
+def test_excluded_directories_are_skipped(tmp_path):
+    _touch(tmp_path / "keep" / "a.pdf")
+    _touch(tmp_path / ".git" / "b.pdf")
+    index = _index(tmp_path, recursive=True, exclude_dirs={".git", "node_modules"})
+    assert index.files() == [os.path.join("keep", "a.pdf")]
+
+    _touch(tmp_path / "node_modules" / "c.pdf")
+    _touch(tmp_path / ".git" / "sub" / "d.pdf")
+    _bump(tmp_path)
+    assert index.refresh() == (set(), set())
+    assert index.files() == [os.path.join("keep", "a.pdf")]
+
+
+def test_subdirectories_are_ignored_unless_recursive(tmp_path):
+    _touch(tmp_path / "a.pdf")
+    _touch(tmp_path / "sub" / "b.pdf")
+    index = _index(tmp_path)
+    _touch(tmp_path / "sub2" / "c.pdf")
+    _bump(tmp_path)
+    assert index.refresh() == (set(), set())
+    assert index.files() == ["a.pdf"]
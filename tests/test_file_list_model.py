@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from file_list_model import FileListModel
+
+FILES = ["a", "b", "c", "d", "e", "f"]
+
+
+def _model():
+    return FileListModel(FILES)
+
+
+def _assert_indexed(model):
+    assert model.positions == {f: i for i, f in enumerate(model.files)}
+
+
+@pytest.mark.parametrize("src, dst, order, changed", [
+    (0, 0, "abcdef", (0, 0)),
+    (0, 1, "bacdef", (0, 1)),
+    (1, 0, "bacdef", (0, 1)),
+    (0, 5, "bcdefa", (0, 5)),
+    (5, 0, "fabcde", (0, 5)),
+    (1, 4, "acdebf", (1, 4)),
+    (4, 1, "aebcdf", (1, 4)),
+])
+def test_move(src, dst, order, changed):
+    model = _model()
+    assert model.move(src, dst) == changed
+    assert "".join(model.files) == order
+    _assert_indexed(model)
+
+
+@pytest.mark.parametrize("positions, dst, order, changed", [
+    ([], 2, "abcdef", (0, -1)),
+    ([3], 0, "dabcef", (0, 3)),
+    ([3], 99, "abcefd", (3, 5)),
+    ([0, 1], 3, "cdeabf", (0, 4)),
+    ([4, 5], 0, "efabcd", (0, 5)),
+    ([0, 2, 4], 1, "bacedf", (0, 4)),
+    ([1, 4], 2, "acbedf", (1, 4)),
+    ([0, 5], 99, "bcdeaf", (0, 5)),
+    ([1, 3], -5, "bdacef", (0, 3)),
+    ([2, 3], 2, "abcdef", (2, 3)),
+])
+def test_move_block(positions, dst, order, changed):
+    model = _model()
+    assert model.move_block(positions, dst) == changed
+    assert "".join(model.files) == order
+    _assert_indexed(model)
+
+
+@pytest.mark.parametrize("selected, step, order", [
+    ("b", -1, "bacdef"),
+    ("a", -1, "abcdef"),  # Already at the top
+    ("bd", 1, "acbedf"),  # Single steps keep the gap
+    ("bd", -1, "badcef"),
+    ("ef", 1, "abcdef"),
+    ("bd", 3, "acebdf"),  # Bigger jumps gather the rows into a block
+    ("de", 99, "abcfde"),
+    ("ce", -99, "ceabdf"),
+])
+def test_move_selection(selected, step, order):
+    model = _model()
+    for f in selected:
+        model.select(f, toggle=True)
+    model.move_selection(step)
+    assert "".join(model.files) == order
+    _assert_indexed(model)
+
+
+def test_checked_files_follow_the_order():
+    model = FileListModel(["a.pdf", "b.png", "c.pdf"], checked=["c.pdf", "a.pdf"])
+    model.move(2, 0)
+    assert model.checked_files() == ["c.pdf", "a.pdf"]
+    assert model.checked_types == {".pdf": 2}
+    model.set_checked("b.png", True)
+    model.set_checked("a.pdf", False)
+    assert model.checked_types == {".pdf": 1, ".png": 1}
+
+
+def test_remove_files_keeps_order_and_state():
+    model = FileListModel(["a", "b", "c", "d"], checked=["b", "d"])
+    model.set_page_range("b", "1-2")
+    model.select("b")
+    model.remove_files(["b", "x"])
+    assert model.files == ["a", "c", "d"]
+    _assert_indexed(model)
+    assert model.checked_files() == ["d"]
+    assert model.page_range("b") == ""
+    assert model.selected == set() and model.anchor is None
+
+
+def test_merge_inputs_carry_page_ranges():
+    model = FileListModel(["a.pdf", "b.pdf"], checked=["a.pdf", "b.pdf"])
+    model.set_page_range("b.pdf", " 2- ")
+    assert model.merge_inputs("dir") == [(os.path.join("dir", "a.pdf"), None), (os.path.join("dir", "b.pdf"), "2-")]
+
+
+def test_range_selection():
+    model = _model()
+    model.select("b")
+    model.select("e", extend=True)
+    assert model.selected == {"b", "c", "d", "e"}
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+PyPDF2 = pytest.importorskip("PyPDF2")
+import image_pdf  # noqa: E402
+
+
+def _pages(data):
+    return PyPDF2.PdfReader(io.BytesIO(data)).pages
+
+
+def _image(page):
+    return page["/Resources"]["/XObject"]["/Im0"].get_object()
+
+
+def _media_box(page):
+    return [round(float(v), 2) for v in page["/MediaBox"]]
+
+
+def _jpeg(path, mode, size=(40, 20), dpi=(72, 72)):
+    Image.new(mode, size).save(path, "JPEG", dpi=dpi)
+    return path
+
+
+@pytest.mark.parametrize("mode, color_space, decode", [
+    ("RGB", "/DeviceRGB", None),
+    ("L", "/DeviceGray", None),
+    # Adobe CMYK JPEGs store inverted values
+    ("CMYK", "/DeviceCMYK", [1, 0] * 4),
+])
+def test_jpeg_passthrough(tmp_path, mode, color_space, decode):
+    src = _jpeg(tmp_path / "in.jpg", mode)
+    page, = _pages(image_pdf.image_to_pdf(str(src), {"jpeg_passthrough": True}))
+    image = _image(page)
+    assert image["/Filter"] == "/DCTDecode"
+    assert image["/ColorSpace"] == color_space
+    assert (image.get("/Decode") and [int(v) for v in image["/Decode"]]) == decode
+    # The original file, byte for byte
+    assert image.get_data() == src.read_bytes()
+    assert _media_box(page) == [0, 0, 40, 20]
+
+
+def test_page_gets_the_physical_size_at_target_dpi(tmp_path):
+    src = _jpeg(tmp_path / "in.jpg", "RGB", (300, 150), dpi=(150, 150))
+    page, = _pages(image_pdf.image_to_pdf(str(src), {"jpeg_passthrough": True, "target_dpi": 150}))
+    assert _media_box(page) == [0, 0, 144, 72]
+    # Not above the target, so it's still passed through
+    assert _image(page).get_data() == src.read_bytes()
+
+
+def test_image_is_centred_on_the_page_size(tmp_path):
+    src = _jpeg(tmp_path / "in.jpg", "RGB", (300, 150))
+    page, = _pages(image_pdf.image_to_pdf(str(src), {"page_size": "A4"}))
+    # Landscape for a landscape image
+    assert _media_box(page) == [0, 0, 841.89, 595.28]
+    assert page["/Contents"].get_object().get_data() == b"q 841.89 0 0 420.94 0.00 87.17 cm /Im0 Do Q"
+
+
+def test_oversized_images_are_downsampled(tmp_path):
+    src = _jpeg(tmp_path / "in.jpg", "L", (600, 300), dpi=(300, 300))
+    page, = _pages(image_pdf.image_to_pdf(str(src), {"jpeg_passthrough": True, "target_dpi": 100}))
+    image = _image(page)
+    assert (image["/Width"], image["/Height"]) == (200, 100)
+    assert image["/Filter"] == "/DCTDecode"
+    assert image["/ColorSpace"] == "/DeviceRGB"
+    assert _media_box(page) == [0, 0, 144, 72]
+
+
+def test_multi_frame_tiff_gets_a_page_per_frame(tmp_path):
+    src = tmp_path / "in.tif"
+    frames = [Image.new("1", (30, 10)), Image.new("RGB", (20, 40), "red")]
+    frames[0].save(src, "TIFF", save_all=True, append_images=frames[1:])
+    first, second = _pages(image_pdf.image_to_pdf(str(src), {}))
+    assert _image(first)["/ColorSpace"] == "/DeviceGray"
+    assert _image(second)["/ColorSpace"] == "/DeviceRGB"
+    assert _image(second).get_data() == frames[1].tobytes()
+    assert _media_box(first) == [0, 0, 30, 10]
+    assert _media_box(second) == [0, 0, 20, 40]
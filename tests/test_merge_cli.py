@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+import merge_cli
+import merge_engine
+
+
+def _touch(path):
+    path.write_bytes(b"")
+    return str(path)
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("report.pdf#1-3,10", ("report.pdf", "1-3,10")),
+    ("report.pdf#5-", ("report.pdf", "5-")),
+    ("scans/*.pdf#2", ("scans/*.pdf", "2")),
+    ("report.pdf", ("report.pdf", None)),
+    ("notes#draft.txt", ("notes#draft.txt", None)),
+])
+def test_split_pages(pattern, expected):
+    assert merge_cli.split_pages(pattern) == expected
+
+
+def test_split_pages_keeps_a_path_that_contains_the_suffix(tmp_path):
+    path = _touch(tmp_path / "issue#12")
+    assert merge_cli.split_pages(path) == (path, None)
+    assert merge_cli.expand_inputs([path]) == [path]
+
+
+def test_expand_inputs_keeps_the_given_order_and_sorts_globs(tmp_path):
+    b, a, c = (_touch(tmp_path / name) for name in ("b.pdf", "a.pdf", "c.txt"))
+    assert merge_cli.expand_inputs([c, str(tmp_path / "*.pdf")]) == [c, a, b]
+
+
+def test_expand_inputs_applies_a_page_suffix_to_every_match(tmp_path):
+    a, b = (_touch(tmp_path / name) for name in ("a.pdf", "b.pdf"))
+    assert merge_cli.expand_inputs([str(tmp_path / "*.pdf#1-2")]) == [(a, "1-2"), (b, "1-2")]
+    assert merge_cli.expand_inputs([{"path": "a.pdf", "pages": "3"}], str(tmp_path)) == [(a, "3")]
+
+
+def test_expand_inputs_fails_on_a_glob_without_matches(tmp_path):
+    with pytest.raises(merge_engine.MergeError, match="No files match"):
+        merge_cli.expand_inputs([str(tmp_path / "*.pdf")])
+
+
+@pytest.mark.parametrize("wrap", [lambda jobs: jobs, lambda jobs: {"jobs": jobs}])
+def test_load_manifest_resolves_paths_against_its_directory(tmp_path, wrap):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    a, b = (_touch(jobs_dir / name) for name in ("a.pdf", "b.pdf"))
+    data = json.dumps(wrap([{"inputs": ["*.pdf", {"path": "a.pdf", "pages": "1"}],
+                             "output": "out/merged.pdf", "options": {"optimize": True}}]))
+    (jobs_dir / "jobs.json").write_text(data)
+    (tmp_path / "elsewhere.json").write_text(data)
+
+    expected = [{"inputs": [a, b, (a, "1")], "output": os.path.join(str(jobs_dir), "out/merged.pdf"),
+                 "format": None, "options": {"optimize": True}}]
+    assert merge_cli.load_manifest(str(jobs_dir / "jobs.json")) == expected
+    assert merge_cli.load_manifest(str(tmp_path / "elsewhere.json"), base_dir=str(jobs_dir)) == expected
+
+
+@pytest.mark.parametrize("job", [{"inputs": ["a.pdf"]}, {"output": "out.pdf"}])
+def test_load_manifest_needs_inputs_and_output(tmp_path, job):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps([job]))
+    with pytest.raises(merge_engine.MergeError, match="needs 'inputs' and 'output'"):
+        merge_cli.load_manifest(str(manifest))
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import merge_cli
+import merge_daemon
+import merge_engine
+from pdf_samples import write_sample
+
+
+class _Source:
+    def __init__(self):
+        self.done = []
+
+    def job_done(self, task, error=None):
+        self.done.append((task, error))
+
+
+def _failed(error):
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+def _task():
+    source = _Source()
+    task = merge_daemon._Task({"output": "out.pdf"}, source)
+    task.attempts = 1
+    return task, source
+
+
+def test_merge_errors_fail_at_once():
+    daemon = merge_daemon.MergeDaemon(retries=3)
+    task, source = _task()
+    error = merge_engine.MergeError("Unsupported file type: a.xyz")
+    assert daemon._finished(_failed(error), task) is None
+    assert source.done == [(task, error)]
+
+
+def test_os_errors_are_retried_with_backoff():
+    daemon = merge_daemon.MergeDaemon(retries=2, retry_delay=1.5)
+    task, source = _task()
+    delays = []
+    for attempt in (1, 2, 3):
+        task.attempts = attempt
+        delays.append(daemon._finished(_failed(PermissionError("locked")), task))
+    assert delays == [1.5, 3.0, None]
+    assert [error.args for _, error in source.done] == [("locked",)]
+
+
+def test_os_errors_while_stopping_are_left_for_the_next_start():
+    daemon = merge_daemon.MergeDaemon(retries=2)
+    task, source = _task()
+    assert daemon._finished(_failed(OSError("disk full")), task, retry=False) is None
+    assert source.done == []
+
+
+_run_job = merge_cli.run_job
+
+
+def _slow_run_job(job):
+    time.sleep(1)
+    return _run_job(job)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the patched job function only reaches forked workers")
+def test_stopping_finishes_running_jobs(tmp_path, monkeypatch):
+    pytest.importorskip("PyPDF2")
+    monkeypatch.setattr(merge_cli, "run_job", _slow_run_job)
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    a = write_sample(tmp_path / "a.pdf", 1)
+    b = write_sample(tmp_path / "b.pdf", 1)
+    (spool / "job.json").write_text(json.dumps({"jobs": [{"inputs": [a, b], "output": str(tmp_path / "out.pdf")}]}))
+
+    daemon = merge_daemon.MergeDaemon(str(spool), workers=1, poll=0.05)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not (spool / "processing" / "job.json").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    daemon.stop()
+    thread.join(30)
+
+    assert (tmp_path / "out.pdf").exists()
+    assert (spool / "done" / "job.json").exists()
+    assert not (spool / "processing" / "job.json").exists()
+
+
+def _crashing_run_job(job):
+    # The first job kills its worker, like the OOM killer would
+    marker = os.path.join(os.path.dirname(job["output"]), "crashed")
+    if job["output"].endswith("a.pdf") and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(9)
+    return _run_job(job)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the patched job function only reaches forked workers")
+def test_a_dead_worker_is_retried_on_a_new_pool(tmp_path, monkeypatch):
+    pytest.importorskip("PyPDF2")
+    monkeypatch.setattr(merge_cli, "run_job", _crashing_run_job)
+    spool = tmp_path / "spool"
+    out = tmp_path / "out"
+    spool.mkdir()
+    out.mkdir()
+    src = write_sample(tmp_path / "src.pdf", 1)
+    for name in ("a", "b"):
+        job = {"inputs": [src], "output": str(out / f"{name}.pdf")}
+        (spool / f"{name}.json").write_text(json.dumps({"jobs": [job]}))
+
+    daemon = merge_daemon.MergeDaemon(str(spool), workers=1, retries=2, retry_delay=0.01, poll=0.05)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while len(list((spool / "done").glob("*.json"))) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    daemon.stop()
+    thread.join(30)
+
+    assert not thread.is_alive()
+    assert (out / "crashed").exists()
+    assert sorted(p.name for p in (spool / "done").glob("*.json")) == ["a.json", "b.json"]
+    assert (out / "a.pdf").exists() and (out / "b.pdf").exists()
+
+
+def test_one_daemon_per_spool(tmp_path):
+    spool = merge_daemon.Spool(tmp_path / "spool")
+    (tmp_path / "spool" / "processing" / "running.json").write_text("{}")
+    with pytest.raises(merge_engine.MergeError, match="Another merge daemon"):
+        merge_daemon.Spool(tmp_path / "spool")
+    # The second daemon didn't take back the manifest the first one is running
+    assert (tmp_path / "spool" / "processing" / "running.json").exists()
+
+    spool.close()
+    merge_daemon.Spool(tmp_path / "spool").close()
+    assert (tmp_path / "spool" / "running.json").exists()
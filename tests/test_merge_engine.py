@@ -0,0 +1,65 @@
+import pytest
+
+import merge_engine
+from pdf_samples import build_pdf, count_objects, write_sample
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+
+
+def test_broken_page_tree_is_a_merge_error(tmp_path):
+    # /Count says 3 pages, the tree only has 2
+    src = tmp_path / "broken.pdf"
+    src.write_bytes(build_pdf({
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 3 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 10 10] >>",
+        4: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 10 10] >>",
+    }))
+    for large_job in (False, True):
+        with pytest.raises(merge_engine.MergeError, match="broken.pdf"):
+            merge_engine.merge([(src, "3")], tmp_path / "out.pdf", options={"large_job": large_job})
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_remerge_writes_shared_objects_of_the_previous_output_once(tmp_path):
+    a = write_sample(tmp_path / "a.pdf", 2, b"a")
+    b = write_sample(tmp_path / "b.pdf", 2, b"b")
+    c = write_sample(tmp_path / "c.pdf", 2, b"c")
+    out = tmp_path / "out.pdf"
+    # Optimized, so a and c share one font in the previous output
+    merge_engine.merge([a, b, c], out, options={"incremental": True, "optimize": True})
+    assert count_objects(out, Type="/Font") == 1
+
+    write_sample(b, 3, b"b2")
+    merge_engine.merge([a, b, c], out, options={"incremental": True})
+    assert len(PyPDF2.PdfReader(str(out)).pages) == 7
+    # One font reused from the previous output for a and c, one copied from the new b
+    assert count_objects(out, Type="/Font") == 2
+
+
+def test_stages_account_for_the_wall_time(tmp_path):
+    import merge_metrics
+
+    a = write_sample(tmp_path / "a.pdf", 2, b"a")
+    txt = tmp_path / "b.txt"
+    txt.write_text("text")
+    metrics = merge_metrics.MergeMetrics()
+    merge_engine.merge([a, txt], tmp_path / "out.pdf", options={"metrics": metrics, "workers": 1})
+
+    assert metrics.stages["setup"] > 0
+    assert metrics.units[(str(txt),)]["pages"] == 1
+    # Nothing runs in parallel with one worker, so the stages cover nearly all of the job
+    assert 0.5 * metrics.wall_seconds <= sum(metrics.stages.values()) <= metrics.wall_seconds
+
+
+def test_pdf_only_merge_does_not_load_the_text_renderer(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    a = write_sample(tmp_path / "a.pdf", 2, b"a")
+    script = ("import sys, merge_engine; merge_engine.merge([sys.argv[1]], sys.argv[2]); "
+              "print('fpdf' in sys.modules, 'text_pdf' in sys.modules)")
+    done = subprocess.run([sys.executable, "-c", script, str(a), str(tmp_path / "out.pdf")],
+                          capture_output=True, text=True, check=True, cwd=os.path.dirname(merge_engine.__file__))
+    assert done.stdout.split() == ["False", "False"]
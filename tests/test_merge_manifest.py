@@ -0,0 +1,63 @@
+import os
+
+import merge_manifest
+from merge_manifest import MergeManifest
+
+
+def _manifest(tmp_path, settings=None):
+    src = tmp_path / "a.txt"
+    src.write_text("hello")
+    out = tmp_path / "out.pdf"
+    out.write_bytes(b"%PDF output")
+    manifest = MergeManifest(settings or {"font_size": 12})
+    hashes = [manifest.file_hash(src)]
+    manifest.add_unit([src], hashes, "1-2", 0, 2, "text_pdf:render_text_files")
+    manifest.save(str(out))
+    return str(src), str(out), hashes
+
+
+def test_round_trip(tmp_path):
+    src, out, hashes = _manifest(tmp_path)
+    loaded = MergeManifest.load(out, {"font_size": 12})
+    assert loaded is not None
+    assert loaded.span(MergeManifest.unit_key(hashes, "1-2", "text_pdf:render_text_files")) == (0, 2)
+    # A different page range or converter is a different unit
+    assert loaded.span(MergeManifest.unit_key(hashes, None, "text_pdf:render_text_files")) is None
+    assert loaded.span(MergeManifest.unit_key(hashes, "1-2", "other:render")) is None
+
+
+def test_other_settings_are_not_reused(tmp_path):
+    _, out, _ = _manifest(tmp_path)
+    assert MergeManifest.load(out, {"font_size": 14}) is None
+
+
+def test_a_changed_output_is_not_reused(tmp_path):
+    _, out, _ = _manifest(tmp_path)
+    with open(out, "ab") as f:
+        f.write(b"edited")
+    assert MergeManifest.load(out, {"font_size": 12}) is None
+
+
+def test_missing_or_broken_manifest(tmp_path):
+    _, out, _ = _manifest(tmp_path)
+    with open(merge_manifest.manifest_path(out), "w") as f:
+        f.write("{not json")
+    assert MergeManifest.load(out, {"font_size": 12}) is None
+    os.remove(merge_manifest.manifest_path(out))
+    assert MergeManifest.load(out, {"font_size": 12}) is None
+
+
+def test_files_are_hashed_again_only_when_they_change(tmp_path, monkeypatch):
+    src, out, hashes = _manifest(tmp_path)
+    previous = MergeManifest.load(out, {"font_size": 12})
+    hashed = []
+    real_hash = merge_manifest._hash_file
+    monkeypatch.setattr(merge_manifest, "_hash_file", lambda path: hashed.append(path) or real_hash(path))
+
+    assert MergeManifest({}).file_hash(src, previous) == hashes[0]
+    assert hashed == []
+
+    with open(src, "w") as f:
+        f.write("changed")
+    assert MergeManifest({}).file_hash(src, previous) != hashes[0]
+    assert hashed == [os.path.abspath(src)]
@@ -0,0 +1,104 @@
+import io
+
+import pytest
+
+import page_ranges
+from pdf_samples import build_pdf, sample_pdf
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1", [(1, 1)]),
+    ("1-3,10", [(1, 3), (10, 10)]),
+    (" 2 - 4 , 7 ", [(2, 4), (7, 7)]),
+    ("5-", [(5, None)]),
+    ("-3", [(1, 3)]),
+    ("3,1", [(3, 3), (1, 1)]),
+])
+def test_parse_page_ranges(spec, expected):
+    assert page_ranges.parse_page_ranges(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "-", "0", "3-1", "a", "1,,2", "1-2-3", "0-2"])
+def test_parse_page_ranges_rejects(spec):
+    with pytest.raises(ValueError):
+        page_ranges.parse_page_ranges(spec)
+
+
+@pytest.mark.parametrize("spec, count, expected", [
+    ("1", 5, [0]),
+    ("1-3,5", 5, [0, 1, 2, 4]),
+    ("4-", 5, [3, 4]),
+    ("-2", 5, [0, 1]),
+    ("2,2", 3, [1, 1]),
+    ("5-", 5, [4]),
+])
+def test_page_indices(spec, count, expected):
+    assert page_ranges.page_indices(spec, count) == expected
+
+
+@pytest.mark.parametrize("spec, count", [("6", 5), ("4-6", 5), ("6-", 5)])
+def test_page_indices_out_of_range(spec, count):
+    with pytest.raises(ValueError, match="out of range"):
+        page_ranges.page_indices(spec, count)
+
+
+def _content(page):
+    return page["/Contents"].get_object().get_data()
+
+
+def test_lazy_page_flat_tree():
+    reader = PyPDF2.PdfReader(io.BytesIO(sample_pdf(3)))
+    assert page_ranges.page_count(reader) == 3
+    for idx in range(3):
+        assert b"page %d" % (idx + 1) in _content(page_ranges.lazy_page(reader, idx))
+
+
+def _unbalanced_tree():
+    """Root kids: an empty /Pages, then a /Pages holding p1 and p2, so /Count equals len(/Kids)"""
+    page = b"<< /Type /Page /Parent %d 0 R /Contents %d 0 R >>"
+    return build_pdf({
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 /MediaBox [0 0 100 200] >>",
+        3: b"<< /Type /Pages /Parent 2 0 R /Kids [] /Count 0 >>",
+        4: b"<< /Type /Pages /Parent 2 0 R /Kids [5 0 R 6 0 R] /Count 2 >>",
+        5: page % (4, 7),
+        6: page % (4, 8),
+        7: b"<< /Length 2 >>\nstream\np1\nendstream",
+        8: b"<< /Length 2 >>\nstream\np2\nendstream",
+    })
+
+
+def test_lazy_page_skips_empty_subtree():
+    reader = PyPDF2.PdfReader(io.BytesIO(_unbalanced_tree()))
+    assert page_ranges.page_count(reader) == 2
+    first, second = page_ranges.lazy_pages(reader, [0, 1])
+    assert _content(first) == b"p1"
+    assert _content(second) == b"p2"
+    assert second.indirect_reference.idnum == 6
+    # Inherited from the root
+    assert [int(v) for v in second["/MediaBox"]] == [0, 0, 100, 200]
+
+
+def test_lazy_page_past_the_end():
+    reader = PyPDF2.PdfReader(io.BytesIO(_unbalanced_tree()))
+    with pytest.raises(ValueError):
+        page_ranges.lazy_page(reader, 2)
+
+
+def test_lazy_pages_reads_a_flat_tree_once():
+    reader = PyPDF2.PdfReader(io.BytesIO(sample_pdf(200)))
+    reads = []
+    get_object = reader.get_object
+    reader.get_object = lambda ref: reads.append(ref) or get_object(ref)
+    pages = list(page_ranges.lazy_pages(reader, range(200)))
+    assert b"page 200" in _content(pages[-1])
+    # One read per kid, not one walk per page
+    assert 200 <= len(reads) < 2 * 200
+
+
+def test_lazy_pages_keeps_the_requested_order():
+    reader = PyPDF2.PdfReader(io.BytesIO(sample_pdf(4)))
+    pages = page_ranges.lazy_pages(reader, [3, 0, 3, 1])
+    assert [_content(p).split(b"page ")[1][:1] for p in pages] == [b"4", b"1", b"4", b"2"]
@@ -0,0 +1,153 @@
+import io
+
+import pytest
+
+from pdf_samples import build_pdf, check_pdf, count_objects, page_texts, sample_pdf, write_sample
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+import merge_engine  # noqa: E402
+import pdf_stream  # noqa: E402
+
+
+def _reader(data):
+    return PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _write(path, *sources, **kwargs):
+    with open(path, "wb") as f:
+        writer = pdf_stream.StreamingPdfWriter(f, **kwargs)
+        for data in sources:
+            writer.add_reader(_reader(data))
+        writer.close()
+    return writer
+
+
+def test_pages_are_copied_in_order(tmp_path):
+    out = tmp_path / "out.pdf"
+    writer = _write(out, sample_pdf(2, b"a"), sample_pdf(3, b"b"))
+    assert writer.page_count == 5
+
+    reader = check_pdf(out)
+    assert [b"(a page 1)" in t for t in page_texts(reader)] == [True, False, False, False, False]
+    assert b"(b page 3)" in page_texts(reader)[4]
+    # Without dedupe every source brings its own font and image
+    assert count_objects(out, Type="/Font") == 2
+    assert count_objects(out, Subtype="/Image") == 2
+
+
+def test_objects_shared_within_a_source_are_written_once(tmp_path):
+    out = tmp_path / "out.pdf"
+    _write(out, sample_pdf(4))
+    assert count_objects(out, Type="/Font") == 1
+    assert count_objects(out, Subtype="/Image") == 1
+
+
+@pytest.mark.parametrize("compress_level", [None, 6])
+def test_dedupe_across_sources(tmp_path, compress_level):
+    out = tmp_path / "out.pdf"
+    _write(out, sample_pdf(2, b"a"), sample_pdf(2, b"b"), sample_pdf(1, b"c"),
+           dedupe=True, compress_level=compress_level)
+
+    reader = check_pdf(out)
+    assert len(reader.pages) == 5
+    assert count_objects(out, Type="/Font") == 1
+    assert count_objects(out, Subtype="/Image") == 1
+    # Page contents differ, so none of them are merged
+    assert len(set(page_texts(reader))) == 5
+
+
+def test_compressed_output_uses_object_and_xref_streams(tmp_path):
+    plain, packed = tmp_path / "plain.pdf", tmp_path / "packed.pdf"
+    sources = [sample_pdf(60, b"doc%d" % i) for i in range(3)]
+    _write(plain, *sources)
+    _write(packed, *sources, compress_level=9)
+
+    reader = check_pdf(packed)
+    assert len(reader.pages) == 180
+    assert reader.xref_objStm  # Objects were read from object streams
+    # More than pdf_stream.OBJSTM_SIZE small objects, so at least two object streams
+    assert count_objects(packed, Type="/ObjStm") >= 2
+    assert page_texts(reader) == page_texts(check_pdf(plain))
+    assert packed.stat().st_size < plain.stat().st_size
+
+
+def _cyclic_pdf():
+    """A page with an annotation that points back at it, and two resources pointing at each other"""
+    return build_pdf({
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 10 10] /Annots [4 0 R] "
+           b"/Resources << /Properties << /P1 5 0 R >> >> >>",
+        4: b"<< /Type /Annot /Subtype /Text /Rect [0 0 5 5] /P 3 0 R >>",
+        5: b"<< /Name /first /Next 6 0 R >>",
+        6: b"<< /Name /second /Next 5 0 R >>",
+    })
+
+
+@pytest.mark.parametrize("dedupe", [False, True])
+def test_reference_cycles(tmp_path, dedupe):
+    out = tmp_path / "out.pdf"
+    _write(out, _cyclic_pdf(), _cyclic_pdf(), dedupe=dedupe, compress_level=6 if dedupe else None)
+
+    reader = check_pdf(out)
+    for page in reader.pages:
+        annot = page["/Annots"][0].get_object()
+        assert annot["/P"].get_object() == page  # Points at its own copy of the page
+        first_ref = page["/Resources"]["/Properties"].raw_get("/P1")
+        first = first_ref.get_object()
+        second = first["/Next"]
+        assert (first["/Name"], second["/Name"]) == ("/first", "/second")
+        assert second.raw_get("/Next").idnum == first_ref.idnum
+    # Annotations keep their identity, one per page
+    assert count_objects(out, Type="/Annot") == 2
+
+
+def test_links_to_pages_that_were_not_copied_become_null(tmp_path):
+    reader = _reader(sample_pdf(3, outline=True))
+    out = io.BytesIO()
+    writer = pdf_stream.StreamingPdfWriter(out)
+    page = reader.pages[1]
+    page[PyPDF2.generic.NameObject("/Link")] = reader.pages[0].indirect_reference
+    writer.add_pages([page])
+    writer.close()
+    copy = _reader(out.getvalue()).pages[0]
+    assert isinstance(copy["/Link"], PyPDF2.generic.NullObject)
+
+
+def _outline_pages(reader):
+    """(title, page index) of every top level bookmark"""
+    pages = []
+    for item in reader.outline:
+        # PdfMerger writes destinations as page numbers rather than page references
+        index = item.page if isinstance(item.page, int) else reader.get_destination_page_number(item)
+        pages.append((item.title, index))
+    return pages
+
+
+@pytest.mark.parametrize("compress_level", [None, 6])
+def test_rewrite_keeps_outlines(tmp_path, compress_level):
+    out = tmp_path / "out.pdf"
+    with open(out, "wb") as f:
+        pdf_stream.rewrite(_reader(sample_pdf(3, b"a", outline=True)), f, compress_level=compress_level)
+    reader = check_pdf(out)
+    assert _outline_pages(reader) == [("a 1", 0), ("a 2", 1), ("a 3", 2)]
+
+
+@pytest.mark.parametrize("options, fonts", [
+    ({"large_job": True}, 2),
+    ({"large_job": True, "optimize": True}, 1),
+    ({"large_job": False, "optimize": True}, 1),
+])
+def test_merge_modes(tmp_path, options, fonts):
+    a = write_sample(tmp_path / "a.pdf", 2, b"a", outline=True)
+    b = write_sample(tmp_path / "b.pdf", 1, b"b", outline=True)
+    out = tmp_path / "out.pdf"
+    merge_engine.merge([a, b], out, options=options)
+
+    reader = check_pdf(out)
+    assert len(reader.pages) == 3
+    assert count_objects(out, Type="/Font") == fonts
+    if options["large_job"]:
+        assert reader.outline == []  # Large jobs don't copy outlines
+    else:
+        assert _outline_pages(reader) == [("a 1", 0), ("a 2", 1), ("b 1", 2)]
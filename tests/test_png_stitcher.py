@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+import png_stitcher  # noqa: E402
+
+
+def _noise(mode, size, seed):
+    """An image of random pixels, so the Up filter sees every kind of difference"""
+    bands = len(Image.new(mode, (1, 1)).getbands())
+    data = random.Random(seed).randbytes(size[0] * size[1] * bands)
+    img = Image.frombytes(mode, size, data)
+    if mode == "P":
+        img.putpalette(random.Random(seed).randbytes(768))
+    return img
+
+
+def _reference(images):
+    """The stitched image built in memory the simple way"""
+    width = max(img.width for img in images)
+    canvas = Image.new("RGB", (width, sum(img.height for img in images)), "white")
+    y = 0
+    for img in images:
+        canvas.paste(img.convert("RGB"), ((width - img.width) // 2, y))
+        y += img.height
+    return canvas
+
+
+@pytest.mark.parametrize("strip_rows", [png_stitcher.STRIP_ROWS, 7])
+def test_stitch_matches_an_in_memory_paste(tmp_path, monkeypatch, strip_rows):
+    monkeypatch.setattr(png_stitcher, "STRIP_ROWS", strip_rows)
+    images = [_noise("RGB", (40, 30), 1), _noise("RGBA", (25, 9), 2),
+              _noise("L", (33, 1), 3), _noise("P", (40, 20), 4)]
+    files = []
+    for i, img in enumerate(images):
+        files.append(str(tmp_path / f"{i}.png"))
+        img.save(files[-1])
+
+    done = []
+    out = png_stitcher.stitch_vertical(files, str(tmp_path / "out.png"), done.append)
+    assert done == files
+    with Image.open(out) as result:
+        assert result.mode == "RGB"
+        assert result.tobytes() == _reference(images).tobytes()
+
+
+def test_writer_rejects_rows_that_do_not_fit(tmp_path):
+    with open(tmp_path / "out.png", "wb") as f:
+        writer = png_stitcher.PngWriter(f, 4, 2)
+        with pytest.raises(ValueError):
+            writer.write_strip(Image.new("RGB", (3, 1)))
+        writer.write_strip(Image.new("RGB", (4, 1)))
+        with pytest.raises(ValueError):
+            writer.close()
@@ -0,0 +1,83 @@
+import codecs
+import os
+
+import pytest
+
+import text_concat
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"plain ascii", ("utf-8", 0)),
+    ("café".encode("utf-8"), ("utf-8", 0)),
+    (codecs.BOM_UTF8 + b"bom", ("utf-8", 3)),
+    ("café".encode("utf-16"), ("utf-16", 0)),
+    ("café".encode("cp1252"), ("cp1252", 0)),
+    (b"", ("utf-8", 0)),
+])
+def test_detect_encoding(tmp_path, data, expected):
+    path = tmp_path / "in.txt"
+    path.write_bytes(data)
+    assert text_concat.detect_encoding(path) == expected
+
+
+def test_detect_encoding_fallback(tmp_path):
+    path = tmp_path / "in.txt"
+    path.write_bytes("café".encode("latin-1"))
+    assert text_concat.detect_encoding(path, "latin-1") == ("iso8859-1", 0)
+
+
+def test_multibyte_character_cut_off_by_the_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_concat, "SAMPLE_SIZE", 4)
+    path = tmp_path / "in.txt"
+    path.write_bytes("abcédef".encode("utf-8"))  # The sample ends inside the é
+    assert text_concat.detect_encoding(path) == ("utf-8", 0)
+
+
+def _concat(tmp_path, *contents, separator="--"):
+    files = []
+    for idx, data in enumerate(contents):
+        path = tmp_path / f"{idx}.txt"
+        path.write_bytes(data)
+        files.append(str(path))
+    out = tmp_path / "out.txt"
+    done = []
+    encoding = text_concat.concat(files, out, separator, on_file=done.append)
+    assert done == files
+    return out.read_bytes(), encoding
+
+
+def test_same_encoding_is_copied_as_is(tmp_path):
+    data, encoding = _concat(tmp_path, "café".encode("cp1252"), "thé".encode("cp1252"))
+    assert encoding == "cp1252"
+    assert data == "café--thé".encode("cp1252")
+
+
+def test_bom_is_skipped(tmp_path):
+    data, encoding = _concat(tmp_path, codecs.BOM_UTF8 + b"one", b"two")
+    assert encoding == "utf-8"
+    assert data == b"one--two"
+
+
+def test_mixed_encodings_become_utf8(tmp_path):
+    data, encoding = _concat(tmp_path, "café".encode("cp1252"), "naïve".encode("utf-16"),
+                             "€".encode("utf-8"))
+    assert encoding == "utf-8"
+    assert data.decode("utf-8") == "café--naïve--€"
+
+
+def test_utf16_only_inputs_are_written_as_utf8(tmp_path):
+    data, encoding = _concat(tmp_path, "one".encode("utf-16"), "two".encode("utf-16"))
+    assert encoding == "utf-8"
+    assert data == b"one--two"
+
+
+def test_separator_uses_platform_newlines(tmp_path):
+    data, _ = _concat(tmp_path, b"a", b"b", separator="\n=\n")
+    assert data == b"a" + ("\n=\n".replace("\n", os.linesep)).encode() + b"b"
+
+
+def test_large_file_is_copied_completely(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_concat, "CHUNK_SIZE", 1000)
+    big = b"x" * 250_001
+    data, _ = _concat(tmp_path, big, b"end")
+    assert data == big + b"--end"
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+pytest.importorskip("fpdf")
+PyPDF2 = pytest.importorskip("PyPDF2")
+import merge_engine  # noqa: E402
+import text_pdf  # noqa: E402
+
+
+def _settings(**changes):
+    return {**merge_engine.conversion_settings({**merge_engine.DEFAULT_OPTIONS, "font_file": ""}), **changes}
+
+
+def _text(data):
+    return "".join(page.extract_text() for page in PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+@pytest.mark.parametrize("data", [
+    "café".encode("cp1252"),
+    "café".encode("utf-8"),
+    "\ufeffcafé".encode("utf-8"),
+    "café".encode("utf-16"),
+])
+def test_encodings(tmp_path, data):
+    src = tmp_path / "in.txt"
+    src.write_bytes(data)
+    assert _text(text_pdf.render_text_files([str(src)], _settings())).strip() == "café"
+
+
+def test_fallback_encoding(tmp_path):
+    src = tmp_path / "in.txt"
+    src.write_bytes("Ωmega".encode("cp1253"))
+    data = text_pdf.render_text_files([str(src)], _settings(text_fallback_encoding="latin-1"))
+    assert _text(data).strip() == "Ùmega"
+
+
+def test_fallback_encoding_is_part_of_the_cache_key():
+    assert "text_fallback_encoding" in merge_engine.CONVERSION_OPTIONS
+    assert _settings()["text_fallback_encoding"] == merge_engine.DEFAULT_OPTIONS["text_fallback_encoding"]
@@ -0,0 +1,114 @@
+"""Streaming concatenation of text files.
+
+Inputs are copied as bytes in large chunks, with os.copy_file_range or
+os.sendfile where the platform has them, so nothing is decoded or held in
+memory. Encodings are detected from a small sample of each file; files are
+only decoded and re-encoded when their encodings actually differ.
+"""
+import codecs
+import os
+import shutil
+
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# Encodings where the ASCII separator has the same bytes, so raw copies stay valid
+ASCII_COMPATIBLE = {"utf-8", "ascii", "cp1252", "iso8859-1", "iso8859-15"}
+
+
+def detect_encoding(path, fallback="cp1252"):
+    """Guesses a file's encoding from its first bytes.
+
+    Returns (codec name, number of BOM bytes to skip). Files that aren't valid
+    UTF-8 in the sample are assumed to be in the fallback encoding.
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8", len(codecs.BOM_UTF8)
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16", 0  # The utf-16 codec reads the BOM itself
+    try:
+        # A multi-byte character may be cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < SAMPLE_SIZE)
+        return "utf-8", 0
+    except UnicodeDecodeError:
+        return codecs.lookup(fallback).name, 0
+
+
+def _copy_bytes(src, dst, offset):
+    """Copies src from offset to its end onto dst's current position"""
+    dst.flush()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    remaining = os.fstat(src_fd).st_size - offset
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src_fd, dst_fd, remaining, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            return
+        except OSError:
+            pass  # Not supported between these filesystems, try the next way
+
+    if hasattr(os, "sendfile") and os.name != "nt":
+        try:
+            while remaining > 0:
+                sent = os.sendfile(dst_fd, src_fd, offset, min(remaining, 1 << 30))
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+            return
+        except OSError:
+            pass  # macOS only sends to sockets
+
+    src.seek(offset)
+    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def _transcode(src, dst, offset, encoding, out_encoding):
+    """Copies src to dst decoding chunk by chunk"""
+    src.seek(offset)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    encoder = codecs.getincrementalencoder(out_encoding)(errors="replace")
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+        dst.write(encoder.encode(decoder.decode(chunk)))
+    dst.write(encoder.encode(decoder.decode(b'', final=True), final=True))
+
+
+def concat(files, output, separator, fallback_encoding="cp1252", on_file=None, detected=None):
+    """Writes files to output with separator between them.
+
+    If every input has the same ASCII compatible encoding, the output keeps it
+    and all inputs are copied byte for byte. Otherwise the output is UTF-8 and
+    only the inputs that aren't UTF-8 are decoded. on_file(file) is called
+    after each input. detected skips the encoding detection when the caller
+    already has detect_encoding() of every file. Returns the output encoding.
+    """
+    if detected is None:
+        detected = [detect_encoding(f, fallback_encoding) for f in files]
+    encodings = {enc for enc, _ in detected}
+    out_encoding = encodings.pop() if len(encodings) == 1 else "utf-8"
+    if out_encoding not in ASCII_COMPATIBLE:
+        out_encoding = "utf-8"
+
+    # Match what text mode writes on this platform
+    separator = separator.replace("\n", os.linesep).encode(out_encoding)
+
+    with open(output, 'wb') as dst:
+        for idx, (file, (encoding, bom)) in enumerate(zip(files, detected)):
+            if idx > 0:  # Add a separator between files
+                dst.write(separator)
+            with open(file, 'rb') as src:
+                if encoding == out_encoding:
+                    _copy_bytes(src, dst, bom)
+                else:
+                    _transcode(src, dst, bom, encoding, out_encoding)
+            if on_file is not None:
+                on_file(file)
+    return out_encoding
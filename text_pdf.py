@@ -0,0 +1,58 @@
+"""Streaming text to PDF rendering.
+
+Text files are read and laid out line by line, so a huge log never sits in
+memory as one string. Lines that fit the page width are written with a plain
+cell(), only lines that need wrapping go through the much slower multi_cell().
+
+Several files can be rendered into one shared document: each file starts on a
+new page, and the font and page setup are set up only once. A Unicode TrueType
+font is embedded once and subset to the glyphs actually used. If no TTF font
+is given (see fonts.py for the one picked by default), the core font is used
+and anything outside Latin-1 is replaced.
+"""
+import io
+
+from fpdf import FPDF
+
+import text_concat
+
+
+def _lines(file, latin1, fallback_encoding="cp1252"):
+    """Yields the file's lines ready for layout, decoded like text_concat does for .txt output"""
+    encoding, bom = text_concat.detect_encoding(file, fallback_encoding)
+    raw = open(file, "rb")
+    raw.seek(bom)
+    with io.TextIOWrapper(raw, encoding=encoding, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n").expandtabs(4)
+            if latin1:
+                line = line.encode("latin-1", "replace").decode("latin-1")
+            yield line
+
+
+def render_text_files(files, settings):
+    """Renders text files into one PDF, each starting on a new page, and returns the bytes.
+
+    Uses settings["font_file"] (a TTF path, None to use the core font),
+    settings["font"], settings["font_size"], settings["line_height"] (mm) and
+    settings["text_fallback_encoding"] for files that aren't valid UTF-8.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    font_file = settings.get("font_file")
+    if font_file:
+        pdf.add_font("TextFont", fname=font_file)
+        pdf.set_font("TextFont", size=settings["font_size"])
+    else:
+        pdf.set_font(settings["font"], size=settings["font_size"])
+
+    line_height = settings["line_height"]
+    for file in files:
+        pdf.add_page()
+        for line in _lines(file, not font_file, settings["text_fallback_encoding"]):
+            if pdf.get_string_width(line) <= pdf.epw:
+                pdf.cell(0, line_height, line, new_x="LMARGIN", new_y="NEXT")
+            else:
+                pdf.multi_cell(0, line_height, line, new_x="LMARGIN", new_y="NEXT")
+    return bytes(pdf.output())
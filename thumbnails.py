@@ -0,0 +1,216 @@
+"""First page thumbnails for the file list.
+
+render_thumbnail() makes a small preview of an image or of a PDF's first page.
+JPEGs are decoded at a fraction of their size with draft(), then shrunk with
+thumbnail(). A PDF's first page is looked up without reading the rest of the
+document; if it is a scan (one image covering the page) that image is used,
+otherwise the page is rendered with pdftoppm when it is installed, and as a
+blank page of the right proportions when it is not.
+
+ThumbnailLoader makes thumbnails on a small thread pool and keeps them in a
+ThumbnailCache on disk, keyed by path, size and mtime, so a folder is only
+rendered once. Pillow and PyPDF2 are imported by the first thumbnail that is
+made, on the pool, so they don't slow down the GUI's start.
+"""
+import hashlib
+import io
+import os
+import queue
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import page_ranges
+from conversion_cache import ConversionCache
+from converters import IMAGE_TYPES
+
+
+THUMBNAIL_SIZE = (40, 40)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bump when thumbnails change so old cache entries are not reused
+THUMBNAIL_VERSION = 1
+
+# An embedded image this close to the page's aspect ratio is taken to be a scan of it
+SCAN_ASPECT_TOLERANCE = 0.1
+
+
+def _resolve(obj):
+    from PyPDF2.generic import IndirectObject
+
+    return obj.get_object() if isinstance(obj, IndirectObject) else obj
+
+
+def _image_thumbnail(file, size):
+    from PIL import Image
+
+    with Image.open(file) as img:
+        img.draft("RGB", size)  # Only does something for JPEGs
+        img = img.convert("RGB")
+    img.thumbnail(size)
+    return img
+
+
+def _decode_xobject(xobj, size):
+    """Decodes an embedded image stream, for the encodings scans use"""
+    from PIL import Image
+
+    filters = _resolve(xobj.get("/Filter"))
+    if isinstance(filters, list):
+        filters = filters[0] if len(filters) == 1 else None
+    if filters == "/DCTDecode":
+        img = Image.open(io.BytesIO(xobj._data))
+        img.draft("RGB", size)
+        return img.convert("RGB")
+
+    color_space = _resolve(xobj.get("/ColorSpace"))
+    mode = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}.get(color_space)
+    if filters != "/FlateDecode" or mode is None or xobj.get("/BitsPerComponent") != 8:
+        return None
+    return Image.frombytes(mode, (xobj["/Width"], xobj["/Height"]), xobj.get_data()).convert("RGB")
+
+
+def _pdftoppm(file, size):
+    """Renders the first page with poppler's pdftoppm, if it's installed"""
+    from PIL import Image
+
+    exe = shutil.which("pdftoppm")
+    if exe is None:
+        return None
+    try:
+        result = subprocess.run([exe, "-f", "1", "-l", "1", "-singlefile", "-png",
+                                 "-scale-to", str(max(size)), file],
+                                capture_output=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    img = Image.open(io.BytesIO(result.stdout)).convert("RGB")
+    img.thumbnail(size)
+    return img
+
+
+def _blank_page(width, height, size):
+    """A white page with the page's proportions, for PDFs that can't be rendered"""
+    from PIL import Image, ImageDraw
+
+    scale = min(size[0] / width, size[1] / height)
+    img = Image.new("RGB", (max(1, round(width * scale)), max(1, round(height * scale))), "white")
+    ImageDraw.Draw(img).rectangle((0, 0, img.width - 1, img.height - 1), outline="#999999")
+    return img
+
+
+def _pdf_thumbnail(file, size):
+    from PyPDF2 import PdfReader
+
+    with open(file, 'rb') as f:
+        reader = PdfReader(f)
+        if page_ranges.page_count(reader) == 0:
+            return None
+        page = page_ranges.lazy_page(reader, 0)
+        box = [float(_resolve(v)) for v in _resolve(page.get("/CropBox") or page.get("/MediaBox") or [0, 0, 612, 792])]
+        width, height = abs(box[2] - box[0]) or 612, abs(box[3] - box[1]) or 792
+        if int(_resolve(page.get("/Rotate", 0)) or 0) % 180:
+            width, height = height, width
+
+        # The biggest image on the page, if it has the page's shape it's a scan
+        resources = _resolve(page.get("/Resources")) or {}
+        xobjects = _resolve(resources.get("/XObject")) or {}
+        images = [_resolve(x) for x in xobjects.values()]
+        images = [x for x in images if x.get("/Subtype") == "/Image"]
+        if images:
+            biggest = max(images, key=lambda x: x["/Width"] * x["/Height"])
+            aspect = biggest["/Width"] / biggest["/Height"]
+            if abs(aspect / (width / height) - 1) <= SCAN_ASPECT_TOLERANCE:
+                img = _decode_xobject(biggest, size)
+                if img is not None:
+                    img.thumbnail(size)
+                    return img
+
+    return _pdftoppm(file, size) or _blank_page(width, height, size)
+
+
+def render_thumbnail(file, size=THUMBNAIL_SIZE):
+    """Returns a PIL image no bigger than size, or None for files without a preview"""
+    ext = os.path.splitext(file)[1].lower()
+    if ext in IMAGE_TYPES:
+        return _image_thumbnail(file, size)
+    if ext == ".pdf":
+        return _pdf_thumbnail(file, size)
+    return None
+
+
+class ThumbnailCache(ConversionCache):
+    """ConversionCache of thumbnail PNGs, stored under thumbnail_key()"""
+
+    SUFFIX = ".png"
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, max_bytes, key_mode="stat")
+
+    def thumbnail_key(self, file, size=THUMBNAIL_SIZE):
+        """Returns the cache key of a file's thumbnail, from its path, size and mtime"""
+        st = os.stat(file)
+        return hashlib.sha256(f"{THUMBNAIL_VERSION}\0{os.path.abspath(file)}\0{st.st_size}\0"
+                              f"{st.st_mtime_ns}\0{size[0]}x{size[1]}".encode()).hexdigest()
+
+
+class ThumbnailLoader:
+    """Makes thumbnails on background threads, results are picked up with poll()"""
+
+    def __init__(self, cache=None, size=THUMBNAIL_SIZE, workers=2):
+        self.cache = cache
+        self.size = size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self.pending = {}  # File -> Future
+        self.results = queue.Queue()
+
+    def _load(self, file):
+        """Returns PNG bytes of the file's thumbnail, or None"""
+        key = self.cache.thumbnail_key(file, self.size) if self.cache is not None else None
+        if key is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                return data
+        img = render_thumbnail(file, self.size)
+        if img is None:
+            return None
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        data = buf.getvalue()
+        if key is not None:
+            self.cache.put(key, data)
+        return data
+
+    def _run(self, file):
+        try:
+            data = self._load(file)
+        except Exception:
+            data = None  # Unreadable or broken file, it just gets no preview
+        self.results.put((file, data))
+
+    def request(self, file):
+        """Queues a thumbnail unless it's already on its way"""
+        if file not in self.pending:
+            self.pending[file] = self.pool.submit(self._run, file)
+
+    def retain(self, files):
+        """Drops queued requests for files that are no longer wanted, e.g. scrolled out of view"""
+        files = set(files)
+        for file in [f for f in self.pending if f not in files]:
+            if self.pending[file].cancel():
+                del self.pending[file]
+
+    def poll(self):
+        """Returns the (file, PNG bytes or None) results that are ready"""
+        ready = []
+        while True:
+            try:
+                file, data = self.results.get_nowait()
+            except queue.Empty:
+                return ready
+            self.pending.pop(file, None)
+            ready.append((file, data))
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)